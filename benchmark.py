@@ -0,0 +1,249 @@
+import argparse
+import contextlib
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that take seconds to import; a run that doesn't train, predict with fastai or plot
+# should not load any of them.
+HEAVY_MODULES = ("fastai", "fastbook", "sklearn", "pandas", "torch", "plotly")
+STARTUP_ARGS = ["sts.py", "IRONCLAD_STARTER", "--trials=1"]
+STARTUP_BUDGET_SECONDS = 1.5
+
+
+@contextlib.contextmanager
+def scratch_dir():
+    # sts.py writes sts.csv and its logs to the working directory: run it elsewhere so that the
+    # tree's own aren't overwritten.
+    with tempfile.TemporaryDirectory() as cwd:
+        shutil.copy(os.path.join(REPO, "logging.conf"), cwd)
+        yield cwd
+
+
+@contextlib.contextmanager
+def in_scratch_dir():
+    # For the benchmarks that run trials in this process: importing sts configures the logs, and
+    # the trials write sts.csv, relative to the working directory.
+    if REPO not in sys.path:
+        # The modules are imported from the tree, not the scratch directory.
+        sys.path.insert(0, REPO)
+    with scratch_dir() as cwd:
+        previous = os.getcwd()
+        os.chdir(cwd)
+        try:
+            yield cwd
+        finally:
+            os.chdir(previous)
+
+
+def cold_start(runs: int = 5, args=STARTUP_ARGS):
+    """Returns the wall time of each of `runs` fresh `python sts.py` processes."""
+    times = []
+    with scratch_dir() as cwd:
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(REPO, args[0])] + args[1:], check=True, cwd=cwd,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def heavy_imports(args=STARTUP_ARGS):
+    """Returns the HEAVY_MODULES that `python sts.py` imports."""
+    code = ("import runpy, sys\n"
+            f"sys.path.insert(0, {REPO!r})\n"
+            f"sys.argv = {[os.path.join(REPO, args[0])] + args[1:]!r}\n"
+            "runpy.run_path(sys.argv[0], run_name='__main__')\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    with scratch_dir() as cwd:
+        out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=cwd)
+    return [m for m in out.stdout.splitlines()[-1].split(",") if m]
+
+
+def startup(args):
+    times = cold_start(args.runs)
+    print(f"cold start: median {statistics.median(times):.3f}s, min {min(times):.3f}s "
+          f"over {args.runs} runs (budget {STARTUP_BUDGET_SECONDS}s)")
+    print(f"heavy imports: {heavy_imports() or 'none'}")
+    # Wall time depends on the machine and its load, so the budget is checked here rather than
+    # in the unit tests.
+    if statistics.median(times) > STARTUP_BUDGET_SECONDS:
+        sys.exit(f"cold start over the {STARTUP_BUDGET_SECONDS}s budget")
+
+
+def trial_cost(trials: int = 1000, fast: bool = False):
+    """Returns the seconds per AttackingPlayer vs JawWorm trial, with or without the turns.log trace."""
+    with in_scratch_dir():
+        import simulation
+        import sts
+        from card import IRONCLAD_STARTER
+        from monster import JawWorm
+        from player import AttackingPlayer
+
+        if fast:
+            sts.set_fast_mode()
+        start = time.perf_counter()
+        simulation.run_trials(AttackingPlayer, IRONCLAD_STARTER, JawWorm, 20, trials)
+        return (time.perf_counter() - start) / trials
+
+
+def logging_cost(args):
+    # Tracing first: fast mode can't be turned off again.
+    traced = trial_cost(args.trials)
+    fast = trial_cost(args.trials, fast=True)
+    print(f"tracing on: {1e6 * traced:.0f}us per trial, --fast: {1e6 * fast:.0f}us per trial "
+          f"({traced / fast:.1f}x)")
+
+
+def peak_rss(trials: int = 10_000, reuse: bool = False, streaming: bool = False):
+    """Returns the peak RSS in MB of a fresh process before and after it runs `trials`
+    AttackingPlayer vs JawWorm trials, and its generation 0 garbage collections."""
+    code = ("import gc, resource, sys\n"
+            f"sys.path.insert(0, {REPO!r})\n"
+            "import simulation, sts\n"
+            "from card import IRONCLAD_STARTER\n"
+            "from monster import JawWorm\n"
+            "from player import AttackingPlayer\n"
+            "sts.set_fast_mode()\n"
+            "before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+            f"simulation.run_trials(AttackingPlayer, IRONCLAD_STARTER, JawWorm, 20, {trials}, reuse={reuse}, "
+            f"streaming={streaming})\n"
+            "after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+            "print(before, after, gc.get_stats()[0]['collections'])")
+    with scratch_dir() as cwd:
+        out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=cwd)
+    before, after, collections = map(int, out.stdout.split())
+    # ru_maxrss is in KB on Linux.
+    return before / 1024, after / 1024, collections
+
+
+def memory(args):
+    for name, reuse, streaming in (("new objects", False, False), ("--reuse", True, False),
+                                   ("--reuse --streaming", True, True)):
+        before, after, collections = peak_rss(args.trials, reuse, streaming)
+        print(f"{name}: peak RSS {after:.1f}MB "
+              f"({after - before:+.1f}MB over startup) for {args.trials} trials, "
+              f"{collections} gen 0 collections")
+
+
+def stats_cost(trials: int = 100_000, turns: int = 20):
+    """Returns the seconds TrialStats takes to collect and post-process `trials` random trials of
+    up to `turns` turns: adding them, finish() and the scatter plot data for damage and block."""
+    import numpy
+    import simulation
+
+    rng = numpy.random.default_rng(0)
+    lengths = rng.integers(1, turns + 1, trials)
+    damage = rng.integers(0, 40, (trials, turns)).tolist()
+    block = rng.integers(0, 20, (trials, turns)).tolist()
+    start = time.perf_counter()
+    trial_stats = simulation.TrialStats(trials, turns)
+    for trial, length in enumerate(lengths):
+        trial_stats.add_monster_damage(damage[trial][:length])
+        trial_stats.add_player_block(block[trial][:length])
+    trial_stats.finish()
+    simulation.create_scatter_plot_data(trial_stats.monster_damage_dense)
+    simulation.create_scatter_plot_data(trial_stats.player_block_dense)
+    return time.perf_counter() - start
+
+
+def stats(args):
+    print(f"trial stats: {stats_cost(args.trials):.3f}s for {args.trials} trials")
+
+
+def snapshot_cost(calls: int = 10_000):
+    """Returns the seconds per game_state.snapshot, game_state.restore and copy.deepcopy of an
+    AttackingPlayer and JawWorm three turns into a fight."""
+    with in_scratch_dir():
+        import copy
+        import timeit
+        import game_state
+        import simulation
+        import sts
+        from card import IRONCLAD_STARTER
+        from monster import JawWorm
+        from player import AttackingPlayer
+
+        sts.set_fast_mode()
+        player, monster = simulation.setup_trial(AttackingPlayer, IRONCLAD_STARTER, JawWorm, 1)
+        for _ in range(3):
+            player.play_turn(monster)
+        state = game_state.snapshot(player, monster)
+        return [min(timeit.repeat(f, number=calls, repeat=3)) / calls for f in (
+            lambda: game_state.snapshot(player, monster),
+            lambda: game_state.restore(state, player, monster),
+            lambda: copy.deepcopy((player, monster)))]
+
+
+def snapshots(args):
+    take, restore, deepcopy = snapshot_cost(args.calls)
+    print(f"snapshot: {1e6 * take:.1f}us, restore: {1e6 * restore:.1f}us, "
+          f"deepcopy: {1e6 * deepcopy:.1f}us ({deepcopy / (take + restore):.0f}x a snapshot and restore)")
+
+
+def mcts_cost(games: int = 10, iterations: int = 100, turns: int = 8):
+    """Returns the mean final hp of `games` MCTSPlayer games against JawWorm, searching `iterations`
+    iterations per card choice, and about the seconds per iteration: one search is counted for each
+    card played and each turn ended."""
+    with in_scratch_dir():
+        import mcts
+        import simulation
+        import sts
+        from card import IRONCLAD_STARTER
+        from monster import JawWorm
+
+        sts.set_fast_mode()
+        mcts.MCTSPlayer.iterations = iterations
+        start = time.perf_counter()
+        results = list(simulation.play_trials(mcts.MCTSPlayer, IRONCLAD_STARTER, JawWorm, turns, range(games)))
+        seconds = time.perf_counter() - start
+        choices = sum(len(cards) + 1 for result in results for cards in result.played_cards)
+        return statistics.mean(result.hp for result in results), seconds / (choices * iterations)
+
+
+def mcts(args):
+    hp, seconds = mcts_cost(args.games, args.iterations)
+    print(f"MCTSPlayer: mean final hp {hp:.2f} over {args.games} games, "
+          f"{1e6 * seconds:.0f}us per iteration ({args.iterations} per card choice)")
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    benchmarks = argparser.add_subparsers(dest="benchmark", required=True)
+    startup_parser = benchmarks.add_parser(
+        "startup", help=f"time `python {' '.join(STARTUP_ARGS)}` from a cold process")
+    startup_parser.add_argument('--runs', help='number of runs', type=int, default=5)
+    startup_parser.set_defaults(run=startup)
+    logging_parser = benchmarks.add_parser(
+        "logging", help="time trials with and without the turns.log trace (sts.py --fast)")
+    logging_parser.add_argument('--trials', help='number of trials', type=int, default=1000)
+    logging_parser.set_defaults(run=logging_cost)
+    memory_parser = benchmarks.add_parser(
+        "memory", help="peak RSS of trials with and without sts.py --reuse and --streaming")
+    memory_parser.add_argument('--trials', help='number of trials', type=int, default=10_000)
+    memory_parser.set_defaults(run=memory)
+    stats_parser = benchmarks.add_parser(
+        "stats", help="time collecting and post-processing the TrialStats of random trials")
+    stats_parser.add_argument('--trials', help='number of trials', type=int, default=100_000)
+    stats_parser.set_defaults(run=stats)
+    snapshot_parser = benchmarks.add_parser(
+        "snapshot", help="time game_state snapshots and restores against copy.deepcopy")
+    snapshot_parser.add_argument('--calls', help='number of calls', type=int, default=10_000)
+    snapshot_parser.set_defaults(run=snapshots)
+    mcts_parser = benchmarks.add_parser(
+        "mcts", help="time MCTSPlayer's search iterations, each a rollout to the end of the game")
+    mcts_parser.add_argument('--games', help='number of games', type=int, default=10)
+    mcts_parser.add_argument('--iterations', help='iterations per card choice', type=int, default=100)
+    mcts_parser.set_defaults(run=mcts)
+    args = argparser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import unittest
+
+import benchmark
+
+
+class TestStartup(unittest.TestCase):
+    def test_no_heavy_imports(self):
+        self.assertEqual([], benchmark.heavy_imports())
+
+
+if __name__ == '__main__':
+    unittest.main()
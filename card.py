@@ -1,8 +1,11 @@
 
 from collections import namedtuple
 from enum import Enum
+from functools import lru_cache
 import logging
 
+import numpy
+
 logger = logging.getLogger("turns").getChild(__name__)
 
 
@@ -54,19 +57,14 @@ class CardArgs(namedtuple('CardArgs', (
                                weaken)
 
     def __getnewargs__(self):
-        return (self.energy,
-                self.attack,
-                self.attack_multiplier,
-                self.attack_strength_multiplier,
-                self.block,
-                self.draw_card,
-                self.exhausts,
-                self.strength_gain,
-                self.strength_buff,
-                self.strength_multiplier,
-                self.strike_bonus,
-                self.vulnerable,
-                self.weaken)
+        return tuple(self)
+
+
+class Tag(Enum):
+    ATTACK = 0
+    SKILL = 1
+    POWER = 2
+    STRIKE = 3  # "Strike" in the name, for PERFECTED_STRIKE
 
 
 class Card(CardArgs, Enum):
@@ -74,7 +72,7 @@ class Card(CardArgs, Enum):
     BASH = CardArgs(2, attack=8, vulnerable=2)
     BASH_PLUS = CardArgs(2, attack=10, vulnerable=3)
     DEFEND = CardArgs(1, block=5)
-    DEMON_FORM = CardArgs(3, exhausts=True, strength_buff=2) # is a power add card type
+    DEMON_FORM = CardArgs(3, exhausts=True, strength_buff=2)
     DISARM = CardArgs(1, exhausts=True, enemy_strength_gain=-2)
     FLEX = CardArgs(0, strength_gain=2, strength_loss=2)
     HEAVY_BLADE = CardArgs(1, attack=14, attack_strength_multiplier=3)
@@ -97,6 +95,14 @@ class Card(CardArgs, Enum):
     def __repr__(self):
         return self.name
 
+    def __reduce_ex__(self, protocol):
+        # Pickle by name: cheaper to send between processes than the CardArgs value.
+        return getattr, (self.__class__, self.name)
+
+    @property
+    def tags(self) -> frozenset:
+        return CARD_TAGS[self]
+
     def is_attack(self):
         return bool(self.attack or self.strength_buff or self.strength_gain or self.strength_multiplier > 1)
 
@@ -111,13 +117,53 @@ class Card(CardArgs, Enum):
         if self.strike_bonus == 0:
             return 0
 
-        cards_with_strike = len(
-            [c for c in deck.all_cards() if 'STRIKE' in str(c)])
+        cards_with_strike = deck.count_tag(Tag.STRIKE)
         strike_bonus = (
             self.strike_bonus * cards_with_strike)
-        logger.debug(
-            f"cards with strike: {cards_with_strike}, strike bonus: {strike_bonus}")
+        logger.debug("cards with strike: %s, strike bonus: %s", cards_with_strike, strike_bonus)
         return strike_bonus
 
 
+CARD_TAGS = {
+    Card.ANGER: frozenset({Tag.ATTACK}),
+    Card.BASH: frozenset({Tag.ATTACK}),
+    Card.BASH_PLUS: frozenset({Tag.ATTACK}),
+    Card.DEFEND: frozenset({Tag.SKILL}),
+    Card.DEMON_FORM: frozenset({Tag.POWER}),
+    Card.DISARM: frozenset({Tag.SKILL}),
+    Card.FLEX: frozenset({Tag.SKILL}),
+    Card.HEAVY_BLADE: frozenset({Tag.ATTACK}),
+    Card.INFLAME: frozenset({Tag.POWER}),
+    Card.INTIMIDATE: frozenset({Tag.SKILL}),
+    Card.IRON_WAVE: frozenset({Tag.ATTACK}),
+    Card.LIMIT_BREAK_PLUS: frozenset({Tag.SKILL}),
+    Card.PERFECTED_STRIKE: frozenset({Tag.ATTACK, Tag.STRIKE}),
+    Card.PERFECTED_STRIKE_PLUS: frozenset({Tag.ATTACK, Tag.STRIKE}),
+    Card.POMMEL_STRIKE: frozenset({Tag.ATTACK, Tag.STRIKE}),
+    Card.POMMEL_STRIKE_NO_DRAW: frozenset({Tag.ATTACK, Tag.STRIKE}),
+    Card.PUMMEL: frozenset({Tag.ATTACK}),
+    Card.STRIKE: frozenset({Tag.ATTACK, Tag.STRIKE}),
+    Card.TWIN_STRIKE: frozenset({Tag.ATTACK, Tag.STRIKE}),
+    Card.TWIN_STRIKE_PLUS: frozenset({Tag.ATTACK, Tag.STRIKE}),
+}
+
+# Decks store cards as their position in Card, and their tags as Tag values.
+CARDS = tuple(Card)
+CARD_IDS = {card: n for n, card in enumerate(CARDS)}
+CARD_TAG_IDS = tuple(tuple(tag.value for tag in CARD_TAGS[card]) for card in CARDS)
+
+# Card stats as columns indexed by card id, for engines that look cards up in bulk.
+CATALOG = {field: numpy.array([getattr(card, field) for card in CARDS]) for field in CardArgs._fields}
+CATALOG["is_attack"] = numpy.array([card.is_attack() for card in CARDS])
+TAG_TABLE = numpy.array([[tag in CARD_TAGS[card] for tag in Tag] for card in CARDS])
+
+
+@lru_cache(maxsize=None)
+def sort_ranks(key) -> tuple:
+    """Returns each card id's rank under sort key function `key`: cards with equal keys get equal
+    ranks, so sorting by rank orders (and breaks ties) exactly as sorting by key does."""
+    keys = [key(card) for card in CARDS]
+    distinct = sorted(set(keys))
+    return tuple(distinct.index(k) for k in keys)
+
 IRONCLAD_STARTER = [Card.DEFEND]*4 + [Card.STRIKE]*5 + [Card.BASH]
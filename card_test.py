@@ -1,7 +1,10 @@
 import logging.config
 import unittest
 
-from card import Card
+import numpy
+
+from card import CARDS, CATALOG, Card, Tag, sort_ranks
+from player import AttackingPlayer, DefendingPlayer
 
 logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
 
@@ -13,6 +16,28 @@ class TestCards(unittest.TestCase):
     def test_is_attack(self):
         self.assertFalse(Card.DEFEND.is_attack())
 
+    def test_tags(self):
+        for card in Card:
+            self.assertEqual('STRIKE' in card.name, Tag.STRIKE in card.tags, card)
+            self.assertEqual(1, len(card.tags & {Tag.ATTACK, Tag.SKILL, Tag.POWER}), card)
+            if card.attack:
+                self.assertIn(Tag.ATTACK, card.tags)
+
+    def test_catalog(self):
+        for n, card in enumerate(CARDS):
+            self.assertEqual(card.energy, CATALOG['energy'][n])
+            self.assertEqual(card.strength_multiplier, CATALOG['strength_multiplier'][n])
+            self.assertEqual(card.is_attack(), CATALOG['is_attack'][n])
+
+    def test_sort_ranks(self):
+        rng = numpy.random.default_rng(0)
+        for strategy in (AttackingPlayer, DefendingPlayer):
+            ranks = sort_ranks(strategy._sort_key)
+            for _ in range(20):
+                hand = [CARDS[n] for n in rng.integers(len(CARDS), size=8)]
+                self.assertEqual(sorted(hand, reverse=True, key=strategy._sort_key),
+                                 sorted(hand, reverse=True, key=lambda card: ranks[CARDS.index(card)]))
+
 
 if __name__ == '__main__':
     unittest.main()
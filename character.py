@@ -7,16 +7,38 @@ logger = logging.getLogger("turns").getChild(__name__)
 
 
 class Character:
+    __slots__ = ("_vulnerable", "_weak", "_turn", "block", "hp", "max_hp", "strength", "strength_buff")
 
-    def __init__(self, hp: int = 70) -> None:
+    def __init__(self, hp: int = 70, seed=None) -> None:
+        self.max_hp = hp
+        self.reset(seed)
+
+    def reset(self, seed=None) -> None:
+        # Back to the state __init__ left: subclasses reset their own state too, so that one
+        # character can play many fights instead of being rebuilt for each.
         self._vulnerable = 0
         self._weak = 0
         self._turn = 0
         self.block = 0
-        self.hp = hp
+        self.hp = self.max_hp
         self.strength = 0
         self.strength_buff = 0
 
+    def snapshot(self) -> tuple:
+        """The character's state as a tuple of ints, for restore(). Subclasses add their own state."""
+        return (self.hp, self.block, self.strength, self.strength_buff, self._vulnerable, self._weak, self._turn)
+
+    def restore(self, state: tuple, seed=None) -> None:
+        """Back to a snapshot() of this or a like character. The random streams are left as they
+        are, unless `seed` starts new ones as reset(seed) would."""
+        self._restore(state, seed)
+
+    def _restore(self, state: tuple, seed) -> tuple:
+        # Restores Character's part of the state and returns the rest, for the subclass's part.
+        (self.hp, self.block, self.strength, self.strength_buff, self._vulnerable, self._weak,
+         self._turn) = state[:7]
+        return state[7:]
+
     def defend(self, attack_damage: int) -> int:
         post_vulnerable_damage = int(
             attack_damage * (1.5 if self._vulnerable else 1.0))
@@ -27,17 +49,16 @@ class Character:
         post_hp_damage = min(self.hp, post_block_damage)
         self.hp -= post_hp_damage
 
-        logger.info(
-            f"{self.__class__.__name__} defend({attack_damage}), vulnerable: {self._vulnerable}, block: {self.block}"
-            f" damage: {attack_damage}->{post_vulnerable_damage}->{post_block_damage}->{post_hp_damage}, hp: {self.hp}")
+        logger.info("%s defend(%s), vulnerable: %s, block: %s damage: %s->%s->%s->%s, hp: %s",
+                    self.__class__.__name__, attack_damage, self._vulnerable, self.block,
+                    attack_damage, post_vulnerable_damage, post_block_damage, post_hp_damage, self.hp)
         if not self.hp:
-            logger.info(f"{self.__class__.__name__} DIED")
+            logger.info("%s DIED", self.__class__.__name__)
         return post_hp_damage
 
     def vulnerable(self, turns: int) -> None:
         self._vulnerable += turns
-        logger.debug(
-            f"{self.__class__.__name__} vulnerable({turns}), vulnerable: {self._vulnerable}")
+        logger.debug("%s vulnerable(%s), vulnerable: %s", self.__class__.__name__, turns, self._vulnerable)
 
     def end_turn(self):
         if self._vulnerable > 0:
@@ -46,8 +67,8 @@ class Character:
         if self._weak > 0:
             self._weak -= 1
         self._turn += 1
-        logger.debug(
-            f"{self.__class__.__name__} end_turn hp: {self.hp}, vulnerable: {self._vulnerable}, self.strength: {self.strength}")
+        logger.debug("%s end_turn hp: %s, vulnerable: %s, self.strength: %s",
+                     self.__class__.__name__, self.hp, self._vulnerable, self.strength)
 
     def get_turn(self):
         return self._turn
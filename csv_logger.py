@@ -1,39 +1,130 @@
-from card import Card
+import csv
 import logging
-from typing import Sequence
+import numbers
+from typing import Sequence, TextIO, Union
+
+import numpy
+
+from card import Card
 
 logger = logging.getLogger("turns").getChild(__name__)
 
+# The columnar format stores PLAY as the card's position in Card.
+PLAY_NAMES = [card.name for card in Card]
+PLAY_CODES = {name: code for code, name in enumerate(PLAY_NAMES)}
+
+
+def columnar_dtype(columns: Sequence[str]) -> numpy.dtype:
+    return numpy.dtype([(column, numpy.int8 if column == "PLAY" else numpy.int64) for column in columns])
+
+
+def columnar(columns: Sequence[str], rows: Sequence[tuple]) -> numpy.ndarray:
+    """Converts rows as written to the csv into a columnar_dtype() array."""
+    array = numpy.empty(len(rows), columnar_dtype(columns))
+    for column, values in zip(columns, zip(*rows)):
+        array[column] = [PLAY_CODES[str(v)] for v in values] if column == "PLAY" else values
+    return array
+
 
 class CsvLogger():
-    def __init__(self, header: str, logger=logging.getLogger("csv").info):
+    """Writes the training data, one row per card played, to `out` (a path or an open file).
+
+    Rows are "FINAL_HP,GAME,N_TURN,N_PLAY" followed by the values passed to play_card(),
+    which must fill the rest of `header`. A game's rows are buffered until it ends, since
+    they all carry its final hp; finished games are written with the csv module whenever
+    `buffer_rows` rows are pending, and by flush() and close(). The file is created, with
+    the header, on the first write.
+
+    If `npy_path` is set, close() also saves the rows there as a .npy structured array
+    of columnar_dtype(), with PLAY as a PLAY_CODES code."""
+
+    def __init__(self, header: str, out: Union[str, TextIO] = "sts.csv", buffer_rows: int = 8192,
+                 npy_path: str = None):
         self._plays = []
         self._turns = []
         self._game = 0
-        self._logger = logger
-        self._header = header
-        self._header_printed = False
+        self._columns = header.split(",")
+        # Where PLAY falls among the values play_card() is given, if at all.
+        self._play = self._columns.index("PLAY") - 4 if "PLAY" in self._columns[4:] else None
+        self._checked = False
+        self._out = out
+        self._file = None
+        self._writer = None
+        self._rows = []
+        self._buffer_rows = buffer_rows
+        self._collecting = False
+        self.npy_path = npy_path
+        self._chunks = []
+
+    def _open(self):
+        self._file = open(self._out, "w", newline="") if isinstance(self._out, str) else self._out
+        self._writer = csv.writer(self._file, lineterminator="\n")
+        self._writer.writerow(self._columns)
 
     def end_game(self, final_hp):
         if self._plays:
             self.next_turn()
-        if not self._header_printed:
-            self._logger(self._header)
-            self._header_printed = True
         for n_turn, turn in enumerate(self._turns):
             for n_play, play in enumerate(turn):
-                self._logger("%s", str((final_hp, self._game, n_turn, n_play) + play)[1:-1]
-                             .replace("'", "")
-                             .replace(" ", ""))
+                self._rows.append((final_hp, self._game, n_turn, n_play) + play)
         self._plays = []
         self._turns = []
 
         self._game += 1
+        if len(self._rows) >= self._buffer_rows:
+            self.flush()
+
+    def collect(self, game: int) -> list:
+        """Keeps rows in the returned list instead of writing them, numbering games from `game`.
+        Used by worker processes and lock-step games; the rows are written in order with log_rows()."""
+        self._rows = []
+        self._collecting = True
+        self._game = game
+        return self._rows
 
-    def play_card(self, elements: Sequence):
+    def log_rows(self, rows: Sequence[tuple]):
+        self._rows.extend(rows)
+        if len(self._rows) >= self._buffer_rows:
+            self.flush()
+
+    def flush(self):
+        # Nothing logged yet, e.g. a vector engine run, leaves any earlier file alone.
+        if self._collecting or not (self._rows or self._writer):
+            return
+        if not self._writer:
+            self._open()
+        self._writer.writerows(self._rows)
+        if self.npy_path:
+            self._chunks.append(columnar(self._columns, self._rows))
+        self._rows = []
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self._file and isinstance(self._out, str):
+            self._file.close()
+        if self.npy_path:
+            numpy.save(self.npy_path, numpy.concatenate(self._chunks or [columnar(self._columns, [])]))
+
+    def play_card(self, elements: tuple):
+        """Adds a row's values. The first row's are also checked against columnar_dtype(): a Card
+        or card name for PLAY and an integer for each other column. Later rows, from the same
+        caller, only have their number checked, since this runs for every card played."""
+        if len(elements) != len(self._columns) - 4:
+            raise ValueError(f"{len(elements)} values for {self._columns[4:]}")
+        if not self._checked:
+            self._check(elements)
         self._plays.append(elements)
 
+    def _check(self, elements: tuple):
+        for n, value in enumerate(elements):
+            if n == self._play:
+                if str(value) not in PLAY_CODES:
+                    raise ValueError(f"PLAY {value!r} is not a card")
+            elif not isinstance(value, numbers.Integral):
+                raise ValueError(f"{self._columns[n + 4]} {value!r} is not an integer")
+        self._checked = True
+
     def next_turn(self):
         self._turns.append(self._plays)
         self._plays = []
-       
\ No newline at end of file
@@ -1,38 +1,33 @@
+import io
+import os
+import tempfile
 import unittest
-import csv_logger
-import card
 
-log_history = ""
+import numpy
 
+import csv_logger
+import card
 
-def fake_logger(fmt, *args):
-    global log_history
-    print(f"logging: {fmt % args}")
-    log_history += fmt % args + "\n"
+HEADER = "FINAL_HP,GAME,N_TURN,N_PLAY,ENERGY,PLAY,A,B,C,D"
 
 
 class TestCsvLogger(unittest.TestCase):
     def setUp(self) -> None:
-        self.logger = csv_logger.CsvLogger("HEADER", fake_logger)
+        self.out = io.StringIO()
+        self.logger = csv_logger.CsvLogger(HEADER, self.out)
         return super().setUp()
 
-    def tearDown(self) -> None:
-        global log_history
-        log_history = ""
-        return super().tearDown()
-
     def test_simple_log(self):
-        global log_history
         self.logger.play_card((3, card.Card.ANGER, 10, 9, 8, 7))
         self.logger.next_turn()
         self.logger.end_game(5)
-        expected = """HEADER
+        self.logger.flush()
+        expected = HEADER + """
 5,0,0,0,3,ANGER,10,9,8,7
 """
-        self.assertEqual(expected, log_history)
+        self.assertEqual(expected, self.out.getvalue())
 
     def test_complex_log(self):
-        global log_history
         self.logger.play_card((3, card.Card.ANGER, 10, 9, 8, 7))
         self.logger.play_card((3, card.Card.BASH, 10, 9, 8, 7))
         self.logger.next_turn()
@@ -42,17 +37,73 @@ class TestCsvLogger(unittest.TestCase):
         self.logger.play_card((3, card.Card.DEMON_FORM, 10, 9, 8, 7))
         self.logger.next_turn()
         self.logger.end_game(10)
+        self.logger.close()
 
-        expected = """HEADER
+        expected = HEADER + """
 20,0,0,0,3,ANGER,10,9,8,7
 20,0,0,1,3,BASH,10,9,8,7
 20,0,1,0,3,DEFEND,10,9,8,7
 10,1,0,0,3,DEMON_FORM,10,9,8,7
 """
-        # expected = '\n'.join(
-        #     ["0,0,0,ANGER", "0,0,1,BASH", "0,1,0,DEFEND", "1,0,0,DEMON_FORM"]) + "\n"
+        self.assertEqual(expected, self.out.getvalue())
+
+    def test_buffered_until_full(self):
+        logger = csv_logger.CsvLogger(HEADER, self.out, buffer_rows=3)
+        for written in (0, 4, 4):
+            logger.play_card((3, card.Card.STRIKE, 10, 9, 8, 7))
+            logger.play_card((2, card.Card.STRIKE, 10, 9, 8, 7))
+            logger.end_game(1)
+            self.assertEqual(written, self.out.getvalue().count("STRIKE"))
+        logger.flush()
+        self.assertEqual(6, self.out.getvalue().count("STRIKE"))
+
+    def test_row_must_fill_header(self):
+        with self.assertRaises(ValueError):
+            self.logger.play_card((3, card.Card.ANGER, 10))
+
+    def test_row_must_match_dtype(self):
+        for row in ((3, "NOT_A_CARD", 10, 9, 8, 7), (3, card.Card.ANGER, 10, 9.5, 8, 7),
+                    ("3", card.Card.ANGER, 10, 9, 8, 7)):
+            with self.assertRaises(ValueError):
+                self.logger.play_card(row)
+        self.logger.play_card((numpy.int64(3), "ANGER", 10, 9, 8, 7))
+
+    def test_close_without_rows_keeps_file(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, "sts.csv")
+            with open(path, "w") as f:
+                f.write("earlier run\n")
+            csv_logger.CsvLogger(HEADER, path).close()
+            with open(path) as f:
+                self.assertEqual("earlier run\n", f.read())
+
+    def test_collect(self):
+        rows = self.logger.collect(game=7)
+        self.logger.play_card((3, card.Card.ANGER, 10, 9, 8, 7))
+        self.logger.end_game(5)
+        self.logger.flush()
+        self.assertEqual("", self.out.getvalue())
+
+        writer = csv_logger.CsvLogger(HEADER, self.out)
+        writer.log_rows(rows)
+        writer.flush()
+        self.assertEqual(HEADER + "\n5,7,0,0,3,ANGER,10,9,8,7\n", self.out.getvalue())
+
+    def test_npy(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sts.npy")
+            logger = csv_logger.CsvLogger(HEADER, self.out, buffer_rows=1, npy_path=path)
+            logger.play_card((3, card.Card.ANGER, 10, 9, 8, 7))
+            logger.end_game(20)
+            logger.play_card((2, card.Card.DEFEND, 10, 9, 8, 7))
+            logger.end_game(10)
+            logger.close()
+            rows = numpy.load(path)
 
-        self.assertEqual(expected, log_history)
+        self.assertEqual(tuple(HEADER.split(",")), rows.dtype.names)
+        numpy.testing.assert_equal([20, 10], rows["FINAL_HP"])
+        numpy.testing.assert_equal([0, 1], rows["GAME"])
+        self.assertEqual(["ANGER", "DEFEND"], [csv_logger.PLAY_NAMES[code] for code in rows["PLAY"]])
 
 
 if __name__ == '__main__':
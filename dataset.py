@@ -0,0 +1,125 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+
+import numpy
+
+import csv_logger
+
+logger = logging.getLogger("fastai").getChild(__name__)
+
+MANIFEST = "manifest.json"
+
+
+def read_rows(path: str) -> numpy.ndarray:
+    """Reads training rows from sts.py's .npy or .csv output as a csv_logger.columnar_dtype() array."""
+    if path.endswith(".npy"):
+        return numpy.load(path)
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        rows = numpy.array(list(reader), dtype=object).reshape(-1, len(columns))
+    array = numpy.empty(len(rows), csv_logger.columnar_dtype(columns))
+    for n, column in enumerate(columns):
+        values = rows[:, n]
+        array[column] = [csv_logger.PLAY_CODES[v] for v in values] if column == "PLAY" else values.astype(numpy.int64)
+    return array
+
+
+class Dataset:
+    """Training rows stored as a directory of append-only .npy segments plus a manifest.
+
+    Each append() writes one new segment, with GAME renumbered to follow the games already
+    stored, and splits it into training and validation rows once: the last `valid_fraction`
+    of its games are validation. Old segments are never read or rewritten by append()."""
+
+    def __init__(self, path: str, valid_fraction: float = 0.2):
+        self.path = path
+        self.valid_fraction = valid_fraction
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"columns": None, "games": 0, "rows": 0, "segments": []}
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    @property
+    def games(self) -> int:
+        return self.manifest["games"]
+
+    def append(self, rows: numpy.ndarray) -> dict:
+        columns = list(rows.dtype.names)
+        if self.manifest["columns"] is None:
+            self.manifest["columns"] = columns
+        elif columns != self.manifest["columns"]:
+            raise ValueError(f"columns {columns} do not match the dataset's {self.manifest['columns']}")
+        if not len(rows):
+            return None
+
+        rows = rows[numpy.argsort(rows["GAME"], kind="stable")]
+        games = numpy.unique(rows["GAME"], return_inverse=True)[1]
+        rows["GAME"] = games + self.games
+        n_games = int(games.max()) + 1
+        valid_games = int(round(n_games * self.valid_fraction))
+        segment = {
+            "file": f"{len(self.manifest['segments']):05d}.npy",
+            "rows": len(rows),
+            "first_game": self.games,
+            "games": n_games,
+            "valid_from": int(numpy.searchsorted(games, n_games - valid_games)),
+        }
+
+        os.makedirs(self.path, exist_ok=True)
+        numpy.save(os.path.join(self.path, segment["file"]), rows)
+        self.manifest["segments"].append(segment)
+        self.manifest["games"] += n_games
+        self.manifest["rows"] += len(rows)
+        self._save_manifest()
+        logger.info(f"appended {segment} to {self.path}")
+        return segment
+
+    def _save_manifest(self):
+        # Write then rename, so that a crash leaves the old manifest and an unlisted segment.
+        manifest_path = os.path.join(self.path, MANIFEST)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    def segment(self, n: int) -> numpy.ndarray:
+        return numpy.load(os.path.join(self.path, self.manifest["segments"][n]["file"]), mmap_mode="r")
+
+    def train_valid(self, first_segment: int = 0):
+        """Returns the training and the validation rows of the segments from `first_segment` on."""
+        train, valid = [], []
+        for n, segment in enumerate(self.manifest["segments"][first_segment:], first_segment):
+            rows = self.segment(n)
+            train.append(rows[:segment["valid_from"]])
+            valid.append(rows[segment["valid_from"]:])
+        dtype = csv_logger.columnar_dtype(self.manifest["columns"] or [])
+        return (numpy.concatenate(train) if train else numpy.empty(0, dtype),
+                numpy.concatenate(valid) if valid else numpy.empty(0, dtype))
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('dataset', help='dataset directory')
+    argparser.add_argument('rows', nargs='*', help='.npy or .csv files from sts.py to append')
+    argparser.add_argument(
+        '--valid', help='fraction of each segment\'s games kept for validation', type=float, default=0.2)
+    args = argparser.parse_args()
+
+    dataset = Dataset(args.dataset, args.valid)
+    for path in args.rows:
+        dataset.append(read_rows(path))
+    print(f"{args.dataset}: {len(dataset.manifest['segments'])} segments, {dataset.games} games, "
+          f"{len(dataset)} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+import numpy.testing
+
+import csv_logger
+import dataset
+from card import Card
+
+HEADER = "FINAL_HP,GAME,N_TURN,N_PLAY,PLAY,ENERGY"
+
+
+def rows(games, plays_per_game=2):
+    array = numpy.zeros(games * plays_per_game, csv_logger.columnar_dtype(HEADER.split(",")))
+    array["GAME"] = numpy.repeat(numpy.arange(games), plays_per_game)
+    array["N_PLAY"] = numpy.tile(numpy.arange(plays_per_game), games)
+    array["PLAY"] = csv_logger.PLAY_CODES["STRIKE"]
+    return array
+
+
+class TestDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sts.dataset")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_numbers_games(self):
+        store = dataset.Dataset(self.path)
+        store.append(rows(5))
+        store.append(rows(10))
+
+        store = dataset.Dataset(self.path)
+        self.assertEqual(15, store.games)
+        self.assertEqual(30, len(store))
+        numpy.testing.assert_equal(numpy.repeat(numpy.arange(5, 15), 2), store.segment(1)["GAME"])
+
+    def test_train_valid(self):
+        store = dataset.Dataset(self.path, valid_fraction=0.2)
+        store.append(rows(5))
+        store.append(rows(10))
+        train, valid = store.train_valid()
+
+        numpy.testing.assert_equal([4, 13, 14], numpy.unique(valid["GAME"]))
+        self.assertEqual(24, len(train))
+        self.assertFalse(set(train["GAME"]) & set(valid["GAME"]))
+        self.assertEqual(4, len(store.train_valid(first_segment=1)[1]))
+
+    def test_columns_must_match(self):
+        store = dataset.Dataset(self.path)
+        store.append(rows(2))
+        other = numpy.zeros(2, csv_logger.columnar_dtype(["FINAL_HP", "GAME"]))
+        with self.assertRaises(ValueError):
+            store.append(other)
+
+    def test_read_rows(self):
+        csv_path = os.path.join(self.tmp.name, "sts.csv")
+        npy_path = os.path.join(self.tmp.name, "sts.npy")
+        logger = csv_logger.CsvLogger(HEADER, csv_path, npy_path=npy_path)
+        logger.play_card((Card.BASH.name, 3))
+        logger.end_game(40)
+        logger.close()
+
+        numpy.testing.assert_equal(dataset.read_rows(npy_path), dataset.read_rows(csv_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
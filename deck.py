@@ -1,44 +1,174 @@
+import itertools
 import logging
 import logging.config
+import operator
+from collections.abc import Sequence
 from logging import config
 from typing import List, Union
 import numpy
 
-from card import Card
+from card import CARD_IDS, CARD_TAG_IDS, CARDS, Card, Tag, sort_ranks
 
 logger = logging.getLogger("turns").getChild(__name__)
 
+
+class CardView(Sequence):
+    """A read-only sequence of the Cards in one of a Deck's piles. It reads the pile each time it is
+    used instead of copying it: take a list() of it to keep the cards across changes to the deck."""
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids: list):
+        # The pile's list of card ids.
+        self._ids = ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [CARDS[card] for card in self._ids[index]]
+        return CARDS[self._ids[index]]
+
+    def __iter__(self):
+        return map(CARDS.__getitem__, self._ids)
+
+    def __contains__(self, card):
+        return card in CARD_IDS and CARD_IDS[card] in self._ids
+
+    def count(self, card) -> int:
+        return self._ids.count(CARD_IDS[card])
+
+    def __eq__(self, other):
+        if isinstance(other, (CardView, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class _DrawPileView(CardView):
+    # The draw pile is the undealt end of a list, which the deck replaces when it reshuffles.
+    # Reads go through the deck's pointer into that list rather than copying its end.
+    __slots__ = ("_deck",)
+
+    def __init__(self, deck):
+        self._deck = deck
+
+    def __len__(self):
+        return len(self._deck._draw) - self._deck._top
+
+    def __getitem__(self, index):
+        draw, top = self._deck._draw, self._deck._top
+        if isinstance(index, slice):
+            return [CARDS[draw[top + i]] for i in range(*index.indices(len(draw) - top))]
+        if index < 0:
+            index += len(draw) - top
+        if not 0 <= index < len(draw) - top:
+            raise IndexError("draw pile index out of range")
+        return CARDS[draw[top + index]]
+
+    def _undealt(self):
+        return itertools.islice(self._deck._draw, self._deck._top, None)
+
+    def __iter__(self):
+        return map(CARDS.__getitem__, self._undealt())
+
+    def __contains__(self, card):
+        return card in CARD_IDS and CARD_IDS[card] in self._undealt()
+
+    def count(self, card) -> int:
+        return operator.countOf(self._undealt(), CARD_IDS[card])
+
+
 class Deck:
+    """Cards are kept as their ids, positions in Card. Dealing advances a pointer into the draw pile
+    rather than removing its first card; once the pile is used up the discards list becomes the draw
+    pile, shuffled in place, and the old draw pile's list is emptied and reused for the discards.
+    The hand, which never holds more than a few cards, is a plain list of ids. The pile properties
+    are read-only views rather than copies.
+
+    The deck also keeps counts, updated as cards move, of each card and each Tag among the cards
+    that aren't exhausted, and of each card in the hand."""
+
+    __slots__ = ("_cards", "_shuffle", "_draw", "_top", "_discards", "_hand", "_exhausted", "_deals", "_rng",
+                 "_hand_view", "_counts", "_hand_counts", "_tag_counts")
+
     def __init__(self, cards, seed=1, shuffle=True):
-        self._deck = cards.copy()
+        self._cards = [CARD_IDS[card] for card in cards]
+        self._shuffle = shuffle
+        self._draw = []
         self._discards = []
         self._hand = []
         self._exhausted = []
+        self._hand_view = CardView(self._hand)
+        self._counts = [0] * len(CARDS)
+        self._hand_counts = [0] * len(CARDS)
+        self._tag_counts = [0] * len(Tag)
+        self.reset(seed)
+
+    def reset(self, seed=1):
+        """Starts over, as a new Deck of the same cards would, reusing this deck's lists."""
+        self._draw[:] = self._cards
+        self._top = 0
+        self._discards.clear()
+        self._hand.clear()
+        self._exhausted.clear()
         self._deals = 0
-        numpy.random.seed(seed=seed)
-        if shuffle:
-            numpy.random.shuffle(self._deck)
-        logger.info(f"Deck: {self._deck}")
+        self._rng = numpy.random.default_rng(seed)
+        if self._shuffle:
+            self._rng.shuffle(self._draw)
+        for counts in (self._counts, self._hand_counts, self._tag_counts):
+            counts[:] = [0] * len(counts)
+        self._add(self._draw)
+        logger.info("Deck: %s", self.deck)
+
+    def snapshot(self) -> tuple:
+        """The card ids of the draw pile, in the order they will be dealt, the discards, the hand
+        and the exhausted cards, as a tuple of tuples for restore()."""
+        return (tuple(self._draw[self._top:]), tuple(self._discards), tuple(self._hand), tuple(self._exhausted))
+
+    def restore(self, state: tuple, seed=None) -> None:
+        """Back to a snapshot() of a deck of the same cards, reusing this deck's lists. The shuffles
+        carry on from this deck's random stream, unless `seed` starts a new one as reset(seed) would."""
+        draw, discards, hand, exhausted = state
+        self._draw[:] = draw
+        self._top = 0
+        self._discards[:] = discards
+        self._hand[:] = hand
+        self._exhausted[:] = exhausted
+        if seed is not None:
+            self._rng = numpy.random.default_rng(seed)
+        for counts in (self._counts, self._hand_counts, self._tag_counts):
+            counts[:] = [0] * len(counts)
+        for pile in (draw, discards, hand):
+            self._add(pile)
+        for card in hand:
+            self._hand_counts[card] += 1
 
     def _deal(self) -> Union[Card, None]:
-        logger.debug(f"_deal: {self}")
+        logger.debug("_deal: %s", self)
 
-        if not self._deck:
+        if self._top == len(self._draw):
             if self._discards:
-                self._deck = self._discards.copy()
-                self._discards = []
-                logger.info(f"shuffling...")
-                numpy.random.shuffle(self._deck)
-                logger.debug(f"{self}")
+                self._draw, self._discards = self._discards, self._draw
+                self._discards.clear()
+                self._top = 0
+                logger.info("shuffling...")
+                self._rng.shuffle(self._draw)
+                logger.debug("%s", self)
 
-        if not self._deck:
+        if self._top == len(self._draw):
             return None
-        dealt = self._deck.pop(0)
+        dealt = self._draw[self._top]
+        self._top += 1
         self._hand.append(dealt)
-        return dealt
+        self._hand_counts[dealt] += 1
+        return CARDS[dealt]
 
     def deal(self, count=1) -> List[Card]:
-        logger.debug(f"deal: {self}")
+        logger.debug("deal: %s", self)
         cards = []
         while count > 0:
             card = self._deal()
@@ -47,53 +177,87 @@ class Deck:
             count -= 1
             cards.append(card)
 
-        logger.debug(f"deals: {self._deals}, dealt {self}")
-        logger.info(f"hand {self.hand}")
+        logger.debug("deals: %s, dealt %s", self._deals, self)
+        logger.info("hand %s", self.hand)
 
-        self._deals += 1 # 
+        self._deals += 1 #
         return cards
 
+    def _add(self, ids, sign=1):
+        for card in ids:
+            self._counts[card] += sign
+            for tag in CARD_TAG_IDS[card]:
+                self._tag_counts[tag] += sign
+
     def add_to_discards(self, cards):
-        logger.debug(f"add_to_discard {cards} for {self}")
-        self._discards.extend(cards)
+        logger.debug("add_to_discard %s for %s", cards, self)
+        ids = [CARD_IDS[card] for card in cards]
+        self._discards.extend(ids)
+        self._add(ids)
 
-    def discard_from_hand(self, cards):
-        logger.debug(f"discarding {cards} from {self}")
-        for card in cards:
+    def _remove_from_hand(self, cards) -> list:
+        # Ids first: `cards` may be this deck's own hand view.
+        ids = [CARD_IDS[card] for card in cards]
+        for card in ids:
             self._hand.remove(card)
+            self._hand_counts[card] -= 1
+        return ids
+
+    def discard_from_hand(self, cards):
+        logger.debug("discarding %s from %s", cards, self)
+        self._discards.extend(self._remove_from_hand(cards))
 
-        self.add_to_discards(cards)
-            
     def exhaust(self, cards):
-        for card in cards:
-            self._hand.remove(card)
-        self._exhausted.extend(cards)
+        ids = self._remove_from_hand(cards)
+        self._exhausted.extend(ids)
+        self._add(ids, -1)
+
+    def count(self, card: Card) -> int:
+        # Copies of `card` in all_cards().
+        return self._counts[CARD_IDS[card]]
+
+    def count_tag(self, tag: Tag) -> int:
+        # Cards in all_cards() tagged `tag`.
+        return self._tag_counts[tag.value]
+
+    def hand_count(self, card: Card) -> int:
+        return self._hand_counts[CARD_IDS[card]]
 
     def all_cards(self) -> List[Card]:
         # Does not include exhaust
-        return self._hand + self._deck + self._discards
+        return list(self.hand) + list(self.deck) + list(self.discards)
 
     def sort_hand(self, key):
         if key:
-            self._hand.sort(reverse=True, key=key)
+            self._hand.sort(reverse=True, key=sort_ranks(key).__getitem__)
         else:
-            numpy.random.shuffle(self._hand)
-        logger.debug(f"SORTED {self._hand}")
+            self._rng.shuffle(self._hand)
+        logger.debug("SORTED %s", self.hand)
+
+    def shuffle_draw_pile(self):
+        # Forgets the order of the cards left to deal, e.g. before playing out a copy of a game.
+        undealt = self._draw[self._top:]
+        self._rng.shuffle(undealt)
+        self._draw[self._top:] = undealt
+
+    def shuffle_hand(self, rng: numpy.random.Generator):
+        rng.shuffle(self._hand)
+        logger.debug("SHUFFLED %s", self.hand)
 
     def __str__(self):
-        return f"hand: {self._hand}, discards: {self._discards}, exhausted: {self.exhausted}, deck: {self._deck}"
+        return f"hand: {self.hand}, discards: {self.discards}, exhausted: {self.exhausted}, deck: {self.deck}"
 
     def get_deck(self):
-        return self._deck.copy()
+        return _DrawPileView(self)
 
     def get_discards(self):
-        return self._discards.copy()
+        return CardView(self._discards)
 
     def get_exhausted(self):
-        return self._exhausted.copy()
+        return CardView(self._exhausted)
 
     def get_hand(self):
-        return self._hand.copy()
+        return self._hand_view
 
     deck = property(get_deck)
     discards = property(get_discards)
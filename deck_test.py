@@ -1,7 +1,9 @@
 import logging.config
 import unittest
 
-from card import Card
+import numpy
+
+from card import Card, Tag
 from deck import Deck
 
 logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
@@ -66,15 +68,26 @@ class TestDeck(unittest.TestCase):
         self.assertEqual(0, deck.deal()[0].attack)
 
     def test_seed(self):
-        deck = Deck([Card.DEFEND, Card.STRIKE], seed=2)
+        deck = Deck([Card.DEFEND, Card.STRIKE], seed=3)
 
         card0, card1 = deck.deal(2)
 
         self.assertEqual(6, card0.attack)
         self.assertEqual(0, card1.attack)
 
+    def test_seed_is_per_deck(self):
+        cards = [Card.DEFEND] * 4 + [Card.STRIKE] * 5 + [Card.BASH]
+        first = Deck(cards, seed=4)
+        Deck(cards, seed=5).deal(5)
+        second = Deck(cards, seed=4)
+
+        self.assertEqual(first.deal(5), second.deal(5))
+        first.discard_from_hand(first.hand)
+        second.discard_from_hand(second.hand)
+        self.assertEqual(first.deal(10), second.deal(10))
+
     def test_deal_multi(self):
-        deck = Deck([Card.DEFEND, Card.STRIKE], seed=2)
+        deck = Deck([Card.DEFEND, Card.STRIKE], seed=3)
         cards = deck.deal(1)
         self.assertEqual(1, len(cards))
         self.assertEqual(6, cards[0].attack)
@@ -86,6 +99,90 @@ class TestDeck(unittest.TestCase):
         cards = deck.deal(1)
         self.assertEqual(0, len(cards))
 
+    def test_shuffles_match_list_deck(self):
+        # The order a deck of Card lists shuffled with the same generator would deal.
+        cards = [Card.DEFEND] * 4 + [Card.STRIKE] * 5 + [Card.BASH] + [Card.ANGER] * 3
+        rng = numpy.random.default_rng(7)
+        expected = cards.copy()
+        rng.shuffle(expected)
+        discards = expected[:5] + expected[5:10]
+        rng.shuffle(discards)
+
+        deck = Deck(cards, seed=7)
+        dealt = deck.deal(5)
+        deck.discard_from_hand(deck.hand)
+        dealt += deck.deal(5)
+        deck.discard_from_hand(deck.hand)
+        self.assertEqual(expected[:10], dealt)
+        self.assertEqual(expected[10:], deck.deal(3))
+        self.assertEqual(discards[:2], deck.deal(2))
+
+    def test_views(self):
+        deck = Deck([Card.STRIKE] * 3 + [Card.DEFEND] * 2, shuffle=False)
+        hand = deck.hand
+        deck.deal(4)
+        self.assertEqual([Card.STRIKE] * 3 + [Card.DEFEND], hand)
+        self.assertEqual(3, hand.count(Card.STRIKE))
+        self.assertIn(Card.DEFEND, hand)
+        self.assertNotIn(Card.BASH, hand)
+        self.assertEqual([Card.DEFEND], deck.deck)
+        self.assertEqual(Card.STRIKE, hand[0])
+        self.assertFalse(hasattr(hand, "append"))
+
+        deck.discard_from_hand([Card.STRIKE])
+        self.assertEqual([Card.STRIKE] * 2 + [Card.DEFEND], hand)
+        self.assertEqual([Card.STRIKE], deck.discards)
+
+    def test_draw_pile_view(self):
+        cards = [Card.STRIKE, Card.DEFEND, Card.BASH, Card.STRIKE, Card.ANGER, Card.DEFEND]
+        deck = Deck(cards, shuffle=False)
+        pile = deck.deck
+        deck.deal(2)
+        undealt = cards[2:]
+        self.assertEqual(undealt, pile)
+        self.assertEqual(len(undealt), len(pile))
+        for i in range(-len(undealt), len(undealt)):
+            self.assertEqual(undealt[i], pile[i])
+        for index in (slice(1, 3), slice(None, None, -1), slice(-2, None), slice(5, 9)):
+            self.assertEqual(undealt[index], pile[index])
+        for index in (len(undealt), -len(undealt) - 1):
+            with self.assertRaises(IndexError):
+                pile[index]
+        self.assertEqual(1, pile.count(Card.STRIKE))
+        self.assertEqual(0, pile.count(Card.POMMEL_STRIKE))
+        self.assertIn(Card.BASH, pile)
+        self.assertNotIn(Card.POMMEL_STRIKE, pile)
+        self.assertEqual(undealt.index(Card.DEFEND), pile.index(Card.DEFEND))
+
+    def test_anger_adds_cards(self):
+        deck = Deck([Card.ANGER])
+        for _ in range(100):
+            card, = deck.deal()
+            deck.discard_from_hand([card])
+            card.extra_action(deck)
+        self.assertEqual(101, len(deck.all_cards()))
+
+    def test_counts(self):
+        deck = Deck([Card.STRIKE] * 2 + [Card.PERFECTED_STRIKE, Card.DEFEND, Card.DEMON_FORM], shuffle=False)
+        self.assertEqual(3, deck.count_tag(Tag.STRIKE))
+        self.assertEqual(1, deck.count_tag(Tag.SKILL))
+        deck.deal(5)
+        self.assertEqual(2, deck.hand_count(Card.STRIKE))
+        self.assertEqual(0, deck.hand_count(Card.BASH))
+
+        deck.exhaust([Card.DEMON_FORM])
+        deck.discard_from_hand([Card.STRIKE])
+        deck.add_to_discards([Card.ANGER, Card.TWIN_STRIKE])
+        self.assertEqual(1, deck.hand_count(Card.STRIKE))
+        self.assertEqual(2, deck.count(Card.STRIKE))
+        self.assertEqual(0, deck.count_tag(Tag.POWER))
+        self.assertEqual(5, deck.count_tag(Tag.ATTACK))
+        for tag in Tag:
+            self.assertEqual(len([c for c in deck.all_cards() if tag in c.tags]), deck.count_tag(tag))
+        for card in Card:
+            self.assertEqual(deck.all_cards().count(card), deck.count(card))
+            self.assertEqual(deck.hand.count(card), deck.hand_count(card))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -6,12 +6,19 @@ from fastbook import *
 import fastbook
 import sys
 import aidata
+import csv_logger
+import dataset
+import inference
+import json
 import logging
 import logging.config
 
 logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
 logger = logging.getLogger("fastai")
 
+# Written instead of to.pkl when the model is fit on a dataset directory.
+DATASET_RECORD = "to.dataset.json"
+
 pd.options.display.max_rows = 100
 pd.options.display.max_columns = 8000
 pd.options.display.max_colwidth = 1000
@@ -29,42 +36,106 @@ def match_cols(r1, r2, cols):
     return True
 
 
+def rows_frame(rows):
+    # Columnar rows from sts.py --npy or a dataset: no parsing, and PLAY is already coded.
+    df = pd.DataFrame({column: rows[column] for column in rows.dtype.names}, copy=False)
+    df["PLAY"] = pd.Categorical.from_codes(df["PLAY"], csv_logger.PLAY_NAMES)
+    return df
+
+
+def read_rows(path):
+    if path.endswith(".npy"):
+        return rows_frame(np.load(path, mmap_mode="r"))
+    return pd.read_csv(path)
+
+
+def tabular(df, splits):
+    df['FINAL_HP_NEGATIVE'] = -df['FINAL_HP']
+    logger.debug(f"df:\n {df[:100]}")
+
+    cat_names = ['PLAY']
+    cont_names = aidata.CONT_DATA.split(',')
+    dep_var = 'FINAL_HP_DELTA'
+    dep_var = 'FINAL_HP_NEGATIVE'
+    return TabularPandas(df,
+                         procs=[Categorify],
+                         cat_names=cat_names,
+                         cont_names=cont_names,
+                         y_names=dep_var,
+                         splits=splits)
+
+
+def segment_to(data, n):
+    # Each segment is processed once and kept beside it: PLAY's categories are fixed, so its
+    # codes don't depend on the other segments.
+    segment = data.manifest["segments"][n]
+    path = os.path.join(data.path, segment["file"].replace(".npy", ".to.pkl"))
+    if os.path.exists(path):
+        return load_pickle(path)
+    splits = (list(range(segment["valid_from"])), list(range(segment["valid_from"], segment["rows"])))
+    to = tabular(rows_frame(data.segment(n)), splits)
+    save_pickle(path, to)
+    return to
+
+
+def dataset_to(path, segments=None):
+    # A dataset's segments were split into training and validation games when appended.
+    data = dataset.Dataset(path)
+    tos = [segment_to(data, n) for n in range(len(data.manifest["segments"]) if segments is None else segments)]
+    to = tos[0].new(pd.concat([t.train.items for t in tos] + [t.valid.items for t in tos], ignore_index=True))
+    to.split = sum(len(t.train) for t in tos)
+    return to
+
+
+def load_dataset_record():
+    """Returns the dataset the model was fit on, rebuilt from the segments it had then."""
+    with open(DATASET_RECORD) as f:
+        record = json.load(f)
+    segments = len(dataset.Dataset(record["path"]).manifest["segments"])
+    if segments < record["segments"]:
+        raise ValueError(f"{record['path']} has {segments} segments, the model was fit on {record['segments']}")
+    return dataset_to(record["path"], record["segments"])
+
+
 def get_to(csv_path=None):
     if not csv_path:
-        print("loading to.pkl", file=sys.stderr, flush=True)
-        to = load_pickle("to.pkl")
+        if os.path.exists(DATASET_RECORD):
+            # The model was fit on a dataset: its segments are already processed.
+            print(f"loading {DATASET_RECORD}", file=sys.stderr, flush=True)
+            to = load_dataset_record()
+        else:
+            print("loading to.pkl", file=sys.stderr, flush=True)
+            to = load_pickle("to.pkl")
         logger.debug(f"TO: {to[:2]}")
     else:
         logger.debug("READING csv...")
-        if os.path.exists('m.pkl'):
-            os.remove("m.pkl")
-        df = pd.read_csv(csv_path)
+        for old_path in ('m.pkl', inference.COMPILED_MODEL, 'to.pkl', DATASET_RECORD):
+            if os.path.exists(old_path):
+                os.remove(old_path)
+        if os.path.isdir(csv_path):
+            to = dataset_to(csv_path)
+            # Later appends to the dataset aren't part of the fit: only its current segments are.
+            with open(DATASET_RECORD, "w") as f:
+                json.dump({"path": os.path.abspath(csv_path),
+                           "segments": len(dataset.Dataset(csv_path).manifest["segments"])}, f)
+            logger.debug(f"TO: {to[:10]}")
+            return to
+        df = read_rows(csv_path)
+        last_game = df['GAME'].max()
+        logger.debug(f"last_game:\n {last_game}")
+
+        trn_split = df.index[df['GAME'] < last_game*.8].tolist()
+        val_split = df.index[df['GAME'] >= last_game*.8].tolist()
         logger.debug(f"df:\n {df[:100]}")
 
         # df = df.drop(["MONSTER_VULNERABLE"], axis=1)
         # df = df[df.MONSTER_HP <= 8]
         # df = df.reset_index(drop=True)
 
-        logger.debug(f"df.describe:\n {df.describe()}")
-        last_game = df.max(0)['GAME']
-        logger.debug(f"last_game:\n {last_game}")
-
-        trn_split = df.index[df['GAME'] < last_game*.8].tolist()
-        val_split = df.index[df['GAME'] >= last_game*.8].tolist()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"df.describe:\n {df.describe()}")
 
-        df['FINAL_HP_NEGATIVE'] = -df['FINAL_HP']
-        logger.debug(f"df:\n {df[:100]}")
-
-        cat_names = ['PLAY']
-        cont_names = aidata.CONT_DATA.split(',')
-        dep_var = 'FINAL_HP_DELTA'
-        dep_var = 'FINAL_HP_NEGATIVE'
-        to = TabularPandas(df,
-                           procs=[Categorify],
-                           cat_names=cat_names,
-                           cont_names=cont_names,
-                           y_names=dep_var,
-                           splits=(trn_split, val_split))
+        to = tabular(df, (trn_split, val_split))
         save_pickle('to.pkl', to)
         logger.debug(f"TO: {to[:10]}")
 
@@ -86,6 +157,17 @@ def rf(xs, y, n_estimators=40, max_samples=200_000,
                                  min_samples_leaf=min_samples_leaf, oob_score=True).fit(xs, y)
 
 
+def add_trees(m, xs, y, n_trees=10, max_trees=40):
+    # Fits n_trees more trees of forest m on xs, y only, then drops the oldest trees past
+    # max_trees: the refit costs the same however much data the older trees were fit on.
+    # No OOB score, since the trees were fit on different rows.
+    m.set_params(warm_start=True, oob_score=False, n_estimators=len(m.estimators_) + n_trees)
+    m.fit(xs, y)
+    m.estimators_ = m.estimators_[-max_trees:]
+    m.n_estimators = len(m.estimators_)
+    return m
+
+
 def get_m_randomforest(xs, y):
     logger.debug(f"xs: {xs[:10]}, y: {y[0]}")
     if os.path.exists("m.pkl"):
@@ -147,6 +229,18 @@ def setup_model():
     return get_m(xs, y)
 
 
+def export_model(m):
+    # AIPlayer loads the compiled model when it exists, without importing this module.
+    print(f"writing {inference.COMPILED_MODEL}", file=sys.stderr, flush=True)
+    forest = inference.CompiledForest.from_model(m, to.procs.categorify.classes['PLAY'].o2i)
+    forest.save()
+    return forest
+
+
+def setup_predictor():
+    return export_model(setup_model())
+
+
 def predict(data, m):
     cats = to.procs.categorify.classes['PLAY']
 
@@ -172,6 +266,8 @@ if __name__ == "__main__":
     valid_xs, valid_y = to.valid.xs, to.valid.y
 
     m = get_m(xs, y)
+    export_model(m)
+    print(f"validation rmse: {m_rmse(m, valid_xs, valid_y)}", file=sys.stderr, flush=True)
     fi = rf_feat_importance(m, xs)
     print(f"feature importance:\n{fi}", file=sys.stderr, flush=True)
     logger.debug(f"fi: {fi}")
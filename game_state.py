@@ -0,0 +1,28 @@
+from collections import namedtuple
+
+import numpy
+
+from monster import Monster
+from player import Player
+
+GameState = namedtuple("GameState", "player deck monster")
+GameState.__doc__ = """The whole state of a fight between turns or card plays: the snapshot() tuples of the
+player, its deck and the monster. It's hashable, so it can key a cache or transposition table, and
+cheap to take and restore, unlike a copy.deepcopy of the objects. The random streams aren't part
+of it: see restore."""
+
+
+def snapshot(player: Player, monster: Monster) -> GameState:
+    return GameState(player.snapshot(), player.deck.snapshot(), monster.snapshot())
+
+
+def restore(state: GameState, player: Player, monster: Monster, seed=None) -> None:
+    """Puts the player, its deck and the monster back in `state`. Their random streams carry on as
+    they are; a `seed` starts new ones, split as simulation.setup_trial splits a trial's seed, so that
+    rollouts from one state can each play out differently."""
+    deck_seed = monster_seed = player_seed = None
+    if seed is not None:
+        deck_seed, monster_seed, player_seed = numpy.random.SeedSequence(seed).spawn(3)
+    player.deck.restore(state.deck, deck_seed)
+    player.restore(state.player, player_seed)
+    monster.restore(state.monster, monster_seed)
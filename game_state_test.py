@@ -0,0 +1,84 @@
+import logging.config
+import unittest
+
+import game_state
+import simulation
+from card import IRONCLAD_STARTER, Card
+from monster import Cultist, JawWorm
+from player import AttackingPlayer, RandomPlayer
+
+logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
+
+CARDS = IRONCLAD_STARTER + [Card.ANGER, Card.POMMEL_STRIKE]
+
+
+def rng_states(player, monster):
+    return [character._rng.bit_generator.state for character in (player.deck, player, monster)]
+
+
+def set_rng_states(player, monster, states):
+    for character, state in zip((player.deck, player, monster), states):
+        character._rng.bit_generator.state = state
+
+
+def play(player, monster, turns):
+    for _ in range(turns):
+        if monster.hp and player.hp:
+            player.play_turn(monster)
+    result = simulation.trial_result(player, monster)
+    return (result._replace(blocks=list(result.blocks), played_cards=list(result.played_cards)),
+            game_state.snapshot(player, monster))
+
+
+class TestGameState(unittest.TestCase):
+    def test_restore_replays(self):
+        for strategy, monster_factory in ((RandomPlayer, JawWorm), (AttackingPlayer, Cultist)):
+            for seed in range(10):
+                player, monster = simulation.setup_trial(strategy, CARDS, monster_factory, seed)
+                play(player, monster, 3)
+                state, rngs = game_state.snapshot(player, monster), rng_states(player, monster)
+                self.assertEqual(state, game_state.snapshot(player, monster))
+                self.assertEqual(hash(state), hash(game_state.snapshot(player, monster)))
+                expected = play(player, monster, 4)
+
+                game_state.restore(state, player, monster)
+                self.assertEqual(state, game_state.snapshot(player, monster))
+                set_rng_states(player, monster, rngs)
+                self.assertEqual(expected, play(player, monster, 4))
+
+    def test_restore_other_objects(self):
+        player, monster = simulation.setup_trial(RandomPlayer, CARDS, JawWorm, 3)
+        play(player, monster, 2)
+        state = game_state.snapshot(player, monster)
+
+        other_player, other_monster = simulation.setup_trial(RandomPlayer, CARDS, JawWorm, 4)
+        play(other_player, other_monster, 5)
+        game_state.restore(state, other_player, other_monster, seed=5)
+        self.assertEqual(state, game_state.snapshot(other_player, other_monster))
+        for card in CARDS:
+            self.assertEqual(player.deck.count(card), other_player.deck.count(card))
+
+        # The earlier turns' blocks and played cards aren't part of the state: the other player
+        # keeps its own, cut back to the state's turns, and the turns played on match.
+        self.assertEqual(2, len(other_player.blocks))
+        self.assertEqual(2, len(other_player.played_cards))
+        game_state.restore(state, player, monster, seed=5)
+        (result, state), (other_result, other_state) = play(player, monster, 3), play(other_player, other_monster, 3)
+        self.assertEqual(state, other_state)
+        self.assertEqual(result._replace(blocks=result.blocks[2:], played_cards=result.played_cards[2:]),
+                         other_result._replace(blocks=other_result.blocks[2:],
+                                               played_cards=other_result.played_cards[2:]))
+
+    def test_restore_seed(self):
+        player, monster = simulation.setup_trial(RandomPlayer, CARDS, JawWorm, 1)
+        state = game_state.snapshot(player, monster)
+        results = []
+        for seed in (7, 8, 7):
+            game_state.restore(state, player, monster, seed)
+            results.append(play(player, monster, 6))
+        self.assertEqual(results[0], results[2])
+        self.assertNotEqual(results[0], results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
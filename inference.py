@@ -0,0 +1,173 @@
+import collections
+import logging
+import os
+from typing import Sequence
+
+import numpy
+
+import aidata
+from card import Card
+
+logger = logging.getLogger("fastai").getChild(__name__)
+
+FEATURES = ["PLAY"] + aidata.CONT_DATA.split(",")
+
+
+COMPILED_MODEL = "m.npz"
+
+
+class CompiledForest:
+    """A sklearn forest (or single tree) flattened into contiguous numpy arrays.
+
+    All trees share one set of node arrays. children[2 * node] and children[2 * node + 1] are the
+    left and right child of an internal node, with leaves stored as -1 - leaf, so predict() can
+    walk every (row, tree) pair at once and drop the pairs that reached a leaf.
+    Loading it needs neither sklearn nor fastai. `codes` maps card names to the PLAY category
+    codes the model was fit on."""
+
+    def __init__(self, feature, threshold, children, value, roots, codes):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.codes = codes
+
+    @classmethod
+    def from_model(cls, m, codes):
+        trees = [e.tree_ for e in getattr(m, "estimators_", [m])]
+        offsets = numpy.cumsum([0] + [tree.node_count for tree in trees])
+        feature, threshold, children, value = [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            leaf = tree.children_left == -1
+            feature.append(numpy.where(leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            # Leaves' own children are -1; whatever they encode to is never read.
+            child = numpy.stack([tree.children_left, tree.children_right], axis=1).ravel()
+            children.append(numpy.where(leaf[child], -1 - (child + offset), child + offset))
+            value.append(tree.value[:, 0, 0])
+        roots = [offset if tree.node_count > 1 else -1 - offset for tree, offset in zip(trees, offsets)]
+        return cls(numpy.concatenate(feature).astype(numpy.int32),
+                   numpy.concatenate(threshold),
+                   numpy.concatenate(children).astype(numpy.int32),
+                   numpy.concatenate(value),
+                   numpy.array(roots, dtype=numpy.int32),
+                   dict(codes))
+
+    def save(self, path: str = COMPILED_MODEL):
+        numpy.savez(path, feature=self.feature, threshold=self.threshold, children=self.children,
+                    value=self.value, roots=self.roots,
+                    play_names=list(self.codes.keys()), play_codes=list(self.codes.values()))
+
+    @classmethod
+    def load(cls, path: str = COMPILED_MODEL):
+        with numpy.load(path) as f:
+            codes = dict(zip(f["play_names"].tolist(), f["play_codes"].tolist()))
+            return cls(f["feature"], f["threshold"], f["children"], f["value"], f["roots"], codes)
+
+    def predict(self, xs: numpy.ndarray) -> numpy.ndarray:
+        n_rows, n_features = xs.shape
+        n_trees = len(self.roots)
+        flat_xs = xs.ravel()
+        nodes = numpy.tile(self.roots, n_rows)
+        row_offsets = numpy.repeat(numpy.arange(0, n_rows * n_features, n_features), n_trees)
+        pairs = numpy.arange(len(nodes))
+        leaves = numpy.empty_like(nodes)
+        while len(pairs):
+            done = nodes < 0
+            if done.any():
+                leaves[pairs[done]] = -1 - nodes[done]
+                walking = ~done
+                pairs, nodes, row_offsets = pairs[walking], nodes[walking], row_offsets[walking]
+            go_right = flat_xs[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+
+        # Sum tree by tree, in the same order as sklearn, so that scores match it exactly.
+        y_hat = numpy.zeros(n_rows)
+        for values in self.value[leaves].reshape(n_rows, n_trees).T:
+            y_hat += values
+        return y_hat / n_trees
+
+
+def model_stamp(path: str = COMPILED_MODEL):
+    """Changes whenever the model file is rewritten; None if there is none."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CachedPredictor:
+    """A bounded LRU cache of scores by exact feature row in front of a model.
+
+    The feature space is small and discrete, so the same rows come up again and again
+    across games; those skip the model entirely. A cache belongs to one model, make a new
+    one when the model is retrained."""
+
+    def __init__(self, model, maxsize: int = 1 << 16):
+        self.model = model
+        self.codes = model.codes
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._scores = collections.OrderedDict()
+
+    def __str__(self):
+        lookups = max(self.hits + self.misses, 1)
+        return (f"{self.hits} hits, {self.misses} misses ({100 * self.hits / lookups:.1f}% hits), "
+                f"{len(self._scores)} cached")
+
+    def predict(self, xs: numpy.ndarray) -> numpy.ndarray:
+        ps = numpy.empty(len(xs))
+        missing = {}  # Rows by key, so that repeats within xs are scored once too.
+        for i, row in enumerate(xs):
+            key = row.tobytes()
+            score = self._scores.get(key)
+            if score is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                self._scores.move_to_end(key)
+                ps[i] = score
+        self.misses += len(missing)
+        self.hits += len(xs) - len(missing)
+
+        if missing:
+            scores = self.model.predict(xs[[rows[0] for rows in missing.values()]])
+            for (key, rows), score in zip(missing.items(), scores):
+                ps[rows] = score
+                self._scores[key] = score
+            while len(self._scores) > self.maxsize:
+                self._scores.popitem(last=False)
+        return ps
+
+
+class DecisionBatch:
+    """Preallocated feature rows for pending card decisions, from one game or many,
+    scored together with one predict call."""
+
+    def __init__(self, codes, capacity: int = 64):
+        self._codes = codes
+        self._xs = numpy.zeros((capacity, len(FEATURES)), dtype=numpy.float32)
+        self._rows = 0
+
+    def __len__(self):
+        return self._rows
+
+    def add(self, cards: Sequence[Card], state: Sequence) -> slice:
+        """Adds one row per candidate card; `state` holds the aidata.CONT_DATA values.
+        Returns the rows' slice into the scores from predict()."""
+        start, stop = self._rows, self._rows + len(cards)
+        while stop > len(self._xs):
+            self._xs = numpy.concatenate([self._xs, numpy.zeros_like(self._xs)])
+        rows = self._xs[start:stop]
+        rows[:, 0] = [self._codes[c.name] for c in cards]
+        rows[:, 1:] = state
+        self._rows = stop
+        return slice(start, stop)
+
+    def predict(self, model) -> numpy.ndarray:
+        return model.predict(self._xs[:self._rows])
+
+    def clear(self):
+        self._rows = 0
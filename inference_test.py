@@ -0,0 +1,138 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy
+import numpy.testing
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+import inference
+from card import Card
+
+CODES = {"BASH": 1, "DEFEND": 2, "STRIKE": 3}
+
+
+class SumModel:
+    def predict(self, xs):
+        return xs.sum(axis=1)
+
+
+class TestDecisionBatch(unittest.TestCase):
+    def test_add(self):
+        batch = inference.DecisionBatch(CODES)
+        state = list(range(len(inference.FEATURES) - 1))
+        rows = batch.add([Card.STRIKE, Card.BASH], state)
+
+        self.assertEqual(slice(0, 2), rows)
+        numpy.testing.assert_equal([3 + sum(state), 1 + sum(state)], batch.predict(SumModel())[rows])
+
+    def test_many_games(self):
+        batch = inference.DecisionBatch(CODES, capacity=2)
+        state = [0] * (len(inference.FEATURES) - 1)
+        first = batch.add([Card.DEFEND], state)
+        second = batch.add([Card.STRIKE, Card.BASH, Card.DEFEND], [1] + state[1:])
+
+        ps = batch.predict(SumModel())
+        self.assertEqual(4, len(batch))
+        numpy.testing.assert_equal([2], ps[first])
+        numpy.testing.assert_equal([4, 2, 3], ps[second])
+
+    def test_clear(self):
+        batch = inference.DecisionBatch(CODES)
+        batch.add([Card.DEFEND], [0] * (len(inference.FEATURES) - 1))
+        batch.clear()
+        self.assertEqual(0, len(batch))
+
+
+class CountingSumModel(SumModel):
+    codes = CODES
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict(self, xs):
+        self.rows += len(xs)
+        return super().predict(xs)
+
+
+class TestCachedPredictor(unittest.TestCase):
+    def test_repeats_skip_model(self):
+        model = CountingSumModel()
+        cache = inference.CachedPredictor(model)
+        xs = numpy.array([[1, 2], [3, 4]], dtype=numpy.float32)
+
+        numpy.testing.assert_equal([3, 7], cache.predict(xs))
+        numpy.testing.assert_equal([7, 3, 11], cache.predict(numpy.array([[3, 4], [1, 2], [5, 6]],
+                                                                         dtype=numpy.float32)))
+        self.assertEqual(3, model.rows)
+        self.assertEqual((2, 3), (cache.hits, cache.misses))
+        self.assertEqual(CODES, cache.codes)
+
+    def test_repeats_within_batch(self):
+        model = CountingSumModel()
+        cache = inference.CachedPredictor(model)
+        numpy.testing.assert_equal([3, 3], cache.predict(numpy.array([[1, 2], [1, 2]], dtype=numpy.float32)))
+        self.assertEqual(1, model.rows)
+
+    def test_least_recently_used_is_evicted(self):
+        model = CountingSumModel()
+        cache = inference.CachedPredictor(model, maxsize=2)
+        a, b, c = (numpy.array([[v, 0]], dtype=numpy.float32) for v in (1, 2, 3))
+        cache.predict(a)
+        cache.predict(b)
+        cache.predict(a)
+        cache.predict(c)
+        self.assertEqual(3, model.rows)
+
+        cache.predict(a)
+        self.assertEqual(3, model.rows)
+        cache.predict(b)
+        self.assertEqual(4, model.rows)
+
+    def test_model_stamp(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "m.npz")
+            self.assertIsNone(inference.model_stamp(path))
+            numpy.savez(path, value=[1])
+            stamp = inference.model_stamp(path)
+            numpy.savez(path, value=[1, 2])
+            self.assertNotEqual(stamp, inference.model_stamp(path))
+
+
+class TestCompiledForest(unittest.TestCase):
+    def setUp(self):
+        rng = numpy.random.default_rng(0)
+        self.xs = rng.integers(0, 20, (500, len(inference.FEATURES))).astype(numpy.float32)
+        self.y = self.xs[:, 0] * 2 - self.xs[:, 3] + rng.normal(size=len(self.xs))
+
+    def test_matches_forest(self):
+        m = RandomForestRegressor(n_estimators=5, min_samples_leaf=5, random_state=0).fit(self.xs, self.y)
+        forest = inference.CompiledForest.from_model(m, CODES)
+        numpy.testing.assert_array_equal(m.predict(self.xs), forest.predict(self.xs))
+
+    def test_matches_tree(self):
+        m = DecisionTreeRegressor(max_leaf_nodes=16).fit(self.xs, self.y)
+        forest = inference.CompiledForest.from_model(m, CODES)
+        numpy.testing.assert_array_equal(m.predict(self.xs), forest.predict(self.xs))
+
+    def test_save_and_load(self):
+        m = RandomForestRegressor(n_estimators=3, random_state=0).fit(self.xs, self.y)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "m.npz")
+            inference.CompiledForest.from_model(m, CODES).save(path)
+            forest = inference.CompiledForest.load(path)
+
+        self.assertEqual(CODES, forest.codes)
+        numpy.testing.assert_array_equal(m.predict(self.xs[:10]), forest.predict(self.xs[:10]))
+
+    def test_player_does_not_import_sklearn(self):
+        code = "import sys, player; print(sorted(m for m in ('sklearn', 'fastai') if m in sys.modules))"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual("[]", out.stdout.strip())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import argparse
+import functools
+import logging
+from collections import namedtuple
+
+import numpy
+
+from monster import JawWorm, JawWormMode
+
+logger = logging.getLogger("sts").getChild(__name__)
+
+MODES = list(JawWormMode)
+ROLLS = 100
+
+IntentDistributions = namedtuple("IntentDistributions", "modes attack block strength")
+IntentDistributions.__doc__ = """Per turn of a JawWorm fight, the exact probability of each mode (turns, modes) and
+of each value of its attack, block and strength (turns, values), the values counting from 0."""
+
+
+def next_mode_probabilities(modes: list) -> numpy.ndarray:
+    """Returns the probability of each of MODES following `modes`: the share of the rolls
+    JawWorm._get_next_mode would keep that ask for the mode."""
+    rolls = numpy.zeros(len(MODES))
+    for r in range(ROLLS):
+        mode = JawWorm._roll_mode(r)
+        if not JawWorm._repeats(mode, modes):
+            rolls[MODES.index(mode)] += 1
+    return rolls / rolls.sum()
+
+
+@functools.lru_cache(maxsize=None)
+def chain():
+    """Returns JawWorm's states, the (previous mode, mode) pairs reachable from its opening
+    (None, CHOMP), and the matrix of transition probabilities between them. The last two
+    modes are all the no-repeat rules look at."""
+    states = [(None, JawWormMode.CHOMP)]
+    transitions = []
+    # states grows as new ones are reached.
+    for previous, mode in states:
+        probabilities = next_mode_probabilities([m for m in (previous, mode) if m])
+        row = {}
+        for next_mode, probability in zip(MODES, probabilities):
+            if probability:
+                if (mode, next_mode) not in states:
+                    states.append((mode, next_mode))
+                row[states.index((mode, next_mode))] = probability
+        transitions.append(row)
+
+    matrix = numpy.zeros((len(states), len(states)))
+    for state, row in enumerate(transitions):
+        for next_state, probability in row.items():
+            matrix[state, next_state] = probability
+    return states, matrix
+
+
+@functools.lru_cache(maxsize=None)
+def sampler_tables():
+    """Returns, for each state of chain(), the cumulative probabilities of the next mode in MODES
+    order and the state each next mode leads to (-1 for modes the state can't go to)."""
+    states, _ = chain()
+    cumulative = numpy.zeros((len(states), len(MODES)))
+    next_states = numpy.full((len(states), len(MODES)), -1)
+    for state, (previous, mode) in enumerate(states):
+        cumulative[state] = numpy.cumsum(next_mode_probabilities([m for m in (previous, mode) if m]))
+        for i, next_mode in enumerate(MODES):
+            if (mode, next_mode) in states:
+                next_states[state, i] = states.index((mode, next_mode))
+    return cumulative, next_states
+
+
+def sample_modes(turns: int, trials: int, rng: numpy.random.Generator) -> numpy.ndarray:
+    """Returns (trials, turns) indices into MODES of JawWorm fights: one uniform draw per trial
+    and turn against sampler_tables(), where JawWorm itself rolls again on a repeat."""
+    cumulative, next_states = sampler_tables()
+    states = numpy.zeros(trials, dtype=int)
+    modes = numpy.empty((trials, turns), dtype=int)
+    modes[:, :1] = MODES.index(JawWormMode.CHOMP)
+    for turn in range(1, turns):
+        modes[:, turn] = (rng.random(trials)[:, None] >= cumulative[states]).sum(1)
+        states = next_states[states, modes[:, turn]]
+    return modes
+
+
+@functools.lru_cache(maxsize=None)
+def mode_intents():
+    """Returns a (modes, 3) array of the (planned_damage, block, strength gain) each mode of
+    MODES sets up, read from JawWorm._setup_mode."""
+    jw = JawWorm()
+    intents = []
+    for mode in MODES:
+        jw._mode, jw.block, jw.strength = mode, 0, 0
+        jw._setup_mode()
+        intents.append((jw.planned_damage, jw.block, jw.strength))
+    return numpy.array(intents)
+
+
+def distributions(turns: int) -> IntentDistributions:
+    """The exact IntentDistributions of the first `turns` turns, as if the fight always lasts
+    that long. Turn 0 is the opening CHOMP; the attack is JawWorm.attack(), planned damage plus
+    the strength of every BELLOW so far, and the block is what the player attacks into."""
+    states, matrix = chain()
+    mode = numpy.array([MODES.index(m) for _, m in states])
+    damage, block, gain = mode_intents()[mode].T
+    strengths = gain.max() * turns + 1
+
+    # p[state, strength] for the current turn.
+    p = numpy.zeros((len(states), strengths))
+    p[0, 0] = 1.0
+    modes = numpy.zeros((turns, len(MODES)))
+    attack = numpy.zeros((turns, damage.max() + strengths))
+    blocks = numpy.zeros((turns, block.max() + 1))
+    strength = numpy.zeros((turns, strengths))
+    for turn in range(turns):
+        if turn:
+            moved = matrix.T @ p
+            p = numpy.zeros_like(p)
+            for state in range(len(states)):
+                p[state, gain[state]:] = moved[state, :strengths - gain[state]]
+        by_state = p.sum(1)
+        numpy.add.at(modes[turn], mode, by_state)
+        numpy.add.at(blocks[turn], block, by_state)
+        strength[turn] = p.sum(0)
+        for state in range(len(states)):
+            if damage[state]:
+                attack[turn, damage[state]:damage[state] + strengths] += p[state]
+            else:
+                attack[turn, 0] += by_state[state]
+    return IntentDistributions(modes, attack, blocks, strength)
+
+
+def expected(probabilities: numpy.ndarray) -> numpy.ndarray:
+    # The mean of each turn's (values,) probabilities.
+    return probabilities @ numpy.arange(probabilities.shape[1])
+
+
+def expected_damage_taken(attack: numpy.ndarray, block_counts: numpy.ndarray) -> numpy.ndarray:
+    """Returns the expected max(0, attack - block) of each turn, from the (turns, values)
+    probabilities of the attack and counts of the player's block. The two are taken to be
+    independent, as they are for players whose plays don't look at the intent."""
+    turns = min(len(attack), len(block_counts))
+    taken = numpy.zeros(turns)
+    for turn in range(turns):
+        counts = block_counts[turn]
+        if not counts.sum():
+            continue
+        attacks = numpy.arange(attack.shape[1])
+        blocks = numpy.arange(len(counts))
+        through = numpy.maximum(0, attacks[:, None] - blocks[None, :])
+        taken[turn] = attack[turn] @ through @ (counts / counts.sum())
+    return taken
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="print the exact per-turn distribution of JawWorm's intents")
+    argparser.add_argument('--turns', help='number of turns', type=int, default=20)
+    args = argparser.parse_args()
+
+    intents = distributions(args.turns)
+    print("TURN " + " ".join(f"{m.name:>6}" for m in MODES) + " ATTACK BLOCK STRENGTH")
+    for turn, (modes, attack, block, strength) in enumerate(zip(
+            intents.modes, expected(intents.attack), expected(intents.block), expected(intents.strength))):
+        print(f"{turn:4} " + " ".join(f"{p:6.3f}" for p in modes) +
+              f" {attack:6.2f} {block:5.2f} {strength:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
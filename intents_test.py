@@ -0,0 +1,60 @@
+import logging.config
+import unittest
+
+import numpy
+import numpy.testing
+
+import intents
+from monster import JawWorm, JawWormMode
+
+logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
+
+
+class TestChain(unittest.TestCase):
+    def test_chain(self):
+        states, matrix = intents.chain()
+        self.assertEqual(8, len(states))
+        numpy.testing.assert_allclose(1.0, matrix.sum(1))
+        thrash_thrash = states.index((JawWormMode.THRASH, JawWormMode.THRASH))
+        self.assertAlmostEqual(24 / 70, matrix[thrash_thrash, states.index((JawWormMode.THRASH, JawWormMode.CHOMP))])
+        self.assertAlmostEqual(46 / 70, matrix[thrash_thrash, states.index((JawWormMode.THRASH, JawWormMode.BELLOW))])
+
+    def test_distributions_match_jawworm(self):
+        turns, fights = 8, 4000
+        attack, block, strength = numpy.zeros((3, fights, turns))
+        for fight in range(fights):
+            jw = JawWorm(seed=fight)
+            for turn in range(turns):
+                attack[fight, turn], block[fight, turn], strength[fight, turn] = jw.attack(), jw.block, jw.strength
+                jw.end_turn()
+
+        exact = intents.distributions(turns)
+        for distribution in exact:
+            numpy.testing.assert_allclose(1.0, distribution.sum(1))
+        numpy.testing.assert_allclose(attack.mean(0), intents.expected(exact.attack), atol=0.5)
+        numpy.testing.assert_allclose(block.mean(0), intents.expected(exact.block), atol=0.2)
+        numpy.testing.assert_allclose(strength.mean(0), intents.expected(exact.strength), atol=0.3)
+        self.assertEqual(12, intents.expected(exact.attack)[0])
+
+    def test_sample_modes(self):
+        turns = 12
+        modes = intents.sample_modes(turns, 5000, numpy.random.default_rng(1))
+        names = ["".join(intents.MODES[m].name[0] for m in row) for row in modes]
+        for name in names:
+            self.assertNotIn("BB", name)
+            self.assertNotIn("CC", name)
+            self.assertNotIn("TTT", name)
+        frequencies = numpy.stack([(modes == i).mean(0) for i in range(len(intents.MODES))], 1)
+        numpy.testing.assert_allclose(intents.distributions(turns).modes, frequencies, atol=0.03)
+
+    def test_expected_damage_taken(self):
+        # An attack of 10 or 20 half the time each, into a block of 0 or 15 half the time each.
+        attack = numpy.zeros((1, 21))
+        attack[0, [10, 20]] = 0.5
+        block_counts = numpy.zeros((1, 16))
+        block_counts[0, [0, 15]] = 3
+        self.assertEqual([(10 + 20 + 0 + 5) / 4], intents.expected_damage_taken(attack, block_counts).tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import logging
+from typing import Sequence
+
+from inference import DecisionBatch
+from monster import Monster
+from player import Player
+
+logger = logging.getLogger("turns").getChild(__name__)
+
+
+def _advance(game, scores=None):
+    try:
+        return game.send(scores)
+    except StopIteration:
+        return None
+
+
+def play_games(players: Sequence[Player], monsters: Sequence[Monster], turns: int, predictor) -> int:
+    """Plays players[i] against monsters[i] for every i, advancing all games together.
+
+    Each step collects the pending card decision of every unfinished game, scores them all
+    with one predictor.predict() call and sends each game its scores. Players that never
+    ask for a score (everything but AIPlayer) finish on their first step.
+    Returns the number of steps, i.e. predict calls."""
+    games = [player.play_game_steps(monster, turns) for player, monster in zip(players, monsters)]
+    pending = [(game, request) for game in games if (request := _advance(game))]
+    if not pending:
+        return 0
+
+    batch = DecisionBatch(predictor.codes, capacity=8 * len(pending))
+    steps = 0
+    while pending:
+        batch.clear()
+        rows = [batch.add(cards, state) for _, (cards, state) in pending]
+        ps = batch.predict(predictor)
+        pending = [(game, request) for (game, _), r in zip(pending, rows)
+                   if (request := _advance(game, ps[r]))]
+        steps += 1
+    logger.debug(f"lockstep: {len(games)} games in {steps} steps")
+    return steps
@@ -0,0 +1,66 @@
+import logging.config
+import unittest
+
+import inference
+import lockstep
+import simulation
+from card import IRONCLAD_STARTER
+from monster import JawWorm
+from player import AIPlayer, AttackingPlayer
+
+logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
+
+
+class CountingModel:
+    # Prefers cards with low PLAY codes while the monster is healthy, high codes otherwise.
+    codes = {"BASH": 1, "DEFEND": 2, "STRIKE": 3}
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, xs):
+        self.calls += 1
+        monster_hp = xs[:, inference.FEATURES.index("MONSTER_HP")]
+        return xs[:, 0] * (monster_hp - 20)
+
+
+class TestLockstep(unittest.TestCase):
+    def setUp(self):
+        self.saved = AIPlayer._predictor, AIPlayer._model_stamp
+        AIPlayer._predictor = CountingModel()
+        AIPlayer._model_stamp = inference.model_stamp()
+
+    def tearDown(self):
+        AIPlayer._predictor, AIPlayer._model_stamp = self.saved
+
+    def games(self, strategy, trials):
+        return zip(*[simulation.setup_trial(strategy, IRONCLAD_STARTER, JawWorm, trial) for trial in range(trials)])
+
+    def test_matches_serial(self):
+        serial = [simulation.run_trial(AIPlayer, IRONCLAD_STARTER, JawWorm, 10, trial) for trial in range(20)]
+        serial_calls = AIPlayer._predictor.calls
+
+        players, monsters = self.games(AIPlayer, 20)
+        AIPlayer._predictor.calls = 0
+        steps = lockstep.play_games(players, monsters, 10, AIPlayer._predictor)
+
+        self.assertEqual(serial, [simulation.trial_result(p, m) for p, m in zip(players, monsters)])
+        self.assertEqual(steps, AIPlayer._predictor.calls)
+        self.assertLess(steps * 5, serial_calls)
+
+    def test_model_checked_per_batch(self):
+        model = AIPlayer._predictor
+        AIPlayer._model_stamp = ("retrained", 0)
+        self.games(AIPlayer, 3)
+        self.assertIs(model, AIPlayer._predictor)
+        AIPlayer.check_model()
+        self.assertIsNone(AIPlayer._predictor)
+
+    def test_players_without_model(self):
+        players, monsters = self.games(AttackingPlayer, 3)
+        self.assertEqual(0, lockstep.play_games(players, monsters, 10, None))
+        self.assertTrue(all(player.played_cards for player in players))
+
+
+if __name__ == '__main__':
+    unittest.main()
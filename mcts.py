@@ -0,0 +1,141 @@
+import logging
+import math
+import time
+from typing import Union
+
+import game_state
+from card import Card
+from deck import Deck
+from monster import Monster
+from player import AttackingPlayer, Player
+
+logger = logging.getLogger("turns").getChild(__name__)
+
+
+class _NoCsv:
+    # Stands in for the CsvLogger of rollout players: rollouts aren't training data.
+    def next_turn(self):
+        pass
+
+    def play_card(self, row):
+        pass
+
+    def end_game(self, final_hp):
+        pass
+
+
+class _Node:
+    # The statistics of one card choice (None: end the turn) after the choices leading to it.
+    __slots__ = ("visits", "total", "children")
+
+    def __init__(self):
+        self.visits = 0
+        self.total = 0.0
+        self.children = {}
+
+
+class MCTSPlayer(Player):
+    """Chooses each card by Monte Carlo tree search: a UCB1 tree over the rest of this turn's card
+    choices, whose leaves are scored by rollouts of `rollout_strategy`, a deterministic Player, to
+    the end of the game. Each iteration restores a copy of the game to the decision's GameState
+    and reshuffles its draw pile, which the player can't see, then plays the monster's intents and
+    the deals out at random. The search stops after `iterations` iterations or `seconds` seconds,
+    whichever comes first, and plays the choice it visited most.
+
+    The rollouts play on a player and monster of their own, which write no csv and, with logging
+    disabled during the search, no trace."""
+
+    __slots__ = ("_turns", "_rollout", "_rollout_monster")
+    iterations = 200
+    seconds = None
+    exploration = 0.5
+    rollout_strategy = AttackingPlayer
+
+    def play_game_steps(self, monster: Monster, turns: int):
+        self._turns = turns
+        # Seeded from this player's stream, so that games stay reproducible.
+        deck_seed, monster_seed, player_seed = self._rng.integers(2 ** 32, size=3)
+        self._rollout = self.rollout_strategy(Deck(self.deck.all_cards(), seed=deck_seed), self.energy, self.max_hp,
+                                              seed=player_seed)
+        self._rollout.csv_logger = _NoCsv()
+        self._rollout_monster = type(monster)(seed=monster_seed)
+        return super().play_game_steps(monster, turns)
+
+    def _sort_hand(self):
+        # The search looks at the whole hand.
+        pass
+
+    @staticmethod
+    def _choices(player: Player, energy: int) -> list:
+        # The distinct playable cards, and ending the turn.
+        return list(dict.fromkeys(card for card in player.deck.hand if card.energy <= energy)) + [None]
+
+    def _iterate(self, root: _Node, state: game_state.GameState, energy: int):
+        # One search iteration: selection and expansion down the tree, then a rollout.
+        player, monster = self._rollout, self._rollout_monster
+        game_state.restore(state, player, monster)
+        player.deck.shuffle_draw_pile()
+        path, node = [root], root
+        while True:
+            choices = self._choices(player, energy)
+            fresh = [choice for choice in choices if choice not in node.children]
+            if fresh:
+                card = fresh[0]
+                node.children[card] = _Node()
+            else:
+                log_visits = math.log(sum(node.children[choice].visits for choice in choices))
+                card = max(choices, key=lambda choice: self._ucb(node.children[choice], log_visits))
+            node = node.children[card]
+            path.append(node)
+            if not card:
+                break
+            energy -= card.energy
+            player.play_card(card, monster)
+            if fresh or not monster.hp:
+                break
+
+        value = self._play_out(player, monster, energy, card) / self.max_hp
+        for node in path:
+            node.visits += 1
+            node.total += value
+
+    def _ucb(self, node: _Node, log_visits: float) -> float:
+        return node.total / node.visits + self.exploration * math.sqrt(log_visits / node.visits)
+
+    def _play_out(self, player: Player, monster: Monster, energy: int, card: Union[Card, None]) -> int:
+        # Finishes the turn, unless `card` was None, and the game with the rollout strategy's plays.
+        if not monster.hp:
+            return player.hp
+        if card:
+            player._sort_hand()
+            while monster.hp and (card := player.select_card_to_play(energy, monster)):
+                energy -= card.energy
+                player.play_card(card, monster)
+        player.end_hand()
+        player.finish_turn(monster)
+        while monster.hp and player.hp and player.turn < self._turns:
+            player.play_turn(monster)
+        return player.hp
+
+    def search(self, energy: int, monster: Monster) -> dict:
+        """Returns the visits and mean normalized final hp of each choice of card to play now (None:
+        end the turn)."""
+        state = game_state.snapshot(self, monster)
+        root = _Node()
+        deadline = self.seconds and time.perf_counter() + self.seconds
+        disabled = logging.root.manager.disable
+        logging.disable(logging.INFO)
+        try:
+            while root.visits < self.iterations and not (deadline and time.perf_counter() > deadline):
+                self._iterate(root, state, energy)
+        finally:
+            logging.disable(disabled)
+        return {card: (node.visits, node.total / node.visits) for card, node in root.children.items()}
+
+    def select_card_to_play(self, energy, monster: Monster) -> Union[Card, None]:
+        if not monster.hp or not any(card.energy <= energy for card in self.deck.hand):
+            return None
+        stats = self.search(energy, monster)
+        best = max(stats, key=stats.get)
+        logger.info("mcts: %s --> %s", stats, best)
+        return best
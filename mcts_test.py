@@ -0,0 +1,60 @@
+import logging.config
+import statistics
+import time
+import unittest
+
+import simulation
+from card import IRONCLAD_STARTER, Card
+from deck import Deck
+from mcts import MCTSPlayer
+from monster import Cultist, JawWorm
+from player import AttackingPlayer
+
+logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
+
+
+class TestMCTSPlayer(unittest.TestCase):
+    def setUp(self):
+        self.iterations, self.seconds = MCTSPlayer.iterations, MCTSPlayer.seconds
+
+    def tearDown(self):
+        MCTSPlayer.iterations, MCTSPlayer.seconds = self.iterations, self.seconds
+
+    def test_beats_rollout_strategy(self):
+        MCTSPlayer.iterations = 100
+        seeds = range(30)
+        mcts = statistics.mean(r.hp for r in simulation.play_trials(MCTSPlayer, IRONCLAD_STARTER, JawWorm, 6, seeds))
+        attacking = statistics.mean(r.hp for r in simulation.play_trials(AttackingPlayer, IRONCLAD_STARTER, JawWorm, 6, seeds))
+        self.assertGreater(mcts, attacking + 2)
+
+    def test_reproducible(self):
+        MCTSPlayer.iterations = 20
+        cards = IRONCLAD_STARTER + [Card.ANGER, Card.POMMEL_STRIKE]
+        first = simulation.run_trial(MCTSPlayer, cards, Cultist, 5, 3)
+        simulation.run_trial(MCTSPlayer, cards, Cultist, 5, 4)
+        self.assertEqual(first, simulation.run_trial(MCTSPlayer, cards, Cultist, 5, 3))
+
+    def test_search(self):
+        MCTSPlayer.iterations = 50
+        player = MCTSPlayer(Deck(IRONCLAD_STARTER, seed=2), seed=2)
+        monster = JawWorm(seed=2)
+        # Sets the player up for a game of 4 turns without starting it.
+        steps = player.play_game_steps(monster, 4)
+        player.deck.deal(5)
+        stats = player.search(player.energy, monster)
+        self.assertEqual(50, sum(visits for visits, _ in stats.values()))
+        self.assertIn(None, stats)
+        for visits, value in stats.values():
+            self.assertTrue(0 <= value <= 1)
+        steps.close()
+
+    def test_time_budget(self):
+        MCTSPlayer.iterations, MCTSPlayer.seconds = 10 ** 9, 0.02
+        player, monster = simulation.setup_trial(MCTSPlayer, IRONCLAD_STARTER, JawWorm, 1)
+        start = time.perf_counter()
+        player.play_game(monster, 2)
+        self.assertLess(time.perf_counter() - start, 0.02 * 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,30 +11,58 @@ logger = logging.getLogger("turns").getChild(__name__)
 
 
 class Monster(Character):
-    def __init__(self, hp=sys.maxsize) -> None:
-        super().__init__(hp=hp)
+    __slots__ = ("_rng", "_damage", "_damage_turns", "planned_damage")
+
+    def __init__(self, hp=sys.maxsize, seed=None) -> None:
         self._damage = []
+        self._damage_turns = 0
+        super().__init__(hp=hp, seed=seed)
+
+    def reset(self, seed=None) -> None:
+        super().reset(seed)
+        self._rng = numpy.random.default_rng(seed)
+        # Only the turns fought so far hold any damage.
+        self._damage[:self._damage_turns] = [0] * self._damage_turns
+        self._damage_turns = 0
         self.planned_damage = 0
 
+    def snapshot(self) -> tuple:
+        return super().snapshot() + (self.planned_damage, tuple(self.get_damage()))
+
+    def _restore(self, state: tuple, seed) -> tuple:
+        planned_damage, damage, *rest = super()._restore(state, seed)
+        if seed is not None:
+            self._rng = numpy.random.default_rng(seed)
+        self.planned_damage = planned_damage
+        self._damage[:self._damage_turns] = [0] * self._damage_turns
+        self.reserve(len(damage))
+        self._damage[:len(damage)] = damage
+        self._damage_turns = len(damage)
+        return tuple(rest)
+
+    def reserve(self, turns: int) -> None:
+        # Allocates the damage of every turn up front, for a fight of `turns` turns.
+        if len(self._damage) < turns:
+            self._damage.extend([0] * (turns - len(self._damage)))
+
     def attack(self) -> int:
         return int(self.planned_damage + self.strength)
 
     def defend(self, attack_damage: int) -> None:
         post_hp_damage = super().defend(attack_damage)
 
-        array_gap = 1 + self._turn - len(self._damage)
-        if array_gap:
-            self._damage.extend([0]*array_gap)
-
+        if self._turn >= len(self._damage):
+            self.reserve(self._turn + 1)
         self._damage[self._turn] += post_hp_damage
+        self._damage_turns = self._turn + 1
 
     def get_damage(self) -> Sequence:
-        return self._damage
+        return self._damage[:self._damage_turns]
 
     def end_turn(self):
         super().end_turn()
-        self._damage
-        logger.info(f"damage: {self._damage}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("damage: %s", self.get_damage())
 
 
 class JawWormMode(Enum):
@@ -44,31 +72,51 @@ class JawWormMode(Enum):
 
 # average player hp
 class JawWorm(Monster):
-    def __init__(self) -> None:
-        super().__init__(hp=40)
-        self.strength = 0
+    __slots__ = ("_mode", "_modes")
+
+    def __init__(self, seed=None) -> None:
+        super().__init__(hp=40, seed=seed)
+
+    def reset(self, seed=None) -> None:
+        super().reset(seed)
         self._mode = JawWormMode.CHOMP
         self._modes = [self._mode]
         self._setup_mode()
 
+    def snapshot(self) -> tuple:
+        # The last two modes are all _get_next_mode looks at.
+        return super().snapshot() + (tuple(mode.value for mode in self._modes[-2:]),)
+
+    def _restore(self, state: tuple, seed) -> tuple:
+        modes, *rest = super()._restore(state, seed)
+        self._modes[:] = map(JawWormMode, modes)
+        self._mode = self._modes[-1]
+        return tuple(rest)
+
+    @staticmethod
+    def _roll_mode(r: int) -> JawWormMode:
+        # The mode a roll of randint(100) asks for.
+        if r <= 45:
+            return JawWormMode.BELLOW
+        elif r <= 75:
+            return JawWormMode.THRASH
+        return JawWormMode.CHOMP
+
+    @staticmethod
+    def _repeats(next_mode: JawWormMode, modes: Sequence) -> bool:
+        # No BELLOW or CHOMP twice in a row, and no THRASH three times.
+        if next_mode == JawWormMode.THRASH:
+            return modes[-2:] == [JawWormMode.THRASH] * 2
+        return modes[-1] == next_mode
+
     def _get_next_mode(self):
+        # Rolls again until the mode isn't a repeat; see intents.py for the exact chain.
         while True:
-            r = numpy.random.randint(100)
-            if r <= 45:
-                next_mode = JawWormMode.BELLOW
-                if self._modes[-1] == JawWormMode.BELLOW:
-                    continue
-            elif r <= 75:
-                next_mode = JawWormMode.THRASH
-                if self._modes[-1] == JawWormMode.THRASH and self._modes[-2] == JawWormMode.THRASH: # check the length
-                    continue
-            else:
-                if self._modes[-1] == JawWormMode.CHOMP:
-                    continue
-                next_mode = JawWormMode.CHOMP
-            break
+            next_mode = self._roll_mode(self._rng.integers(100))
+            if not self._repeats(next_mode, self._modes):
+                break
         self._modes.append(next_mode)
-        logger.debug(f"JawWorm next_mode: {self._mode.name}")
+        logger.debug("JawWorm next_mode: %s", self._mode.name)
         return next_mode
 
     def attack(self) -> int:
@@ -92,14 +140,19 @@ class JawWorm(Monster):
 
         self._mode = self._get_next_mode()
         self._setup_mode()
-        logger.debug(f"end_turn(): {self}")
+        logger.debug("end_turn(): %s", self)
 
     def __str__(self):
         return f"JawWorm {self._mode}, hp: {self.hp}, planned_damage: {self.planned_damage}, block: {self.block}, strength: {self.strength}, vulnerable: {self._vulnerable}"
 
 class Cultist(Monster):
-    def __init__(self) -> None:
-        super().__init__(hp=80)
+    __slots__ = ()
+
+    def __init__(self, seed=None) -> None:
+        super().__init__(hp=80, seed=seed)
+
+    def reset(self, seed=None) -> None:
+        super().reset(seed)
         self.strength_buff = 4
     
     def end_turn(self):
@@ -101,7 +101,7 @@ class TestJawWorm(unittest.TestCase):
         self.assertEqual(0, jw.block)
 
     def test_generate_mode(self):
-        jw = JawWorm()
+        jw = JawWorm(seed=1)
         for i in range(50):
             jw.end_turn()
         modes = ''.join([m.name for m in jw._modes])
@@ -111,6 +111,13 @@ class TestJawWorm(unittest.TestCase):
         self.assertIn('THRASHTHRASH', modes)
         self.assertNotIn('CHOMPCHOMP', modes)
 
+    def test_seed(self):
+        first, second = JawWorm(seed=3), JawWorm(seed=3)
+        for i in range(20):
+            first.end_turn()
+            second.end_turn()
+        self.assertEqual(first._modes, second._modes)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,391 @@
+import argparse
+import functools
+import logging
+import math
+import sys
+from collections import namedtuple
+from typing import Union
+
+import inference
+import intents
+from card import CARD_IDS, CARDS, Card, Tag, sort_ranks
+from monster import Cultist, JawWorm, Monster
+from player import HAND_CARDS, AIPlayer, AttackingPlayer, DefendingPlayer, Player
+
+logger = logging.getLogger("sts").getChild(__name__)
+
+HAND_SIZE = 5
+MAX_STATES = 2_000_000
+
+Decision = namedtuple("Decision", "playable state")
+Decision.__doc__ = """A card choice for a policy: the distinct playable Cards, and the aidata.CONT_DATA
+state AIPlayer.candidates would score them in."""
+
+
+@functools.lru_cache(maxsize=None)
+def _hypergeometric(counts: tuple, k: int) -> tuple:
+    # Every multiset of k cards drawn from a pile of `counts` of each kind, with its probability.
+    outcomes = []
+
+    def draw(kind, left, drawn, ways):
+        if kind == len(counts):
+            if not left:
+                outcomes.append((ways, tuple(drawn)))
+            return
+        for x in range(min(counts[kind], left) + 1):
+            draw(kind + 1, left - x, drawn + [x], ways * math.comb(counts[kind], x))
+
+    draw(0, k, [], 1)
+    total = math.comb(sum(counts), k)
+    return tuple((ways / total, drawn) for ways, drawn in outcomes)
+
+
+def _defend(hp, block, vulnerable, attack_damage):
+    # Character.defend: returns the new hp and block.
+    damage = int(attack_damage * (1.5 if vulnerable else 1.0))
+    post_block_damage = max(0, damage - block)
+    return hp - min(hp, post_block_damage), max(0, block - damage)
+
+
+class _MonsterModel:
+    """What monster.py does to a monster at the end of a turn, on (hp, block, strength, vulnerable,
+    planned_damage, state) tuples; state is the JawWorm's state in intents.chain(), else 0."""
+
+    def __init__(self, monster_factory):
+        if monster_factory not in (Monster, JawWorm, Cultist):
+            raise ValueError(f"no solver model of {monster_factory.__name__}")
+        self.factory = monster_factory
+        self.jawworm = monster_factory is JawWorm
+        if self.jawworm:
+            states, matrix = intents.chain()
+            intent_by_mode = intents.mode_intents()
+            self.moves = [[(matrix[state, next_state], intent_by_mode[intents.MODES.index(mode)].tolist(), next_state)
+                           for next_state, (_, mode) in enumerate(states) if matrix[state, next_state]]
+                          for state in range(len(states))]
+        monster = monster_factory()
+        self.start = (monster.hp, monster.block, monster.strength, monster.get_vulnerable(),
+                      monster.planned_damage, 0)
+
+    def state(self, monster: Monster) -> tuple:
+        state = 0
+        if self.jawworm:
+            states, _ = intents.chain()
+            modes = monster._modes[-2:]
+            state = states.index((modes[0], modes[1]) if len(modes) == 2 else (None, modes[0]))
+        return (monster.hp, monster.block, monster.strength, monster.get_vulnerable(), monster.planned_damage, state)
+
+    def attack(self, monster: tuple) -> int:
+        _, _, strength, _, planned_damage, _ = monster
+        if self.jawworm:
+            return planned_damage + strength if planned_damage else 0
+        return int(planned_damage + strength)
+
+    def end_turn(self, monster: tuple) -> list:
+        # (probability, monster) pairs.
+        hp, block, strength, vulnerable, planned_damage, state = monster
+        if self.factory is Cultist:
+            # Cultist.end_turn doesn't call Monster.end_turn.
+            return [(1.0, (hp, block, strength, vulnerable, 6, state))]
+        vulnerable = max(0, vulnerable - 1)
+        if not self.jawworm:
+            return [(1.0, (hp, block, strength, vulnerable, planned_damage, state))]
+        return [(p, (hp, intent_block, strength + gain, vulnerable, damage, next_state))
+                for p, (damage, intent_block, gain), next_state in self.moves[state]]
+
+
+class Solver:
+    """Expectimax over a fight of `cards` against a monster, as player.py and deck.py play it: the
+    deals, draws and JawWorm intents are chance nodes and each card choice, including ending the
+    turn, is a max node. Values are the expected final hp, memoized in a transposition table keyed
+    by the state: pile counts, energy, player and monster stats and the turns left, so one table
+    serves fights of any length. The table is cleared when it holds max_states entries.
+    Star1 bounds prune the search: the final hp is never more than the hp now.
+
+    value() and best_card() maximize; with a policy, a function from a Decision to the cards it
+    plays (an empty list ends the turn), value(policy) is the exact value of that policy instead."""
+
+    def __init__(self, cards, monster_factory, turns: int, hp: int = 72, energy: int = 3,
+                 max_states: int = MAX_STATES):
+        self.kinds = sorted(set(cards), key=CARDS.index)
+        self.start = tuple(cards.count(kind) for kind in self.kinds)
+        self.monster = _MonsterModel(monster_factory)
+        self.turns = turns
+        self.hp = hp
+        self.energy = energy
+        self.max_states = max_states
+        self.evictions = 0
+        self._strike = tuple(Tag.STRIKE in kind.tags for kind in self.kinds)
+        self._anger = self.kinds.index(Card.ANGER) if Card.ANGER in self.kinds else -1
+        self._hand_cards = [self.kinds.index(c) if c in self.kinds else -1 for c in HAND_CARDS]
+        # Cards tried in AttackingPlayer's order: finding good plays first prunes more.
+        ranks = sort_ranks(AttackingPlayer._sort_key)
+        self._order = sorted(range(len(self.kinds)), key=lambda kind: -ranks[CARD_IDS[self.kinds[kind]]])
+        self._policy = None
+        self._table = {}
+        self._tables = {None: self._table}
+
+    def _store(self, key, value, alpha):
+        if len(self._table) >= self.max_states:
+            self._table.clear()
+            self.evictions += 1
+        # Values at or below alpha may only be upper bounds.
+        self._table[key] = (value, value > alpha)
+        return value
+
+    def _lookup(self, key, alpha):
+        entry = self._table.get(key)
+        if entry and (entry[1] or entry[0] <= alpha):
+            return entry[0]
+        return None
+
+    @staticmethod
+    def _expectation(outcomes, alpha, bound):
+        # The expected value of (probability, value(threshold)) outcomes, each at most `bound`.
+        # Star1 pruning: stops, returning an upper bound no more than alpha, once the outcomes so
+        # far show the expectation can't exceed alpha. value(threshold) is exact above threshold,
+        # else an upper bound no more than it.
+        total, rest = 0.0, 1.0
+        for p, value in outcomes:
+            rest -= p
+            threshold = (alpha - total - rest * bound) / p
+            v = value(threshold)
+            total += p * v
+            if v <= threshold:
+                return total + max(rest, 0.0) * bound
+        return total
+
+    def _deal(self, draw, discards, hand, k):
+        # Deck.deal(k): (probability, draw, discards, hand) outcomes. An empty draw pile is
+        # replaced by the shuffled discards, so the cards left are dealt before any of them.
+        left = sum(draw)
+        if k > left:
+            hand = tuple(map(sum, zip(hand, draw)))
+            draw, discards, k = discards, (0,) * len(discards), k - left
+            k = min(k, sum(draw))
+        return [(p, tuple(a - b for a, b in zip(draw, drawn)), discards, tuple(map(sum, zip(hand, drawn))))
+                for p, drawn in _hypergeometric(draw, k)]
+
+    def _turn_start(self, left, draw, discards, player, monster, alpha):
+        key = (left, draw, discards, player, monster)
+        value = self._lookup(key, alpha)
+        if value is not None:
+            return value
+        hp, strength, strength_buff = player
+        player = (hp, 0, strength, strength_buff, 0)
+        outcomes = [(p, functools.partial(self._hand, left, dealt_draw, dealt_discards, hand, self.energy, player, monster))
+                    for p, dealt_draw, dealt_discards, hand in self._deal(draw, discards, (0,) * len(draw), HAND_SIZE)]
+        return self._store(key, self._expectation(outcomes, alpha, hp), alpha)
+
+    def _free(self, card: Card, player) -> bool:
+        # Playing the card is at least as good as ending the turn instead: it only adds damage,
+        # block, strength and vulnerable, and leaves the piles as ending the turn would.
+        strength = player[2]
+        return (not card.exhausts and not card.draw_card and card != Card.ANGER and not card.strength_loss
+                and card.strength_multiplier == 1 and card.enemy_strength_gain <= 0
+                and min(card.block, card.strength_gain, card.strength_buff, card.vulnerable) >= 0
+                and card.attack + strength * card.attack_strength_multiplier >= 0)
+
+    def _hand(self, left, draw, discards, hand, energy, player, monster, alpha):
+        hp = player[0]
+        if not monster[0]:
+            return hp
+        if hp <= alpha:
+            # The final hp is never more than the hp now.
+            return hp
+        key = (left, draw, discards, hand, energy, player, monster)
+        value = self._lookup(key, alpha)
+        if value is not None:
+            return value
+        playable = [kind for kind in self._order if hand[kind] and self.kinds[kind].energy <= energy]
+        end_turn = functools.partial(self._end_turn, left, draw, discards, hand, player, monster)
+        plays = [functools.partial(self._play, kind, left, draw, discards, hand, energy, player, monster)
+                 for kind in playable]
+        if self._policy:
+            chosen = self._policy(self._decision(playable, hand, energy, player, monster)) if playable else []
+            if chosen:
+                outcomes = [(1 / len(chosen), plays[playable.index(self.kinds.index(card))]) for card in chosen]
+                value = self._expectation(outcomes, alpha, hp)
+            else:
+                value = end_turn(alpha)
+            return self._store(key, value, alpha)
+
+        if not any(self._free(self.kinds[kind], player) for kind in playable):
+            plays.append(end_turn)
+        best = -math.inf
+        for play in plays:
+            value = play(max(alpha, best))
+            best = max(best, value)
+            if best >= hp:
+                break
+        return self._store(key, best, alpha)
+
+    def _decision(self, playable, hand, energy, player, monster) -> Decision:
+        hp, block = player[:2]
+        state = (energy, hp, block, monster[0], self.monster.attack(monster), monster[1], monster[3],
+                 *[hand[kind] if kind >= 0 else 0 for kind in self._hand_cards])
+        return Decision([self.kinds[kind] for kind in sorted(playable)], state)
+
+    def _play(self, kind, left, draw, discards, hand, energy, player, monster, alpha):
+        # Player.play_card.
+        card = self.kinds[kind]
+        hp, block, strength, strength_buff, debuff = player
+        m_hp, m_block, m_strength, m_vulnerable, planned_damage, state = monster
+        hand = hand[:kind] + (hand[kind] - 1,) + hand[kind + 1:]
+        energy -= card.energy
+        if not card.exhausts:
+            discards = discards[:kind] + (discards[kind] + 1,) + discards[kind + 1:]
+
+        if card.attack:
+            strike_bonus = 0
+            if card.strike_bonus:
+                strikes = sum(d + s + h for d, s, h, strike in zip(draw, discards, hand, self._strike) if strike)
+                strike_bonus = card.strike_bonus * strikes
+            damage = card.attack_multiplier * (card.attack + strike_bonus + strength * card.attack_strength_multiplier)
+            m_hp, m_block = _defend(m_hp, m_block, m_vulnerable, damage)
+
+        monster = (m_hp, m_block, m_strength + card.enemy_strength_gain, m_vulnerable + card.vulnerable,
+                   planned_damage, state)
+        player = (hp, block + card.block, (strength + card.strength_gain) * card.strength_multiplier,
+                  strength_buff + card.strength_buff, debuff + card.strength_loss)
+        if not card.draw_card:
+            if kind == self._anger:
+                discards = discards[:kind] + (discards[kind] + 1,) + discards[kind + 1:]
+            return self._hand(left, draw, discards, hand, energy, player, monster, alpha)
+        outcomes = []
+        for p, draw, discards, hand in self._deal(draw, discards, hand, card.draw_card):
+            if kind == self._anger:
+                discards = discards[:kind] + (discards[kind] + 1,) + discards[kind + 1:]
+            outcomes.append((p, functools.partial(self._hand, left, draw, discards, hand, energy, player, monster)))
+        return self._expectation(outcomes, alpha, hp)
+
+    def _end_turn(self, left, draw, discards, hand, player, monster, alpha):
+        # Player.end_hand and Player.finish_turn, then the next turn.
+        discards = tuple(map(sum, zip(discards, hand)))
+        hp, block, strength, strength_buff, debuff = player
+        attack = self.monster.attack(monster)
+        if attack:
+            hp, block = _defend(hp, block, 0, attack)
+        strength += strength_buff - debuff
+        if not hp or left == 1:
+            return hp
+        outcomes = [(p, functools.partial(self._turn_start, left - 1, draw, discards, (hp, strength, strength_buff),
+                                          next_monster))
+                    for p, next_monster in self.monster.end_turn(monster)]
+        return self._expectation(outcomes, alpha, hp)
+
+    def _use(self, policy):
+        self._policy = policy
+        self._table = self._tables.setdefault(policy, {})
+
+    def value(self, policy=None) -> float:
+        """The expected final hp of the fight from its start: playing optimally, or by `policy`."""
+        self._use(policy)
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, 200 * self.turns + 1000))
+        try:
+            return self._turn_start(self.turns, self.start, (0,) * len(self.kinds), (self.hp, 0, 0), self.monster.start,
+                                    -math.inf)
+        finally:
+            sys.setrecursionlimit(limit)
+            self._use(None)
+
+    def states(self, policy=None) -> int:
+        return len(self._tables.get(policy, {}))
+
+    def best_card(self, player: Player, energy: int, monster: Monster, left: int) -> Union[Card, None]:
+        """The card `player` should play next against `monster` with `left` turns to go, this one
+        included, or None to end the turn."""
+        deck = player.deck
+        draw, discards, hand = ([pile.count(kind) for kind in self.kinds] for pile in (deck.deck, deck.discards, deck.hand))
+        draw, discards, hand = tuple(draw), tuple(discards), tuple(hand)
+        state = ((player.hp, player.block, player.strength, player.strength_buff, player.post_strength_debuff_once),
+                 self.monster.state(monster))
+        best, best_value = None, self._end_turn(left, draw, discards, hand, *state, -math.inf)
+        for kind in self._order:
+            card = self.kinds[kind]
+            if hand[kind] and card.energy <= energy:
+                value = self._play(kind, left, draw, discards, hand, energy, *state, best_value)
+                if value > best_value:
+                    best, best_value = card, value
+        logger.debug("best card: %s, %s", best, best_value)
+        return best
+
+
+def sort_key_policy(strategy):
+    """The policy of a Player whose _sort_key decides its plays: the playable card it sorts first."""
+    ranks = sort_ranks(strategy._sort_key)
+
+    def policy(decision: Decision):
+        best = max(ranks[CARD_IDS[card]] for card in decision.playable)
+        return [card for card in decision.playable if ranks[CARD_IDS[card]] == best]
+    return policy
+
+
+def predictor_policy(predictor):
+    """AIPlayer's policy: the cards the predictor scores lowest, i.e. expects the highest final hp of."""
+    batch = inference.DecisionBatch(predictor.codes)
+
+    def policy(decision: Decision):
+        batch.clear()
+        rows = batch.add(decision.playable, decision.state)
+        ps = batch.predict(predictor)[rows]
+        return [card for card, p in zip(decision.playable, ps) if p == min(ps)]
+    return policy
+
+
+class OptimalPlayer(Player):
+    """Plays whatever a Solver of its deck and monster finds best, looking at most `horizon` turns
+    ahead (None: to the end of the game). The solvers, and so their transposition tables, are shared
+    by every OptimalPlayer of the process."""
+
+    __slots__ = ("_turns",)
+    horizon = 8
+    _solvers = {}
+
+    def play_game_steps(self, monster: Monster, turns: int):
+        self._turns = turns
+        return super().play_game_steps(monster, turns)
+
+    def _sort_hand(self):
+        # The solver looks at the whole hand.
+        pass
+
+    def solver(self, monster: Monster) -> Solver:
+        cards = self.deck.all_cards() + list(self.deck.exhausted)
+        key = (frozenset(cards), type(monster), self.max_hp, self.energy)
+        if key not in OptimalPlayer._solvers:
+            OptimalPlayer._solvers[key] = Solver(cards, type(monster), self._turns, self.max_hp, self.energy)
+        return OptimalPlayer._solvers[key]
+
+    def select_card_to_play(self, energy, monster: Monster) -> Union[Card, None]:
+        left = self._turns - self.turn
+        if self.horizon:
+            left = min(left, self.horizon)
+        return self.solver(monster).best_card(self, energy, monster, left)
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="print the exact expected final hp of optimal play and of each strategy, and their regret")
+    argparser.add_argument('cards', nargs='?', default='IRONCLAD_STARTER')
+    argparser.add_argument('--monster', help='monster', default='JawWorm')
+    argparser.add_argument('--turns', help='number of turns', type=int, default=8)
+    argparser.add_argument('--ai', help='also evaluate AIPlayer with the trained model', action="store_true")
+    args = argparser.parse_args()
+    from card import IRONCLAD_STARTER  # noqa: F401 for eval
+    cards = eval(args.cards)
+
+    solver = Solver(cards, eval(args.monster), args.turns)
+    optimal = solver.value()
+    print(f"OptimalPlayer: {optimal:.3f} ({solver.states()} states)")
+    policies = {strategy.__name__: sort_key_policy(strategy) for strategy in (AttackingPlayer, DefendingPlayer)}
+    if args.ai:
+        AIPlayer(None)
+        policies["AIPlayer"] = predictor_policy(AIPlayer._predictor)
+    for name, policy in policies.items():
+        value = solver.value(policy)
+        print(f"{name}: {value:.3f}, regret {optimal - value:.3f} ({solver.states(policy)} states)")
+
+
+if __name__ == "__main__":
+    main()
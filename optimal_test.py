@@ -0,0 +1,51 @@
+import logging.config
+import statistics
+import unittest
+
+import optimal
+import simulation
+from card import IRONCLAD_STARTER, Card
+from monster import Cultist, JawWorm
+from player import AttackingPlayer, DefendingPlayer
+
+logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
+
+
+class TestSolver(unittest.TestCase):
+    def test_hypergeometric(self):
+        outcomes = optimal._hypergeometric((5, 4, 1), 5)
+        self.assertAlmostEqual(1.0, sum(p for p, _ in outcomes))
+        for _, drawn in outcomes:
+            self.assertEqual(5, sum(drawn))
+        self.assertEqual([(1.0, (2, 0))], list(optimal._hypergeometric((2, 0), 2)))
+
+    def test_policy_values_match_trials(self):
+        for monster in (JawWorm, Cultist):
+            solver = optimal.Solver(IRONCLAD_STARTER, monster, 3)
+            value = solver.value(optimal.sort_key_policy(AttackingPlayer))
+            results = simulation.play_trials(AttackingPlayer, IRONCLAD_STARTER, monster, 3, range(400))
+            self.assertAlmostEqual(value, statistics.mean(r.hp for r in results), delta=1.0)
+
+    def test_optimal_beats_policies(self):
+        solver = optimal.Solver(IRONCLAD_STARTER + [Card.ANGER], JawWorm, 3)
+        best = solver.value()
+        for strategy in (AttackingPlayer, DefendingPlayer):
+            self.assertGreaterEqual(best + 1e-9, solver.value(optimal.sort_key_policy(strategy)))
+
+    def test_table_bound(self):
+        solver = optimal.Solver(IRONCLAD_STARTER, JawWorm, 3)
+        bounded = optimal.Solver(IRONCLAD_STARTER, JawWorm, 3, max_states=500)
+        self.assertAlmostEqual(solver.value(), bounded.value())
+        self.assertGreater(bounded.evictions, 0)
+        self.assertLessEqual(bounded.states(), 500)
+
+
+class TestOptimalPlayer(unittest.TestCase):
+    def test_plays_to_solver_value(self):
+        value = optimal.Solver(IRONCLAD_STARTER, JawWorm, 3).value()
+        results = simulation.play_trials(optimal.OptimalPlayer, IRONCLAD_STARTER, JawWorm, 3, range(300))
+        self.assertAlmostEqual(value, statistics.mean(r.hp for r in results), delta=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import logging
+import os
+import sys
 from typing import Union
 
 from card import Card
@@ -6,26 +8,67 @@ from character import Character
 from deck import Deck
 from monster import Monster
 from csv_logger import CsvLogger
-import fastai_sts
+import inference
 import numpy
-import random
 import aidata
 
 logger = logging.getLogger("turns").getChild(__name__)
-csv_logger = CsvLogger("FINAL_HP,GAME,N_TURN,N_PLAY,PLAY," + aidata.CONT_DATA)
+CSV_HEADER = "FINAL_HP,GAME,N_TURN,N_PLAY,PLAY," + aidata.CONT_DATA
+csv_logger = CsvLogger(CSV_HEADER)
 
 HAND_CARDS = [Card.STRIKE, Card.BASH, Card.DEFEND]
 
 class Player(Character):
+    __slots__ = ("_rng", "deck", "csv_logger", "energy", "_blocks", "_block_turns", "_played_cards", "_played_turns",
+                 "post_strength_debuff_once")
 
-    def __init__(self, deck: Deck, energy: int = 3, hp: int = 72) -> None:
-        super().__init__(hp=hp)
+    def __init__(self, deck: Deck, energy: int = 3, hp: int = 72, seed=None) -> None:
         self.deck = deck
+        self.csv_logger = csv_logger
         self.energy = energy
-        self.blocks = []
-        self.played_cards = []
+        # The block and the cards played of each turn, in lists that reset() keeps: only the first
+        # _block_turns and _played_turns entries are this game's.
+        self._blocks = []
+        self._played_cards = []
+        super().__init__(hp=hp, seed=seed)
+
+    def reset(self, seed=None) -> None:
+        # The deck is reset separately, with its own seed.
+        super().reset(seed)
+        self._rng = numpy.random.default_rng(seed)
+        self._block_turns = 0
+        self._played_turns = 0
         self.post_strength_debuff_once = 0
 
+    def reserve(self, turns: int):
+        if len(self._blocks) < turns:
+            self._blocks.extend([0] * (turns - len(self._blocks)))
+            self._played_cards.extend([[]] * (turns - len(self._played_cards)))
+
+    @property
+    def blocks(self) -> list:
+        # A copy, as Monster.get_damage: the lists are reused by the next game.
+        return self._blocks[:self._block_turns]
+
+    @property
+    def played_cards(self) -> list:
+        return self._played_cards[:self._played_turns]
+
+    def snapshot(self) -> tuple:
+        # Not the deck's: see Deck.snapshot and game_state.snapshot. Of the blocks and played cards
+        # only the number of turns is kept, so a snapshot costs the same however long the game.
+        return super().snapshot() + (self.post_strength_debuff_once, self._block_turns, self._played_turns)
+
+    def _restore(self, state: tuple, seed) -> tuple:
+        post_strength_debuff_once, self._block_turns, self._played_turns, *rest = super()._restore(state, seed)
+        if seed is not None:
+            self._rng = numpy.random.default_rng(seed)
+        self.post_strength_debuff_once = post_strength_debuff_once
+        # Rewinds this player's own history to the snapshot's turns: restored onto a player from
+        # another game, the earlier turns are that game's.
+        self.reserve(max(self._block_turns, self._played_turns))
+        return tuple(rest)
+
     @staticmethod
     def _sort_key(c: Card):
         pass
@@ -39,7 +82,7 @@ class Player(Character):
              c.energy if c.energy else 1000,  # remove else
              c.exhausts,
              c.attack)
-        logger.debug(f"attack_sort_key: {c}, {k}")
+        logger.debug("attack_sort_key: %s, %s", c, k)
         return k
 
     @staticmethod
@@ -48,7 +91,7 @@ class Player(Character):
              not c.is_attack(),
              c.energy if c.energy else 1000,
              c.block)
-        logger.debug(f"defend_sort_key: {c}, {k}")
+        logger.debug("defend_sort_key: %s, %s", c, k)
         return k
 
     def select_card_to_play(self, energy, monster: Monster) -> Union[Card, None]:
@@ -56,8 +99,8 @@ class Player(Character):
             if card.energy > energy:
                 continue
             if self.block >= monster.attack() and card.block > 0:
-                logger.info(
-                    f"!!skipping {card} due to sufficient block: {self.block} >= {monster.planned_damage}")
+                logger.info("!!skipping %s due to sufficient block: %s >= %s",
+                            card, self.block, monster.planned_damage)
                 # continue
 
             return card
@@ -66,71 +109,91 @@ class Player(Character):
 
     def _sort_hand(self):
         self.deck.sort_hand(self._sort_key)
-        logger.debug(f"Sorted: {self.deck.hand}")
+        logger.debug("Sorted: %s", self.deck.hand)
+
+    def _select_card_steps(self, energy, monster: Monster):
+        # Generator form of select_card_to_play. AIPlayer yields its pending decision from here.
+        return self.select_card_to_play(energy, monster)
+        yield
 
-    def _play_hand(self, monster: Monster):
+    def _play_hand_steps(self, monster: Monster):
         self._sort_hand()
 
         energy = self.energy
         played_cards = []
-        logger.info(f"incoming attack: {monster.attack()}")
-        card_to_play = self.select_card_to_play(energy, monster)
-        while card_to_play:
+        logger.info("incoming attack: %s", monster.attack())
+        while card_to_play := (yield from self._select_card_steps(energy, monster)):
             if not monster.hp:
                 return played_cards
-            logger.debug(f"playing card: {card_to_play}")
-            # print(f"{self.deck.hand}: {self.deck.hand.count(Card.STRIKE)}")
-            csv_logger.play_card(
+            logger.debug("playing card: %s", card_to_play)
+            self.csv_logger.play_card(
                 (card_to_play.name, energy, self.hp, self.block,
                  monster.hp, monster.attack(), monster.block, monster.get_vulnerable(),
-                 self.deck.hand.count(Card.STRIKE), self.deck.hand.count(Card.BASH)))
+                 *[self.deck.hand_count(c) for c in HAND_CARDS]))
 
             played_cards.append(card_to_play)
             energy -= card_to_play.energy
-            if card_to_play.exhausts:
-                self.deck.exhaust([card_to_play])
-            else:
-                self.deck.discard_from_hand([card_to_play])
-
-            if card_to_play.attack:
-                strike_bonus = card_to_play.calculate_strike_bonus(self.deck)
-                damage = (card_to_play.attack_multiplier *
-                          (card_to_play.attack + strike_bonus + self.strength * card_to_play.attack_strength_multiplier))
-                monster.defend(damage)
-
-            if card_to_play.vulnerable:
-                monster.vulnerable(card_to_play.vulnerable)
-
-            monster.strength += card_to_play.enemy_strength_gain
-            self.block += card_to_play.block
-            self.strength_buff += card_to_play.strength_buff
-            self.strength += card_to_play.strength_gain
-            self.post_strength_debuff_once += card_to_play.strength_loss
-            self.strength *= card_to_play.strength_multiplier
-            if card_to_play.draw_card:
-                # store card for logging only
-                cards = self.deck.deal(card_to_play.draw_card)
-                logger.info(f"drawing cards: {cards}")
-                self.deck.sort_hand(self._sort_key)
-
-            card_to_play.extra_action(self.deck)
-            # QUIT IF MONSTER DEAD
-            card_to_play = self.select_card_to_play(energy, monster)
-
-        self.blocks.append(self.block)
-
-        self.deck.discard_from_hand(self.deck.hand)
+            self.play_card(card_to_play, monster)
 
+        self.end_hand()
         return played_cards
 
-    def play_turn(self, monster: Monster):
+    def play_card(self, card_to_play: Card, monster: Monster):
+        """Plays one card from the hand against `monster`; the caller pays its energy."""
+        if card_to_play.exhausts:
+            self.deck.exhaust([card_to_play])
+        else:
+            self.deck.discard_from_hand([card_to_play])
+
+        if card_to_play.attack:
+            strike_bonus = card_to_play.calculate_strike_bonus(self.deck)
+            damage = (card_to_play.attack_multiplier *
+                      (card_to_play.attack + strike_bonus + self.strength * card_to_play.attack_strength_multiplier))
+            monster.defend(damage)
+
+        if card_to_play.vulnerable:
+            monster.vulnerable(card_to_play.vulnerable)
+
+        monster.strength += card_to_play.enemy_strength_gain
+        self.block += card_to_play.block
+        self.strength_buff += card_to_play.strength_buff
+        self.strength += card_to_play.strength_gain
+        self.post_strength_debuff_once += card_to_play.strength_loss
+        self.strength *= card_to_play.strength_multiplier
+        if card_to_play.draw_card:
+            # store card for logging only
+            cards = self.deck.deal(card_to_play.draw_card)
+            logger.info("drawing cards: %s", cards)
+            self.deck.sort_hand(self._sort_key)
+
+        card_to_play.extra_action(self.deck)
+
+    def end_hand(self):
+        # Done playing cards: the block is kept for the stats and the rest of the hand discarded.
+        if self._block_turns == len(self._blocks):
+            self.reserve(self._block_turns + 1)
+        self._blocks[self._block_turns] = self.block
+        self._block_turns += 1
+        self.deck.discard_from_hand(self.deck.hand)
+
+    def play_turn_steps(self, monster: Monster):
+        """Generator form of play_turn: yields (cards, state) whenever a card choice needs
+        a model score and expects the scores of those cards to be sent back."""
         logger.debug("play_turn...")
-        csv_logger.next_turn()
+        self.csv_logger.next_turn()
         self.block = 0
 
         self.deck.deal(5)
-        self.played_cards.append(self._play_hand(monster))
-        logger.info(f"Played: {self.played_cards[-1]}")
+        played_cards = yield from self._play_hand_steps(monster)
+        if self._played_turns == len(self._played_cards):
+            self.reserve(self._played_turns + 1)
+        self._played_cards[self._played_turns] = played_cards
+        self._played_turns += 1
+        logger.info("Played: %s", played_cards)
+        self.finish_turn(monster)
+
+    def finish_turn(self, monster: Monster):
+        """The rest of the turn once the hand is played: the monster attacks and both end the turn."""
         if monster.hp:
             attack = monster.attack()  # monster.isAttacking()
             if attack:
@@ -142,68 +205,131 @@ class Player(Character):
         monster.end_turn()
         self.end_turn()
 
-    def play_game(self, monster: Monster, turns: int):
-        logger.info(
-            f"GAME START player.hp: {self.hp}, monster.hp: {monster.hp}")
+    def play_game_steps(self, monster: Monster, turns: int):
+        """Generator form of play_game, see play_turn_steps."""
+        logger.info("GAME START player.hp: %s, monster.hp: %s", self.hp, monster.hp)
+        monster.reserve(turns)
+        self.reserve(turns)
         for turn in range(turns):
-            logger.info(f"***** TURN {turn} ******")
-            self.play_turn(monster)
+            logger.info("***** TURN %s ******", turn)
+            yield from self.play_turn_steps(monster)
             if not monster.hp or not self.hp:
                 break
-        logger.info(
-            f"GAME END player.hp: {self.hp} monster.hp: {monster.hp}, damage: {monster.get_damage()}")
-        csv_logger.end_game(self.hp)
+        logger.info("GAME END player.hp: %s monster.hp: %s, damage: %s", self.hp, monster.hp, monster.get_damage())
+        self.csv_logger.end_game(self.hp)
+
+    def _run(self, steps):
+        # Only AIPlayer's steps wait for scores: the others play through in one go.
+        next(steps, None)
+
+    def play_turn(self, monster: Monster):
+        self._run(self.play_turn_steps(monster))
+
+    def play_game(self, monster: Monster, turns: int):
+        self._run(self.play_game_steps(monster, turns))
 
 
 class DefendingPlayer(Player):
+    __slots__ = ()
+
     @staticmethod
     def _sort_key(c: Card):
         return (Player.defend_sort_key(c), Player.attack_sort_key(c))
 
 
 class AttackingPlayer(Player):
+    __slots__ = ()
+
     @staticmethod
     def _sort_key(c: Card):
         return (Player.attack_sort_key(c), Player.defend_sort_key(c))
 
 
 class AIPlayer(Player):
-    _m = None
+    __slots__ = ("_batch",)
+    _predictor = None
+    _model_stamp = None
 
     def __init__(self, *args, **kw):
         super().__init__(*args, **kw)
-        if not AIPlayer._m:
-            AIPlayer._m = fastai_sts.setup_model()
+        if not AIPlayer._predictor:
+            AIPlayer._predictor = inference.CachedPredictor(AIPlayer.load_predictor())
+            AIPlayer._model_stamp = inference.model_stamp()
+        self._batch = inference.DecisionBatch(AIPlayer._predictor.codes)
+
+    @staticmethod
+    def check_model():
+        """Drops the model, and its decision cache, if it has been retrained since it was loaded:
+        the next AIPlayer reloads it. Called once per batch of trials rather than per player."""
+        if AIPlayer._predictor and AIPlayer._model_stamp != inference.model_stamp():
+            AIPlayer._predictor = None
+
+    @staticmethod
+    def use_predictor(predictor):
+        """Scores with `predictor` from now on, e.g. a model fitted in this process."""
+        AIPlayer._predictor = inference.CachedPredictor(predictor)
+        AIPlayer._model_stamp = inference.model_stamp()
+
+    @staticmethod
+    def load_predictor():
+        if os.path.exists(inference.COMPILED_MODEL):
+            print(f"loading {inference.COMPILED_MODEL}", file=sys.stderr, flush=True)
+            return inference.CompiledForest.load()
+        # No compiled model yet: train or unpickle it with fastai, which also writes one.
+        import fastai_sts
+        return fastai_sts.setup_predictor()
 
     def _sort_hand(self):
-        self.deck.sort_hand(None)
+        self.deck.shuffle_hand(self._rng)
 
-    def select_card_to_play(self, energy, monster: Monster) -> Union[Card, None]:
-        uniq_cards = set(card for card in self.deck.hand if card.energy <= energy)
-        if not uniq_cards:
+    def candidates(self, energy, monster: Monster):
+        """Returns the playable cards and the aidata.CONT_DATA state they are scored in."""
+        hand = self.deck.hand
+        cards = list(dict.fromkeys(card for card in hand if card.energy <= energy))
+        state = (energy, self.hp, self.block,
+                 monster.hp, monster.attack(), monster.block, monster.get_vulnerable(),
+                 *[self.deck.hand_count(c) for c in HAND_CARDS])
+        return cards, state
+
+    def choose_card(self, cards, ps) -> Union[Card, None]:
+        if not cards:
             return None
-        data = {
-            "PLAY": [c.name for c in uniq_cards],
-            "ENERGY": energy,
-            "PLAYER_HP": self.hp,
-            "PLAYER_BLOCK": self.block,
-            "MONSTER_HP": monster.hp,
-            "MONSTER_ATTACK": monster.attack(),
-            "MONSTER_BLOCK": monster.block,
-            "MONSTER_VULNERABLE": monster.get_vulnerable(),
-        }
-        hand_dict = { k:v for (k, v) in [(f"HAND_{c.name}", self.deck.hand.count(c)) for c in HAND_CARDS]}
-        data.update(hand_dict)
-        logger.debug(f"data {data}")
-        
-        ps = fastai_sts.predict(data, self._m)
-        best_cards = [x[1] for x in zip(ps, uniq_cards) if x[0] == min(ps)]
-        best_card = random.choice(list(best_cards))
-        logger.debug(f"best_card --> {list(zip(ps, uniq_cards))} --> {list(best_cards)} --> {best_card}")
+        best_cards = [x[1] for x in zip(ps, cards) if x[0] == min(ps)]
+        best_card = best_cards[self._rng.integers(len(best_cards))]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"best_card --> {list(zip(ps, cards))} --> {list(best_cards)} --> {best_card}")
         return best_card
 
+    def _score(self, cards, state):
+        self._batch.clear()
+        rows = self._batch.add(cards, state)
+        return self._batch.predict(self._predictor)[rows]
+
+    def select_card_to_play(self, energy, monster: Monster) -> Union[Card, None]:
+        cards, state = self.candidates(energy, monster)
+        if not cards:
+            return None
+        return self.choose_card(cards, self._score(cards, state))
+
+    def _run(self, steps):
+        try:
+            request = next(steps)
+            while True:
+                request = steps.send(self._score(*request))
+        except StopIteration:
+            pass
+
+    def _select_card_steps(self, energy, monster: Monster):
+        cards, state = self.candidates(energy, monster)
+        if not cards:
+            return None
+        ps = yield cards, state
+        return self.choose_card(cards, ps)
+
 
 class RandomPlayer(Player):
+    __slots__ = ()
+
     def _sort_hand(self):
-        self.deck.sort_hand(None)
-        logger.info(f"Sorted: {self.deck.hand}")
+        self.deck.shuffle_hand(self._rng)
+        logger.info("Sorted: %s", self.deck.hand)
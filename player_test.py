@@ -72,7 +72,7 @@ class TestPlayer(unittest.TestCase):
 
     def test_play_turn_draw_card(self):
         cards = [Card.POMMEL_STRIKE] + [Card.STRIKE] * 4 + [Card.BASH]
-        deck = Deck(cards)
+        deck = Deck(cards, shuffle=False)
         AttackingPlayer(deck).play_turn(self.monster)
 
         self.assertEqual([16], self.monster.get_damage())
@@ -0,0 +1,228 @@
+import argparse
+import datetime
+import json
+import logging
+import sys
+import time
+
+import numpy
+
+import csv_logger
+import dataset
+import inference
+import lockstep
+import simulation
+import sts
+from card import IRONCLAD_STARTER, Card
+from monster import Cultist, JawWorm, Monster
+from player import CSV_HEADER, AIPlayer, RandomPlayer
+
+DYNAMIC_IMPORTS = f"dynamic imports: {Card}, {IRONCLAD_STARTER}, {Cultist}, {JawWorm}, {Monster}"
+
+logger = logging.getLogger("fastai").getChild(__name__)
+
+LOG = "selfplay.jsonl"
+
+
+def play(strategy, cards, monster_factory, turns: int, trials: int, seed: int):
+    """Plays `trials` lock-step games and returns their training rows, columnar, and final hps."""
+    AIPlayer.check_model()
+    players, monsters, rows = [], [], []
+    for trial in range(trials):
+        player, monster = simulation.setup_trial(strategy, cards, monster_factory, seed + trial)
+        player.csv_logger = csv_logger.CsvLogger(CSV_HEADER)
+        rows.append(player.csv_logger.collect(game=trial))
+        players.append(player)
+        monsters.append(monster)
+    lockstep.play_games(players, monsters, turns, AIPlayer._predictor)
+    columns = CSV_HEADER.split(",")
+    return csv_logger.columnar(columns, [row for game in rows for row in game]), [p.hp for p in players]
+
+
+def features(rows: numpy.ndarray):
+    return (numpy.stack([rows[column] for column in inference.FEATURES], axis=1).astype(numpy.float32),
+            -rows["FINAL_HP"])
+
+
+class Reservoir:
+    """A uniform sample of at most `size` of the rows added so far, or all of them if `size` is None."""
+
+    def __init__(self, size: int = None, seed=0):
+        self.size = size
+        self.seen = 0
+        self.rows = None
+        self._rng = numpy.random.default_rng(seed)
+
+    def __len__(self):
+        return 0 if self.rows is None else len(self.rows)
+
+    def add(self, rows: numpy.ndarray):
+        rows = numpy.array(rows)
+        if self.rows is None:
+            self.rows = rows[:0]
+        fill = len(rows) if self.size is None else max(0, min(len(rows), self.size - len(self.rows)))
+        self.rows = numpy.concatenate([self.rows, rows[:fill]])
+        rest = rows[fill:]
+        if len(rest):
+            # Algorithm R: the n-th row seen replaces a random sampled row with probability size / n.
+            seen = self.seen + fill + numpy.arange(1, len(rest) + 1)
+            slots = (self._rng.random(len(rest)) * seen).astype(numpy.int64)
+            keep = slots < self.size
+            self.rows[slots[keep]] = rest[keep]
+        self.seen += len(rows)
+
+
+class SelfPlay:
+    """Alternates refitting the model and playing AIPlayer games with it, keeping the model and
+    the training rows in memory. New games are appended to `store` so that a later session, or
+    fastai_sts.py, can pick up from them.
+
+    By default each refit fits a new forest on every training row so far. With `new_trees` set,
+    refits instead add that many trees, fit on the newest games plus a reservoir sample of at most
+    `window` older rows (all of them without a window), to the current forest and drop its oldest
+    trees past `max_trees`, so that refits take about as long at the end of a long session as at
+    the start. The newest games join the reservoir once a refit has used them."""
+
+    def __init__(self, store: dataset.Dataset, cards, monster_factory, turns: int, trials: int, seed: int,
+                 new_trees: int = 0, max_trees: int = 40, window: int = None):
+        self.store = store
+        self.cards = cards
+        self.monster_factory = monster_factory
+        self.turns = turns
+        self.trials = trials
+        self.seed = seed
+        self.new_trees = new_trees
+        self.max_trees = max_trees
+        self.m = None
+        # Independent streams, so the two samples don't make the same keep or replace choices.
+        train_seed, valid_seed = numpy.random.SeedSequence(seed).spawn(2)
+        self.train = Reservoir(window, train_seed)
+        self.valid = Reservoir(window and window // 4, valid_seed)
+        self.recent = None
+        if len(store):
+            train, valid = store.train_valid()
+            self.train.add(train)
+            self.valid.add(valid)
+
+    def _keep_recent(self):
+        # The newest games' training rows join the older ones.
+        if self.recent is not None:
+            self.train.add(self.recent)
+        self.recent = None
+
+    def add_games(self, strategy):
+        self._keep_recent()
+        # Seeded by games stored so far, so a resumed session plays new games.
+        rows, final_hps = play(strategy, self.cards, self.monster_factory, self.turns, self.trials,
+                               self.seed + self.store.games)
+        segment = self.store.append(rows)
+        if segment:
+            rows = self.store.segment(len(self.store.manifest["segments"]) - 1)
+            self.recent = numpy.array(rows[:segment["valid_from"]])
+            self.valid.add(rows[segment["valid_from"]:])
+        return final_hps
+
+    def refit(self):
+        import fastai_sts
+        xs, y = features(numpy.concatenate([rows for rows in (self.train.rows, self.recent) if rows is not None]))
+        if self.new_trees and self.m is not None:
+            self.m = fastai_sts.add_trees(self.m, xs, y, self.new_trees, self.max_trees)
+        else:
+            self.m = fastai_sts.rf(xs, y, n_estimators=self.max_trees, max_samples=0.8)
+        self._keep_recent()
+        forest = inference.CompiledForest.from_model(self.m, csv_logger.PLAY_CODES)
+        forest.save()
+        AIPlayer.use_predictor(forest)
+        return len(xs)
+
+    def valid_rmse(self) -> float:
+        import fastai_sts
+        if not len(self.valid):
+            return None
+        return fastai_sts.m_rmse(self.m, *features(self.valid.rows))
+
+    def iteration(self, n: int) -> dict:
+        start = time.perf_counter()
+        fit_rows = self.refit()
+        fitted = time.perf_counter()
+        valid_rmse = self.valid_rmse()
+        final_hps = self.add_games(AIPlayer)
+        played = time.perf_counter()
+        return {
+            "iteration": n,
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "games": self.store.games,
+            "rows": len(self.store),
+            "fit_rows": fit_rows,
+            "trees": len(self.m.estimators_),
+            "fit_seconds": round(fitted - start, 3),
+            "valid_rmse": valid_rmse,
+            "play_seconds": round(played - fitted, 3),
+            "mean_final_hp": float(numpy.mean(final_hps)),
+        }
+
+
+def hp_table(log_path: str = LOG):
+    # "HH:MM:SS, mean final hp" lines, for sts.gplot.
+    with open(log_path) as f:
+        for line in f:
+            record = json.loads(line)
+            print(f"{record['time'][-8:]}, {record['mean_final_hp']}")
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        'cards', nargs='?', help='list of cards (defaults to Ironclad base set)', default="IRONCLAD_STARTER")
+    argparser.add_argument(
+        '--trials', help='games per iteration', type=int, default=200)
+    argparser.add_argument(
+        '--turns', help='number of turns', type=int, default=40)
+    argparser.add_argument(
+        '--monster', help='monster to fight', default='JawWorm')
+    argparser.add_argument(
+        '--seconds', help='stop starting iterations after this long', type=float, default=300)
+    argparser.add_argument(
+        '--iterations', help='stop after this many iterations', type=int, default=sys.maxsize)
+    argparser.add_argument(
+        '--new-trees', help='refit by adding this many trees to the forest instead of a new forest',
+        type=int, default=0)
+    argparser.add_argument(
+        '--max-trees', help='trees in the forest', type=int, default=40)
+    argparser.add_argument(
+        '--window', help='train on a sample of at most this many rows', type=int, default=None)
+    argparser.add_argument(
+        '--dataset', help='dataset directory to train on and append to', default='sts.dataset')
+    argparser.add_argument(
+        '--log', help='json lines log, one record per iteration', default=LOG)
+    argparser.add_argument(
+        '--seed', help='seed', type=int, default=0)
+    argparser.add_argument(
+        '--table', help='print the log as "time, mean final hp" lines for gnuplot and exit', action="store_true")
+    args = argparser.parse_args()
+    if args.table:
+        hp_table(args.log)
+        return
+
+    sts.set_fast_mode()
+    store = dataset.Dataset(args.dataset)
+    selfplay = SelfPlay(store, eval(args.cards), eval(args.monster), args.turns, args.trials, args.seed,
+                        args.new_trees, args.max_trees, args.window)
+    if not len(store):
+        print("playing random games...", file=sys.stderr, flush=True)
+        selfplay.add_games(RandomPlayer)
+
+    end = time.perf_counter() + args.seconds
+    n = 0
+    while n < args.iterations and time.perf_counter() < end:
+        record = selfplay.iteration(n)
+        logger.info(f"selfplay: {record}")
+        with open(args.log, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"{record['time']} {record['games']} games: mean final hp {record['mean_final_hp']:.2f}, "
+              f"fit {record['fit_seconds']}s (validation rmse {record['valid_rmse']}), play {record['play_seconds']}s", file=sys.stderr, flush=True)
+        n += 1
+
+
+if __name__ == "__main__":
+    main()
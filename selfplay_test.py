@@ -0,0 +1,98 @@
+import logging.config
+import os
+import tempfile
+import unittest
+
+import numpy
+
+import dataset
+import inference
+import selfplay
+from card import IRONCLAD_STARTER
+from monster import JawWorm
+from player import AIPlayer, RandomPlayer
+
+logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
+
+
+class TestSelfPlay(unittest.TestCase):
+    def setUp(self):
+        import fastai_sts  # noqa: F401 - reads logging.conf on import, so before leaving this directory
+        self.saved = AIPlayer._predictor, AIPlayer._model_stamp
+        self.cwd = os.getcwd()
+        self.dir = tempfile.TemporaryDirectory()
+        os.chdir(self.dir.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.dir.cleanup()
+        AIPlayer._predictor, AIPlayer._model_stamp = self.saved
+
+    def test_iteration(self):
+        store = dataset.Dataset("sts.dataset")
+        play = selfplay.SelfPlay(store, IRONCLAD_STARTER, JawWorm, 10, 20, 0)
+        play.add_games(RandomPlayer)
+        record = play.iteration(0)
+
+        self.assertEqual(40, record["games"])
+        self.assertEqual(len(store), record["rows"])
+        # The newest games wait for the next refit to join the training rows.
+        self.assertEqual(len(store), len(play.train) + len(play.recent) + len(play.valid))
+        self.assertEqual(40, record["trees"])
+        self.assertTrue(os.path.exists(inference.COMPILED_MODEL))
+        self.assertEqual(inference.model_stamp(), AIPlayer._model_stamp)
+
+        # A new session picks up the stored games.
+        resumed = selfplay.SelfPlay(dataset.Dataset("sts.dataset"), IRONCLAD_STARTER, JawWorm, 10, 20, 0)
+        self.assertEqual(len(store), len(resumed.train) + len(resumed.valid))
+
+    def test_incremental(self):
+        play = selfplay.SelfPlay(dataset.Dataset("sts.dataset"), IRONCLAD_STARTER, JawWorm, 10, 20, 0,
+                                 new_trees=4, max_trees=10, window=100)
+        play.add_games(RandomPlayer)
+        records = [play.iteration(n) for n in range(4)]
+
+        self.assertEqual([10, 10, 10, 10], [record["trees"] for record in records])
+        self.assertEqual(100, len(play.train))
+        # The window plus the newest games' rows, not everything stored.
+        self.assertLess(100, records[-1]["fit_rows"])
+        self.assertLess(records[-1]["fit_rows"], records[-1]["rows"] / 2)
+        self.assertTrue(all(record["valid_rmse"] > 0 for record in records))
+
+    def test_refit_rows(self):
+        play = selfplay.SelfPlay(dataset.Dataset("sts.dataset"), IRONCLAD_STARTER, JawWorm, 10, 20, 0,
+                                 new_trees=4, max_trees=10)
+        play.add_games(RandomPlayer)
+        first = len(play.recent)
+        self.assertEqual(first, play.refit())
+        self.assertEqual(first, len(play.train))
+        self.assertIsNone(play.recent)
+
+        # Each new row is fit once: with no window, the older rows and the newest games.
+        play.add_games(AIPlayer)
+        self.assertEqual(first, len(play.train))
+        self.assertEqual(first + len(play.recent), play.refit())
+        self.assertEqual(len(play.store), len(play.train) + len(play.valid))
+
+    def test_reservoir(self):
+        reservoir = selfplay.Reservoir(100)
+        for start in range(0, 10_000, 300):
+            reservoir.add(numpy.arange(start, min(start + 300, 10_000)))
+        self.assertEqual(10_000, reservoir.seen)
+        self.assertEqual(100, len(set(reservoir.rows)))
+        # Sampled from the whole stream, not just its end.
+        self.assertLess(reservoir.rows.min(), 5_000)
+
+        everything = selfplay.Reservoir()
+        everything.add(numpy.arange(10))
+        everything.add(numpy.arange(10, 20))
+        self.assertEqual(list(range(20)), list(everything.rows))
+
+    def test_reservoirs_sample_independently(self):
+        play = selfplay.SelfPlay(dataset.Dataset("sts.dataset"), IRONCLAD_STARTER, JawWorm, 10, 20, 0, window=400)
+        self.assertNotEqual(list(play.train._rng.random(5)), list(play.valid._rng.random(5)))
+
+    def test_play(self):
+        rows, final_hps = selfplay.play(RandomPlayer, IRONCLAD_STARTER, JawWorm, 10, 5, 0)
+        self.assertEqual(list(range(5)), sorted(set(rows["GAME"])))
+        self.assertEqual(5, len(final_hps))
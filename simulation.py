@@ -0,0 +1,504 @@
+import functools
+import logging
+import multiprocessing
+import sys
+from collections import namedtuple
+from typing import Sequence
+
+import numpy
+import numpy.typing
+
+import lockstep
+import vector_engine
+from csv_logger import CsvLogger
+from deck import Deck
+from player import AIPlayer, CSV_HEADER, csv_logger
+
+# Playing the trials and collecting their stats, for sts.py to plot. Everything that decides a
+# run's results lives here rather than in sts.py, so that sweep.py can hash it.
+logger = logging.getLogger("sts").getChild(__name__)
+
+
+def _turn_counts(values_by_trial: numpy.typing.NDArray):
+    # Counts of each value in each turn (column), -1s left out, from a single bincount over
+    # turn * width + value - low, where low is the turn's lowest value and width the widest
+    # range of any turn. Returns the (turns, width) counts and each turn's lowest and highest value.
+    values = numpy.asarray(values_by_trial, dtype=numpy.int64)
+    turns = values.shape[1]
+    present = values != -1
+    big = numpy.iinfo(numpy.int64).max
+    lows = numpy.where(present, values, big).min(0, initial=big)
+    highs = numpy.where(present, values, -big).max(0, initial=-big)
+    # A turn without values gets an empty range.
+    empty = lows > highs
+    lows[empty], highs[empty] = 0, -1
+    width = int((highs - lows).max(initial=-1)) + 1
+    turn = numpy.broadcast_to(numpy.arange(turns), values.shape)[present]
+    counts = numpy.bincount(turn * width + values[present] - lows[turn], minlength=turns * width)
+    return counts.reshape(turns, width), lows, highs
+
+
+def _value_counts(values_by_trial: numpy.typing.NDArray, width: int):
+    # The (turns, width) counts of each value from 0 in each turn, -1s left out.
+    turns = values_by_trial.shape[1]
+    present = values_by_trial != -1
+    turn = numpy.broadcast_to(numpy.arange(turns), values_by_trial.shape)[present]
+    return numpy.bincount(turn * width + values_by_trial[present], minlength=turns * width).reshape(turns, width)
+
+
+def histogram(values_by_trial: numpy.typing.NDArray):
+    # Per turn, the (counts, bin edges) numpy.histogram would give with one bin per value
+    # from the turn's lowest to its highest.
+    counts, lows, highs = _turn_counts(values_by_trial)
+    hists = [(counts[turn, :high - low + 1], numpy.arange(low, high + 2))
+             for turn, (low, high) in enumerate(zip(lows, highs))]
+
+    logger.debug(f"histogram --> {hists}")
+    return hists
+
+
+def create_scatter_plot_data(values_by_trial):
+    # plot_data is an array of trials, where each trial is an array of values (e.g. damage or block).
+    # returns scatter plot data based on a histogram of the trial data.
+    # create_scatter_plot_data returns:
+    # - scatter_data: a dictionary with two values:
+    #     - turns: array of turn numbers (one per data point)
+    #     - value: array of values (one per histogram bin)
+    # - size: array of sizes (one per data point); sizes are proportional to histogram bucket counts
+    # - sizes_by_value_by_turn: array (one per turn) of dictionary of sizes with the value as the key
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"create_scatter_plot_data values_by_trial: {values_by_trial}")
+
+    counts, lows, _ = _turn_counts(values_by_trial)
+    return scatter_plot_data_from_counts(counts, lows, len(values_by_trial))
+
+
+def scatter_plot_data_from_counts(counts: numpy.typing.NDArray, lows: numpy.typing.NDArray, trials: int):
+    # create_scatter_plot_data from the (turns, width) counts of each turn's values, counting
+    # from the turn's value in `lows`.
+    # Nonzero bins in turn order, and by value within a turn.
+    turns, bins = numpy.nonzero(counts)
+    values = (bins + lows[turns]).tolist()
+    size = (counts[turns, bins] / (trials / 100.0)).tolist()
+    turns = turns.tolist()
+    scatter_data = {'turns': turns, 'value': values}
+    sizes_by_value_by_turn = [{} for _ in range(len(counts))]
+    for turn, value, s in zip(turns, values, size):
+        sizes_by_value_by_turn[turn][value] = s
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"scatter_data: {scatter_data}, {size}, {sizes_by_value_by_turn}")
+
+    return scatter_data, size, sizes_by_value_by_turn
+
+
+class TurnValues:
+    """A value per turn for each trial, kept in a (trials, turns) int array with -1 past the end of
+    each trial's row, and the row lengths alongside. The array is allocated for the expected trials
+    and turns up front and doubles in length when more trials are added."""
+
+    def __init__(self, trials: int = 0, turns: int = 0):
+        self.values = numpy.full((trials, turns), -1, dtype=numpy.int64)
+        self.lengths = numpy.zeros(trials, dtype=numpy.int64)
+        self.count = 0
+
+    def _reserve(self, trials: int, turns: int):
+        rows, width = self.values.shape
+        if trials <= rows and turns <= width:
+            return
+        values = numpy.full((max(trials, 2 * rows), max(turns, width)), -1, dtype=numpy.int64)
+        values[:rows, :width] = self.values
+        lengths = numpy.zeros(len(values), dtype=numpy.int64)
+        lengths[:rows] = self.lengths
+        self.values, self.lengths = values, lengths
+
+    def add(self, values: Sequence):
+        self._reserve(self.count + 1, len(values))
+        self.values[self.count, :len(values)] = values
+        self.lengths[self.count] = len(values)
+        self.count += 1
+
+    def extend(self, values: numpy.typing.NDArray, lengths: numpy.typing.NDArray):
+        """Adds a row of `values` per trial, of which the first `lengths` are used."""
+        trials, turns = values.shape
+        self._reserve(self.count + trials, turns)
+        used = numpy.arange(turns) < lengths[:, None]
+        self.values[self.count:self.count + trials, :turns] = numpy.where(used, values, -1)
+        self.lengths[self.count:self.count + trials] = lengths
+        self.count += trials
+
+    def __len__(self):
+        return self.count
+
+    def dense(self) -> numpy.typing.NDArray:
+        # A view of the used rows and columns.
+        return self.values[:self.count, :self.lengths[:self.count].max(initial=0)]
+
+    def tolist(self) -> list:
+        return [row[:length].tolist() for row, length in zip(self.values, self.lengths[:self.count])]
+
+    def clear(self):
+        self.values[:self.count] = -1
+        self.lengths[:self.count] = 0
+        self.count = 0
+
+    def scatter_data(self):
+        return create_scatter_plot_data(self.dense())
+
+    def value_counts(self) -> numpy.typing.NDArray:
+        dense = self.dense()
+        return _value_counts(dense, int(dense.max(initial=-1)) + 1)
+
+    def average(self) -> numpy.typing.NDArray:
+        # The mean of each turn over the trials with a value for it.
+        dense = self.dense()
+        present = dense != -1
+        return numpy.where(present, dense, 0).sum(0) / present.sum(0)
+
+
+class TrialStats:
+    def __init__(self, trials: int = 0, turns: int = 0):
+        # `trials` and `turns` size the arrays up front; more of either still fit.
+        self.monster_damage = TurnValues(trials, turns)
+        self.cum_monster_damage = []
+        self.player_block = TurnValues(trials, turns)
+        self.player_turn_and_final_hp = []
+
+    @property
+    def turns(self):
+        return self.player_block.lengths[:len(self.player_block)]
+
+    def add_player_block(self, block):
+        self.player_block.add(block)
+
+    def add_monster_damage(self, damage: Sequence):
+        self.monster_damage.add(damage)
+
+    def add_player_hp(self, turn, hp):
+        self.player_turn_and_final_hp += [(turn, hp)]
+
+    def finish(self):
+        self.monster_damage_dense = self.monster_damage.dense()
+        self.player_block_dense = self.player_block.dense()
+
+        self.average_monster_damage = self.monster_damage.average()
+        self.cum_monster_damage = numpy.sum(self.average_monster_damage)
+
+        self.average_player_block = self.player_block.average()
+        self.final_hp_counts = count_final_hp(self.player_turn_and_final_hp)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"trial_stats damage: {self.monster_damage.tolist()}")
+            logger.debug(f"trial_stats block: {self.player_block.tolist()}")
+            logger.debug(f"trial_stats turns: {self.turns}")
+            logger.debug(
+                f"trial_stats player_turn_and_final_hp: {self.player_turn_and_final_hp}")
+        logger.info(f"average_damage: {self.average_monster_damage}")
+        logger.info(f"cum_damage: {self.cum_monster_damage}")
+        logger.info(f"average_block: {self.average_player_block}")
+
+
+class TurnAccumulator:
+    """The running per-turn count, sum, sum of squares and histogram of TurnValues' values,
+    in memory that depends on the turns and the range of values but not on the trials. Values are
+    added to a TurnValues of `buffer_trials` rows that is folded in, with one bincount, when full."""
+
+    def __init__(self, turns: int = 0, buffer_trials: int = 4096):
+        self._buffer = TurnValues(buffer_trials, turns)
+        self.trials = 0
+        self.counts = numpy.zeros(turns, dtype=numpy.int64)
+        self.sums = numpy.zeros(turns, dtype=numpy.int64)
+        self.sums_of_squares = numpy.zeros(turns, dtype=numpy.int64)
+        # histograms[turn, value] is how many trials had `value` in `turn`.
+        self.histograms = numpy.zeros((turns, 0), dtype=numpy.int64)
+
+    def _reserve(self, turns: int, width: int):
+        rows, columns = self.histograms.shape
+        if turns <= rows and width <= columns:
+            return
+        histograms = numpy.zeros((max(turns, rows), max(width, 2 * columns)), dtype=numpy.int64)
+        histograms[:rows, :columns] = self.histograms
+        self.histograms = histograms
+        for name in ("counts", "sums", "sums_of_squares"):
+            grown = numpy.zeros(len(histograms), dtype=numpy.int64)
+            grown[:rows] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def _fold(self):
+        self._add_dense(self._buffer.dense())
+        self._buffer.clear()
+
+    def _add_dense(self, values: numpy.typing.NDArray):
+        present = values != -1
+        if not present.any():
+            return
+        turns = values.shape[1]
+        self._reserve(turns, int(values.max()) + 1)
+        width = self.histograms.shape[1]
+        kept = numpy.where(present, values, 0)
+        self.counts[:turns] += present.sum(0)
+        self.sums[:turns] += kept.sum(0)
+        self.sums_of_squares[:turns] += (kept * kept).sum(0)
+        self.histograms[:turns] += _value_counts(values, width)
+
+    def add(self, values: Sequence):
+        if len(self._buffer) == len(self._buffer.values):
+            self._fold()
+        self._buffer.add(values)
+        self.trials += 1
+
+    def extend(self, values: numpy.typing.NDArray, lengths: numpy.typing.NDArray):
+        # Straight into the totals: the rows are already in one array.
+        self._add_dense(numpy.where(numpy.arange(values.shape[1]) < lengths[:, None], values, -1))
+        self.trials += len(lengths)
+
+    def __len__(self):
+        return self.trials
+
+    def __getstate__(self):
+        # Pickles the totals and only the shape of the buffer, which comes back empty.
+        self._fold()
+        state = self.__dict__.copy()
+        state["_buffer"] = self._buffer.values.shape
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._buffer = TurnValues(*self._buffer)
+
+    def _used(self) -> int:
+        # The turns up to the last one any trial reached.
+        self._fold()
+        return len(numpy.trim_zeros(self.counts, 'b'))
+
+    def average(self) -> numpy.typing.NDArray:
+        used = self._used()
+        return self.sums[:used] / self.counts[:used]
+
+    def std(self) -> numpy.typing.NDArray:
+        used = self._used()
+        average = self.sums[:used] / self.counts[:used]
+        return numpy.sqrt(numpy.maximum(self.sums_of_squares[:used] / self.counts[:used] - average ** 2, 0))
+
+    def value_counts(self) -> numpy.typing.NDArray:
+        # Trials with each value from 0 in each turn.
+        return self.histograms[:self._used()]
+
+    def scatter_data(self):
+        used = self._used()
+        return scatter_plot_data_from_counts(
+            self.histograms[:used], numpy.zeros(used, dtype=numpy.int64), self.trials)
+
+
+def count_final_hp(player_turn_and_final_hp) -> dict:
+    # {turn: {hp: trials}}, with the turns in the order they first ended a trial.
+    final_hp_counts = {}
+    for turn, hp in player_turn_and_final_hp:
+        counts = final_hp_counts.setdefault(turn, {})
+        counts[hp] = counts.get(hp, 0) + 1
+    return final_hp_counts
+
+
+class StreamingTrialStats:
+    """TrialStats for any number of trials: it keeps TurnAccumulators and counts of the final
+    hp by turn instead of every trial, so it has no dense arrays or player_turn_and_final_hp."""
+
+    def __init__(self, turns: int = 0, buffer_trials: int = 4096):
+        self.monster_damage = TurnAccumulator(turns, buffer_trials)
+        self.player_block = TurnAccumulator(turns, buffer_trials)
+        self.final_hp_counts = {}
+
+    def add_player_block(self, block):
+        self.player_block.add(block)
+
+    def add_monster_damage(self, damage: Sequence):
+        self.monster_damage.add(damage)
+
+    def add_player_hp(self, turn, hp):
+        counts = self.final_hp_counts.setdefault(turn, {})
+        counts[hp] = counts.get(hp, 0) + 1
+
+    def finish(self):
+        self.average_monster_damage = self.monster_damage.average()
+        self.std_monster_damage = self.monster_damage.std()
+        self.cum_monster_damage = numpy.sum(self.average_monster_damage)
+
+        self.average_player_block = self.player_block.average()
+        self.std_player_block = self.player_block.std()
+
+        logger.info(f"average_damage: {self.average_monster_damage} std: {self.std_monster_damage}")
+        logger.info(f"cum_damage: {self.cum_monster_damage}")
+        logger.info(f"average_block: {self.average_player_block} std: {self.std_player_block}")
+
+
+TurnInfo = namedtuple("TurnInfo", "TotalDamage CardsPlayed Damages")
+
+
+class CombatLog:
+    def __init__(self) -> None:
+        self.best_block = [0, None]
+        self.worst_block = [sys.maxsize, None]
+
+        self.best_attack = TurnInfo(
+            TotalDamage=0, CardsPlayed=None, Damages=[])
+        self.worst_attack = TurnInfo(
+            TotalDamage=sys.maxsize, CardsPlayed=None, Damages=[])
+
+    def add_combat(self, total_damage: int, combat: TurnInfo):
+        if total_damage > self.best_attack.TotalDamage:
+            self.best_attack = combat
+        if total_damage < self.worst_attack.TotalDamage:
+            self.worst_attack = combat
+
+    def add_block(self, total_block, cards_played):
+        if total_block > self.best_block[0]:
+            self.best_block = [total_block, cards_played]
+        if total_block < self.worst_block[0]:
+            self.worst_block = [total_block, cards_played]
+
+    def finish(self):
+        logger.info(f"BEST ATTACK: {self.best_attack}")
+        logger.info(f"WORST ATTACK: {self.worst_attack}")
+        logger.info(f"BEST BLOCK: {self.best_block}")
+        logger.info(f"WORST BLOCK: {self.worst_block}")
+
+
+TrialResult = namedtuple("TrialResult", "damage blocks turn hp played_cards")
+
+
+def setup_trial(strategy, cards, monster_factory, seed: int):
+    # Independent streams for the deck shuffles, the monster's intents and the player's own choices,
+    # so a trial reproduces exactly regardless of which process runs it or in what order.
+    deck_seed, monster_seed, player_seed = numpy.random.SeedSequence(seed).spawn(3)
+    player = strategy(Deck(cards, seed=deck_seed), seed=player_seed)
+    monster = monster_factory(seed=monster_seed)
+    return player, monster
+
+
+def reset_trial(player, monster, seed: int):
+    # setup_trial for a player and monster from an earlier trial, without building new ones.
+    deck_seed, monster_seed, player_seed = numpy.random.SeedSequence(seed).spawn(3)
+    player.deck.reset(deck_seed)
+    player.reset(player_seed)
+    monster.reset(monster_seed)
+
+
+def trial_result(player, monster) -> TrialResult:
+    return TrialResult(monster.get_damage(), player.blocks, monster.turn, player.hp, player.played_cards)
+
+
+def run_trial(strategy, cards, monster_factory, turns: int, seed: int) -> TrialResult:
+    player, monster = setup_trial(strategy, cards, monster_factory, seed)
+    player.play_game(monster, turns)
+    return trial_result(player, monster)
+
+
+def play_trials(strategy, cards, monster_factory, turns: int, seeds, reuse: bool = False):
+    # run_trial for each seed. With reuse, one player and monster are reset for every trial.
+    AIPlayer.check_model()
+    pair = None
+    for seed in seeds:
+        if reuse and pair:
+            reset_trial(*pair, seed)
+        else:
+            pair = setup_trial(strategy, cards, monster_factory, seed)
+        player, monster = pair
+        player.play_game(monster, turns)
+        yield trial_result(player, monster)
+
+
+def add_trial(trial_stats: TrialStats, combat_log: CombatLog, result: TrialResult):
+    trial_stats.add_monster_damage(result.damage)
+    trial_stats.add_player_block(result.blocks)
+    trial_stats.add_player_hp(result.turn, result.hp)
+    total_damage = numpy.sum(result.damage)
+    combat_log.add_combat(total_damage, TurnInfo(
+        total_damage, result.played_cards, result.damage))
+    combat_log.add_block(numpy.sum(result.blocks), result.played_cards)
+
+
+def _run_chunk(strategy, cards, monster_factory, turns: int, seed: int, reuse: bool, bounds):
+    # Runs in a worker process: csv rows are collected here and logged by the parent in trial order.
+    start, stop = bounds
+    rows = csv_logger.collect(game=start)
+    results = list(play_trials(strategy, cards, monster_factory, turns, range(start + seed, stop + seed), reuse))
+    return results, rows
+
+
+def _chunks(trials: int, count: int):
+    bounds = [trials * i // count for i in range(count + 1)]
+    return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def _run_parallel(strategy, cards, monster_factory, turns: int, trials: int, seed: int, workers: int,
+                  reuse: bool):
+    # fork so that workers inherit the parent's logging config instead of re-running fileConfig,
+    # which would truncate sts.csv and turns.log.
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        run_chunk = functools.partial(_run_chunk, strategy, cards, monster_factory, turns, seed, reuse)
+        for results, rows in pool.imap(run_chunk, _chunks(trials, workers * 4)):
+            yield from results
+            csv_logger.log_rows(rows)
+
+
+def _run_lockstep(strategy, cards, monster_factory, turns: int, trials: int, seed: int):
+    # Every game logs to its own buffer; the rows are logged in trial order once all games end.
+    AIPlayer.check_model()
+    players, monsters, rows = [], [], []
+    for trial in range(trials):
+        player, monster = setup_trial(strategy, cards, monster_factory, trial + seed)
+        player.csv_logger = CsvLogger(CSV_HEADER)
+        rows.append(player.csv_logger.collect(game=trial))
+        players.append(player)
+        monsters.append(monster)
+
+    steps = lockstep.play_games(players, monsters, turns, AIPlayer._predictor)
+    logger.info(f"lockstep: {trials} trials, {steps} predict calls")
+    for game_rows in rows:
+        csv_logger.log_rows(game_rows)
+    return [trial_result(player, monster) for player, monster in zip(players, monsters)]
+
+
+def new_trial_stats(trials: int, turns: int, streaming: bool):
+    return StreamingTrialStats(turns) if streaming else TrialStats(trials, turns)
+
+
+def run_trials(strategy, cards, monster_factory, turns: int, trials: int, seed: int = 0, workers: int = 1,
+               lockstep_games: bool = False, reuse: bool = False, streaming: bool = False):
+    trial_stats = new_trial_stats(trials, turns, streaming)
+    combat_log = CombatLog()
+
+    if lockstep_games:
+        results = _run_lockstep(strategy, cards, monster_factory, turns, trials, seed)
+    elif workers > 1:
+        results = _run_parallel(strategy, cards, monster_factory, turns, trials, seed, workers, reuse)
+    else:
+        results = play_trials(strategy, cards, monster_factory, turns, range(seed, trials + seed), reuse)
+
+    for trial, result in enumerate(results):
+        add_trial(trial_stats, combat_log, result)
+        if trial % 100 == 0:
+            print(".", end='', file=sys.stderr, flush=True)
+    print("", file=sys.stderr)
+    return trial_stats, combat_log
+
+
+def run_vector_trials(strategy, cards, monster_factory, turns: int, trials: int, seed: int = 0,
+                      streaming: bool = False):
+    batch = vector_engine.simulate(strategy, cards, monster_factory, turns, trials, seed)
+    trial_stats = new_trial_stats(0, turns, streaming)
+    combat_log = CombatLog()
+    trial_stats.monster_damage.extend(batch.damage, batch.damage_turns)
+    trial_stats.player_block.extend(batch.blocks, batch.block_turns)
+    for turn, hp in zip(batch.final_turn.tolist(), batch.final_hp.tolist()):
+        trial_stats.add_player_hp(turn, hp)
+
+    # CombatLog keeps the first best and worst trial, which are the first argmax and argmin.
+    total_damage = batch.damage.sum(1)
+    for trial in (total_damage.argmax(), total_damage.argmin()):
+        combat_log.add_combat(total_damage[trial], TurnInfo(
+            total_damage[trial], batch.played_cards(trial), batch.monster_damage(trial)))
+    total_block = batch.blocks.sum(1)
+    for trial in (total_block.argmax(), total_block.argmin()):
+        combat_log.add_block(total_block[trial], batch.played_cards(trial))
+    return trial_stats, combat_log
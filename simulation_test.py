@@ -0,0 +1,158 @@
+import logging.config
+import unittest
+
+import numpy
+import numpy.testing
+
+import simulation
+from card import IRONCLAD_STARTER, Card
+from monster import Cultist, JawWorm
+from player import AttackingPlayer, RandomPlayer
+
+logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
+
+
+class TestTrialStats(unittest.TestCase):
+    def test_create_scatter_plot_data(self):
+        values_by_trial = numpy.array([[1, 2, 8], [1, 3, 8]])
+        scatter_data, size, sizes_by_value = simulation.create_scatter_plot_data(
+            values_by_trial)
+        print(simulation.create_scatter_plot_data(values_by_trial))
+        self.assertEqual({'turns': [0, 1, 1, 2], 'value': [
+                         1, 2, 3, 8]}, scatter_data)
+        self.assertEqual([100.0, 50.0, 50.0, 100.0], size)
+        self.assertEqual([{1: 100.0}, {2: 50.0, 3: 50.0},
+                         {8: 100.0}], sizes_by_value)
+
+    def test_histogram_values(self):
+        values_by_trial = numpy.array([[1, 2, 8], [1, 3, 8]])
+        # hist, bin_edges
+        expected = (([2], [1, 2]),
+                    ([1, 1], [2, 3, 4]),
+                    ([2], [8, 9]))
+        results = simulation.histogram(values_by_trial)
+        print(results[0])
+        print(results[1])
+        print(results[2])
+
+        for i in range(len(results)):
+            self.assertCountEqual(expected[i][0], results[i][0])
+            self.assertCountEqual(expected[i][1], results[i][1])
+
+    def test_histogram_values_ragged(self):
+        values_by_trial = numpy.array([[1, 8], [1, -1], [1, 8]])
+        # hist, bin_edges
+        expected = (([3], [1, 2]),
+                    ([2], [8, 9]))
+        results = simulation.histogram(values_by_trial)
+        print(results[0])
+        print(results[1])
+
+        for i in range(len(results)):
+            self.assertCountEqual(expected[i][0], results[i][0])
+            self.assertCountEqual(expected[i][1], results[i][1])
+
+    def test_trial_stats_damage(self):
+        ts = simulation.TrialStats()
+        ts.add_monster_damage([1, 1, 2])
+        ts.add_monster_damage([3, 1, -1])
+        ts.finish()
+        numpy.testing.assert_equal(numpy.array(
+            [2, 1, 2]), ts.average_monster_damage)
+
+    def test_trial_stats_empty(self):
+        ts = simulation.TrialStats()
+        ts.finish()
+        numpy.testing.assert_equal(numpy.array([]), ts.average_monster_damage)
+
+    def test_trial_stats_grows(self):
+        ts = simulation.TrialStats(trials=1, turns=2)
+        rows = [[4, 5], [1, 2, 3, 6], [7]]
+        for row in rows:
+            ts.add_player_block(row)
+        ts.finish()
+        self.assertEqual(rows, ts.player_block.tolist())
+        numpy.testing.assert_equal([2, 4, 1], ts.turns)
+        numpy.testing.assert_equal([[4, 5, -1, -1], [1, 2, 3, 6], [7, -1, -1, -1]], ts.player_block_dense)
+        numpy.testing.assert_equal([4, 3.5, 3, 6], ts.average_player_block)
+
+    def test_turn_values_extend(self):
+        values = simulation.TurnValues()
+        values.add([1, 2])
+        values.extend(numpy.array([[3, 4, 5], [6, 7, 8]]), numpy.array([3, 1]))
+        self.assertEqual([[1, 2], [3, 4, 5], [6]], values.tolist())
+        numpy.testing.assert_equal([[1, 2, -1], [3, 4, 5], [6, -1, -1]], values.dense())
+
+    def test_turn_accumulator_matches_turn_values(self):
+        rng = numpy.random.default_rng(4)
+        values = simulation.TurnValues()
+        accumulator = simulation.TurnAccumulator(turns=2, buffer_trials=7)
+        for _ in range(50):
+            row = rng.integers(0, 5 + 20 * rng.random(), rng.integers(1, 12)).tolist()
+            values.add(row)
+            accumulator.add(row)
+        rows, lengths = rng.integers(0, 40, (30, 14)), rng.integers(1, 15, 30)
+        values.extend(rows, lengths)
+        accumulator.extend(rows, lengths)
+
+        dense = values.dense()
+        self.assertEqual(80, len(accumulator))
+        numpy.testing.assert_allclose(values.average(), accumulator.average())
+        numpy.testing.assert_allclose(numpy.ma.masked_equal(dense, -1).std(0), accumulator.std())
+        self.assertEqual(values.scatter_data(), accumulator.scatter_data())
+
+    def test_histogram_matches_numpy(self):
+        rng = numpy.random.default_rng(3)
+        values_by_trial = rng.integers(0, 30, (200, 12))
+        values_by_trial[rng.random(values_by_trial.shape) < 0.2] = -1
+        for turn, (hist, bin_edges) in enumerate(simulation.histogram(values_by_trial)):
+            values = values_by_trial[:, turn]
+            values = values[values != -1]
+            expected = numpy.histogram(values, bins=range(min(values), 2 + max(values)))
+            numpy.testing.assert_equal(expected[0], hist)
+            numpy.testing.assert_equal(expected[1], bin_edges)
+
+
+class TestRunTrials(unittest.TestCase):
+    def test_trial_is_order_independent(self):
+        first = simulation.run_trial(RandomPlayer, IRONCLAD_STARTER, JawWorm, 20, 5)
+        simulation.run_trial(RandomPlayer, IRONCLAD_STARTER, JawWorm, 20, 6)
+        second = simulation.run_trial(RandomPlayer, IRONCLAD_STARTER, JawWorm, 20, 5)
+        self.assertEqual(first, second)
+
+    def test_workers_match_serial(self):
+        args = (AttackingPlayer, IRONCLAD_STARTER, JawWorm, 10, 30, 3)
+        serial_stats, serial_log = simulation.run_trials(*args)
+        parallel_stats, parallel_log = simulation.run_trials(*args, workers=2)
+
+        self.assertEqual(serial_stats.monster_damage.tolist(), parallel_stats.monster_damage.tolist())
+        self.assertEqual(serial_stats.player_block.tolist(), parallel_stats.player_block.tolist())
+        self.assertEqual(serial_stats.player_turn_and_final_hp,
+                         parallel_stats.player_turn_and_final_hp)
+        self.assertEqual(serial_log.best_attack, parallel_log.best_attack)
+        self.assertEqual(serial_log.worst_block, parallel_log.worst_block)
+
+    def test_streaming_matches_trial_stats(self):
+        for run_trials in (simulation.run_trials, simulation.run_vector_trials):
+            args = (AttackingPlayer, IRONCLAD_STARTER + [Card.ANGER], JawWorm, 12, 60)
+            stats, _ = run_trials(*args)
+            streaming_stats, _ = run_trials(*args, streaming=True)
+            stats.finish()
+            streaming_stats.finish()
+
+            for name in ("average_monster_damage", "average_player_block", "cum_monster_damage"):
+                numpy.testing.assert_allclose(getattr(stats, name), getattr(streaming_stats, name))
+            self.assertEqual(stats.monster_damage.scatter_data(), streaming_stats.monster_damage.scatter_data())
+            self.assertEqual(stats.player_block.scatter_data(), streaming_stats.player_block.scatter_data())
+            self.assertEqual(list(stats.final_hp_counts.items()), list(streaming_stats.final_hp_counts.items()))
+
+    def test_reuse_matches_new_trials(self):
+        for strategy, monster in ((RandomPlayer, JawWorm), (AttackingPlayer, Cultist)):
+            seeds = range(40)
+            new = list(simulation.play_trials(strategy, IRONCLAD_STARTER + [Card.ANGER], monster, 10, seeds))
+            reused = list(simulation.play_trials(strategy, IRONCLAD_STARTER + [Card.ANGER], monster, 10, seeds, reuse=True))
+            self.assertEqual(new, reused)
+
+
+if __name__ == '__main__':
+    unittest.main()
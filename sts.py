@@ -3,21 +3,19 @@ import logging
 import logging.config
 import math
 import sys
-from collections import namedtuple
-from telnetlib import SE
 from typing import Sequence
 
 import numpy
 import numpy.polynomial.polynomial as poly
-import numpy.typing
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
 from card import IRONCLAD_STARTER, Card
-from deck import Deck
 from monster import Cultist, JawWorm, Monster
-from player import AttackingPlayer, DefendingPlayer, RandomPlayer, AIPlayer
+from player import AttackingPlayer, DefendingPlayer, RandomPlayer, AIPlayer, csv_logger
+import intents
+from mcts import MCTSPlayer
+from optimal import OptimalPlayer  # noqa: F401 for --strategy
+import vector_engine
+from simulation import CombatLog, TrialStats, run_trials, run_vector_trials
 
 DYNAMIC_IMPORTS = f"dynamic imports: {JawWorm}, {Monster}, {AIPlayer}, {AttackingPlayer}, {DefendingPlayer}, {Card}, {IRONCLAD_STARTER}"
 
@@ -33,6 +31,15 @@ COLOR_DAMAGE = "#e41a1c"
 COLOR_BLOCK = "#377eb8"
 
 
+def set_fast_mode():
+    # The turn-by-turn trace in turns.log costs more than playing the games. Some "turns."
+    # loggers get a level of their own in logging.conf, so raise them all.
+    turn_logger.setLevel(logging.WARNING)
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("turns."):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+
 def get_frontloaded_damage(damage: list, scale=True):
     fld = 0.0
     scaling = 1.0
@@ -43,68 +50,6 @@ def get_frontloaded_damage(damage: list, scale=True):
     return fld
 
 
-def histogram(values_by_trial: numpy.typing.NDArray):
-    values_by_turn = numpy.swapaxes(values_by_trial, 0, 1)
-    logger.debug(f"histogram values_by_turn {values_by_turn}")
-    hists = []
-    for turn in range(len(values_by_turn)):
-        values = values_by_turn[turn]
-        values = values[values != -1.0]
-        r = range(int(min(values)), 2+int(max(values)))
-        hist = numpy.histogram(values, bins=r)
-        hists.append(hist)
-
-    logger.debug(f"histogram --> {hists}")
-    return hists
-
-
-def create_scatter_plot_data(values_by_trial):
-    # plot_data is an array of trials, where each trial is an array of values (e.g. damage or block).
-    # returns scatter plot data based on a histogram of the trial data.
-    # create_scatter_plot_data returns:
-    # - scatter_data: a dictionary with two values:
-    #     - turns: array of turn numbers (one per data point)
-    #     - value: array of values (one per histogram bin)
-    # - size: array of sizes (one per data point); sizes are proportional to histogram bucket counts
-    # - sizes_by_value_by_turn: array (one per turn) of dictionary of sizes with the value as the key
-    logger.debug(
-        f"create_scatter_plot_data values_by_trial: {values_by_trial}")
-
-    trials = len(values_by_trial)
-    values_by_turn = numpy.swapaxes(values_by_trial, 0, 1)
-    scatter_data = {}
-    scatter_data['turns'] = []
-    scatter_data['value'] = []
-    size = []
-    sizes_by_value_by_turn = []
-    histograms = histogram(values_by_trial)
-    for turn in range(len(values_by_turn)):
-        sizes_by_value = {}
-        hist = histograms[turn]
-        for bin_count, bin in zip(*hist):
-            if bin_count:
-                scatter_data['turns'].append(turn)
-                scatter_data['value'].append(bin)
-                s = bin_count/(trials/100.0)
-                sizes_by_value[bin] = s
-                size.append(s)
-        sizes_by_value_by_turn.append(sizes_by_value)
-        logger.debug(f"TURN {turn} scatter_data {scatter_data}")
-        logger.debug(f"TURN {turn} size: {size}")
-        logger.debug(
-            f"TURN {turn} sizes_by_value_by_turn {sizes_by_value_by_turn}")
-
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(f"TURN hist: {hist}")
-            logger.debug(f"TURN size: {size}")
-            logger.debug(f"TURN scatter_data {scatter_data}")
-
-    logger.debug(
-        f"scatter_data: {scatter_data}, {size}, {sizes_by_value_by_turn}")
-
-    return scatter_data, size, sizes_by_value_by_turn
-
-
 def format_scaling_damage(coefs: Sequence):
     scaling_damages = tuple([int(round(cc, 0)) for cc in coefs[1:]])
     while scaling_damages and not scaling_damages[-1]:
@@ -129,6 +74,7 @@ def curve_fit(x, y):
 
 
 def plot_one_attribute(data, size_by_turn, color, name, marker: dict):
+    import plotly.graph_objects as go
     marker = marker.copy()
     marker['size'] = []
     marker['color'] = color
@@ -138,102 +84,6 @@ def plot_one_attribute(data, size_by_turn, color, name, marker: dict):
     return go.Scatter(x=list(range(len(data))), y=data, mode='markers', marker=marker, name=name)
 
 
-def pad_to_dense(M):
-    """Appends the minimal required amount of -1's at the end of each
-     array in the jagged array `M`, such that `M` loses its jagedness."""
-
-    if len(M) == 0:
-        return numpy.array([])
-
-    maxlen = max(len(r) for r in M)
-
-    Z = numpy.zeros((len(M), maxlen))
-    Z -= 1
-    for enu, row in enumerate(M):
-        Z[enu, :len(row)] += 1
-        Z[enu, :len(row)] += row
-    return Z
-
-
-class TrialStats:
-    def __init__(self):
-
-        # TODO(sng): convert to numpy arrays
-        self.monster_damage = []
-        self.cum_monster_damage = []
-        self.player_block = []
-        self.turns = []
-        self.player_turn_and_final_hp = []
-
-    def add_player_block(self, block):
-        self.player_block.append(block)
-        self.turns.append(len(block))
-
-    def add_monster_damage(self, damage: Sequence):
-        self.monster_damage.append(damage)
-
-    def add_player_hp(self, turn, hp):
-        self.player_turn_and_final_hp += [(turn, hp)]
-
-    def _average(self, padded: numpy.typing.NDArray):
-        average = []
-        if padded.size:
-            value_by_turn = numpy.swapaxes(padded, 0, 1)
-            for trial in value_by_turn:
-                average += [numpy.average(trial[trial != -1])]
-        return average
-
-    def finish(self):
-        self.monster_damage_dense = pad_to_dense(self.monster_damage)
-        self.player_block_dense = pad_to_dense(self.player_block)
-
-        self.average_monster_damage = self._average(self.monster_damage_dense)
-        self.cum_monster_damage = numpy.sum(self.average_monster_damage)
-
-        self.average_player_block = self._average(self.player_block_dense)
-
-        logger.debug(f"trial_stats damage: {self.monster_damage}")
-        logger.debug(f"trial_stats block: {self.player_block}")
-        logger.debug(f"trial_stats turns: {self.turns}")
-        logger.debug(
-            f"trial_stats player_turn_and_final_hp: {self.player_turn_and_final_hp}")
-        logger.info(f"average_damage: {self.average_monster_damage}")
-        logger.info(f"cum_damage: {self.cum_monster_damage}")
-        logger.info(f"average_block: {self.average_player_block}")
-
-
-TurnInfo = namedtuple("TurnInfo", "TotalDamage CardsPlayed Damages")
-
-
-class CombatLog:
-    def __init__(self) -> None:
-        self.best_block = [0, None]
-        self.worst_block = [sys.maxsize, None]
-
-        self.best_attack = TurnInfo(
-            TotalDamage=0, CardsPlayed=None, Damages=[])
-        self.worst_attack = TurnInfo(
-            TotalDamage=sys.maxsize, CardsPlayed=None, Damages=[])
-
-    def add_combat(self, total_damage: int, combat: TurnInfo):
-        if total_damage > self.best_attack.TotalDamage:
-            self.best_attack = combat
-        if total_damage < self.worst_attack.TotalDamage:
-            self.worst_attack = combat
-
-    def add_block(self, total_block, cards_played):
-        if total_block > self.best_block[0]:
-            self.best_block = [total_block, cards_played]
-        if total_block < self.worst_block[0]:
-            self.worst_block = [total_block, cards_played]
-
-    def finish(self):
-        logger.info(f"BEST ATTACK: {self.best_attack}")
-        logger.info(f"WORST ATTACK: {self.worst_attack}")
-        logger.info(f"BEST BLOCK: {self.best_block}")
-        logger.info(f"WORST BLOCK: {self.worst_block}")
-
-
 def get_damage_stats(deck_size: int, trial_stats: TrialStats):
     # Calculate big-O stats after going through the deck a couple times.
     turns_after_first_deck = 2 * int(deck_size / 5)
@@ -265,10 +115,10 @@ def get_damage_stats(deck_size: int, trial_stats: TrialStats):
 
 
 def plot_attack_damage(trial_stats: TrialStats, combat_log: CombatLog, card_size):
+    import plotly.graph_objects as go
     scaling_damage, fit_x, fit_y = get_damage_stats(card_size, trial_stats)
 
-    damage_scatter_data, size, sizes_by_damage_by_turn = create_scatter_plot_data(
-        trial_stats.monster_damage_dense)
+    damage_scatter_data, size, sizes_by_damage_by_turn = trial_stats.monster_damage.scatter_data()
 
     logger.debug(
         f"best damage {combat_log.best_attack.Damages}, {size}, {sizes_by_damage_by_turn}")
@@ -306,8 +156,8 @@ def plot_attack_damage(trial_stats: TrialStats, combat_log: CombatLog, card_size
 
 
 def plot_player_block(trial_stats: TrialStats):
-    block_scatter_data, size, _ = create_scatter_plot_data(
-        trial_stats.player_block_dense)
+    import plotly.graph_objects as go
+    block_scatter_data, size, _ = trial_stats.player_block.scatter_data()
     traces = [
         go.Scatter(opacity=.5, x=block_scatter_data['turns'], y=block_scatter_data['value'], mode='markers',
                    marker=dict(
@@ -325,96 +175,63 @@ def plot_player_block(trial_stats: TrialStats):
     return traces, title
 
 
-def plot_player_hp(trial_stats: TrialStats):
-    return [go.Histogram(y=trial_stats.player_turn_and_final_hp)], "player hp"
+def expected_attack(trial_stats: TrialStats, turns: int):
+    # JawWorm's exact expected attack of each turn, from its intent chain rather than the trials,
+    # and the damage it is expected to do through the block the trials' player had.
+    attack = intents.distributions(turns).attack
+    damage_taken = intents.expected_damage_taken(attack, trial_stats.player_block.value_counts())
+    logger.info(f"expected damage taken: {damage_taken}, total: {numpy.sum(damage_taken):.2f}")
+    return intents.expected(attack), damage_taken
 
 
-def main():
-    logger.debug(f"starting...")
-    logger.info(f"info starting...")
+def plot_expected_attack(trial_stats: TrialStats, turns: int):
+    import plotly.graph_objects as go
+    attack, damage_taken = expected_attack(trial_stats, turns)
+    return [
+        go.Scatter(y=attack, mode='lines', line=dict(color=COLOR_HEART, width=2, dash='dot'),
+                   name='expected attack'),
+        go.Scatter(y=damage_taken, mode='lines', line=dict(color=COLOR_HEART, width=2),
+                   name='expected damage taken')]
 
-    argparser = argparse.ArgumentParser()
-    argparser.add_argument(
-        'cards', nargs='?', help='list of cards (defaults to Ironclad base set)')
-    argparser.add_argument(
-        '--strategy', help='player strategy (default: AttackingPlayer)', default="AttackingPlayer")
-    argparser.add_argument(
-        '--trials', help='number of trials', type=int, default=10000)
-    argparser.add_argument(
-        '--turns', help='number of turns', type=int, default=20)
-    argparser.add_argument(
-        '--monster', help='monster to fight', default='Monster')
-    argparser.add_argument(
-        '--write', help='write chart to disk', action="store_true")
-    argparser.add_argument(
-        '--plot', help='plot chart', action="store_true")
-    argparser.add_argument(
-        '--seed', help='seed', type=int, default=0)
-    args = argparser.parse_args()
-    strategy = eval(args.strategy)
-    cards = eval(args.cards)
-
-    monster_factory = eval(args.monster)
-
-    trial_stats = TrialStats()
-    combat_log = CombatLog()
-    turns = args.turns
-    trials = args.trials
-
-    for trial in range(trials):
-        player = strategy(Deck(cards, seed=trial + args.seed))
-        monster = monster_factory()
-        player.play_game(monster, turns)
-        trial_stats.add_monster_damage(monster.get_damage())
-        trial_stats.add_player_block(player.blocks)
-        trial_stats.add_player_hp(monster.turn, player.hp)
-        total_damage = numpy.sum(monster.get_damage())
-        combat_log.add_combat(total_damage, TurnInfo(
-            total_damage, player.played_cards, monster.get_damage()))
-        combat_log.add_block(numpy.sum(player.blocks), player.played_cards)
-        if trial % 100 == 0:
-            print(".", end='', file=sys.stderr, flush=True)
-    print("", file=sys.stderr)
-    combat_log.finish()
-    trial_stats.finish()
 
+def plot_player_hp(trial_stats: TrialStats):
+    import plotly.graph_objects as go
+    return [go.Histogram(y=trial_stats.player_turn_and_final_hp)], "player hp"
 
-    logger.debug(f"final_hp: {trial_stats.player_turn_and_final_hp}")
-    ending_hp_by_turn = {}
-    for turn, hp in trial_stats.player_turn_and_final_hp:
-        ending_hp_by_turn.setdefault(turn, []).append(hp)
 
+def final_hp_scatter(final_hp_counts: dict):
+    # The (turn, hp) points of the final hp chart and the trials at each, from final_hp_counts.
     hp_scatter_x = []
     hp_scatter_y = []
     last_y = -1
     sizes = []
-    for turn in ending_hp_by_turn.keys():
-        for y in sorted(ending_hp_by_turn[turn]):
+    for turn in final_hp_counts.keys():
+        for y, count in sorted(final_hp_counts[turn].items()):
             if y == last_y:
-                sizes[-1] += 1
+                sizes[-1] += count
             else:
                 last_y = y
-                sizes.append(1)
+                sizes.append(count)
                 hp_scatter_x.append(turn)
                 hp_scatter_y.append(y)
+    return hp_scatter_x, hp_scatter_y, sizes
 
-    logger.debug(f"scatter x and y: {hp_scatter_x}, {hp_scatter_y}, {sizes}")
-    ending_hp_avg_x = numpy.average(hp_scatter_x)
-    ending_hp_avg_y = numpy.average(hp_scatter_y)
-    logger.debug(f"average hp ending {ending_hp_avg_x}, {ending_hp_avg_y}")
-    print(f"{ending_hp_avg_y}")
-    
-    logger.debug(f"ending_hp_by_turn: {ending_hp_by_turn}")
-    if not args.plot:
-        return
+
+def make_figure(trial_stats: TrialStats, combat_log: CombatLog, card_size, monster_factory, turns: int, title: str):
+    # plotly takes longer to import than short runs take to play, so only load it to plot.
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
 
     traces_and_titles = []
 
     traces_and_titles.append(plot_attack_damage(
-        trial_stats, combat_log, len(cards)))
+        trial_stats, combat_log, card_size))
+    if monster_factory is JawWorm:
+        traces_and_titles[0][0].extend(plot_expected_attack(trial_stats, turns))
 
-    title = "IRONCLAD BASE" if len(
-        sys.argv) <= 1 else f'{args.strategy} vs {args.monster}<sup><br>{args.cards}</sup>'
+    hp_scatter_x, hp_scatter_y, sizes = final_hp_scatter(trial_stats.final_hp_counts)
+    ending_hp_avg_x = numpy.average(hp_scatter_x)
+    ending_hp_avg_y = numpy.average(hp_scatter_y)
     titles = [t[1] for t in traces_and_titles]
     
     fig = make_subplots(rows=1, cols=len(
@@ -450,8 +267,121 @@ def main():
     fig.update_layout(title_font_size=18)
     fig.update_layout(title_x=0.5)
     fig.update_annotations(font_size=12)
+    return fig
+
+
+def chart_args(argv):
+    """The arguments in `argv` that change the charts, which name the chart file: the others are
+    left out, with the value of an option given as a separate argument."""
+    kept = []
+    arguments = iter(argv)
+    for arg in arguments:
+        option = arg.split("=")[0]
+        if option in ('--workers', '--engine'):
+            if "=" not in arg:
+                next(arguments, None)
+        elif option not in ('--lockstep', '--fast', '--npy', '--reuse', '--streaming', '--write'):
+            kept.append(arg)
+    return kept
+
+
+def main():
+    logger.debug(f"starting...")
+    logger.info(f"info starting...")
+
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        'cards', nargs='?', help='list of cards (defaults to Ironclad base set)')
+    argparser.add_argument(
+        '--strategy', help='player strategy (default: AttackingPlayer)', default="AttackingPlayer")
+    argparser.add_argument(
+        '--trials', help='number of trials', type=int, default=10000)
+    argparser.add_argument(
+        '--turns', help='number of turns', type=int, default=20)
+    argparser.add_argument(
+        '--monster', help='monster to fight', default='Monster')
+    argparser.add_argument(
+        '--write', help='write chart to disk', action="store_true")
+    argparser.add_argument(
+        '--plot', help='plot chart', action="store_true")
+    argparser.add_argument(
+        '--seed', help='seed', type=int, default=0)
+    argparser.add_argument(
+        '--workers', help='number of worker processes (default: 1)', type=int, default=1)
+    argparser.add_argument(
+        '--engine', help='scalar plays one game at a time; vector plays all trials at once with numpy, '
+        'for AttackingPlayer/DefendingPlayer vs Monster/JawWorm, and writes no csv (default: scalar)',
+        choices=['scalar', 'vector'], default='scalar')
+    argparser.add_argument(
+        '--npy', help='also save the training rows to sts.npy, a columnar array that fastai_sts.py '
+        'loads without parsing', action="store_true")
+    argparser.add_argument(
+        '--fast', help='do not write the turn-by-turn trace to turns.log', action="store_true")
+    argparser.add_argument(
+        '--reuse', help='reset one player and monster for every trial instead of building new ones',
+        action="store_true")
+    argparser.add_argument(
+        '--streaming', help='keep running per-turn totals and histograms instead of every trial, '
+        'so memory does not grow with --trials', action="store_true")
+    argparser.add_argument(
+        '--lockstep', help='play all trials together, scoring the AIPlayer decisions of every game '
+        'with one model call per step', action="store_true")
+    argparser.add_argument(
+        '--mcts-iterations', help='MCTSPlayer search iterations per card choice (default: %(default)s)',
+        type=int, default=MCTSPlayer.iterations)
+    argparser.add_argument(
+        '--mcts-seconds', help='MCTSPlayer time budget per card choice, in seconds (default: none)', type=float)
+    argparser.add_argument(
+        '--mcts-rollout', help='strategy MCTSPlayer plays its rollouts with (default: AttackingPlayer)',
+        default="AttackingPlayer")
+    args = argparser.parse_args()
+    strategy = eval(args.strategy)
+    MCTSPlayer.iterations = args.mcts_iterations
+    MCTSPlayer.seconds = args.mcts_seconds
+    MCTSPlayer.rollout_strategy = eval(args.mcts_rollout)
+    cards = eval(args.cards)
+
+    monster_factory = eval(args.monster)
+    if args.fast:
+        set_fast_mode()
+    if args.npy:
+        csv_logger.npy_path = "sts.npy"
+
+    if args.engine == 'vector':
+        if strategy not in vector_engine.STRATEGIES or monster_factory not in vector_engine.MONSTERS:
+            argparser.error(f"--engine=vector does not support {args.strategy} vs {args.monster}")
+        trial_stats, combat_log = run_vector_trials(
+            strategy, cards, monster_factory, args.turns, args.trials, args.seed, args.streaming)
+    else:
+        if args.lockstep and args.workers > 1:
+            argparser.error("--lockstep runs in a single process, drop --workers")
+        trial_stats, combat_log = run_trials(
+            strategy, cards, monster_factory, args.turns, args.trials, args.seed, args.workers,
+            args.lockstep, args.reuse, args.streaming)
+    csv_logger.close()
+    combat_log.finish()
+    trial_stats.finish()
+
+
+    ending_hp_by_turn = trial_stats.final_hp_counts
+    hp_scatter_x, hp_scatter_y, sizes = final_hp_scatter(ending_hp_by_turn)
+    logger.debug(f"scatter x and y: {hp_scatter_x}, {hp_scatter_y}, {sizes}")
+    ending_hp_avg_x = numpy.average(hp_scatter_x)
+    ending_hp_avg_y = numpy.average(hp_scatter_y)
+    logger.debug(f"average hp ending {ending_hp_avg_x}, {ending_hp_avg_y}")
+    print(f"{ending_hp_avg_y}")
+    if AIPlayer._predictor:
+        print(f"decision cache: {AIPlayer._predictor}", file=sys.stderr)
+    
+    logger.debug(f"ending_hp_by_turn: {ending_hp_by_turn}")
+    if not args.plot:
+        return
+
+    title = "IRONCLAD BASE" if len(
+        sys.argv) <= 1 else f'{args.strategy} vs {args.monster}<sup><br>{args.cards}</sup>'
+    fig = make_figure(trial_stats, combat_log, len(cards), monster_factory, args.turns, title)
     if args.write:
-        filename = f"charts/{' '.join(sys.argv[1:]).replace('--write', '').strip()}.html"
+        filename = f"charts/{' '.join(chart_args(sys.argv[1:]))}.html"
         fig.write_html(filename)
     # logger.debug(f"fig: {fig}")
 
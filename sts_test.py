@@ -5,9 +5,6 @@ import numpy
 import numpy.testing
 
 import sts
-from card import Card
-from deck import Deck
-from monster import Monster
 
 logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
 
@@ -38,64 +35,30 @@ class TestDamage(unittest.TestCase):
         self.assertAlmostEqual(0.0, residuals[0])
         numpy.testing.assert_allclose([2.0]*10, fit)
 
-    def test_create_scatter_plot_data(self):
-        values_by_trial = numpy.array([[1, 2, 8], [1, 3, 8]])
-        scatter_data, size, sizes_by_value = sts.create_scatter_plot_data(
-            values_by_trial)
-        print(sts.create_scatter_plot_data(values_by_trial))
-        self.assertEqual({'turns': [0, 1, 1, 2], 'value': [
-                         1, 2, 3, 8]}, scatter_data)
-        self.assertEqual([100.0, 50.0, 50.0, 100.0], size)
-        self.assertEqual([{1: 100.0}, {2: 50.0, 3: 50.0},
-                         {8: 100.0}], sizes_by_value)
-
-    def test_histogram_values(self):
-        values_by_trial = numpy.array([[1, 2, 8], [1, 3, 8]])
-        # hist, bin_edges
-        expected = (([2], [1, 2]),
-                    ([1, 1], [2, 3, 4]),
-                    ([2], [8, 9]))
-        results = sts.histogram(values_by_trial)
-        print(results[0])
-        print(results[1])
-        print(results[2])
-
-        for i in range(len(results)):
-            self.assertCountEqual(expected[i][0], results[i][0])
-            self.assertCountEqual(expected[i][1], results[i][1])
-
-    def test_histogram_values_ragged(self):
-        values_by_trial = numpy.array([[1, 8], [1, -1], [1, 8]])
-        # hist, bin_edges
-        expected = (([3], [1, 2]),
-                    ([2], [8, 9]))
-        results = sts.histogram(values_by_trial)
-        print(results[0])
-        print(results[1])
-
-        for i in range(len(results)):
-            self.assertCountEqual(expected[i][0], results[i][0])
-            self.assertCountEqual(expected[i][1], results[i][1])
-
-    def test_pad_to_dense(self):
-        result = sts.pad_to_dense(numpy.array([[1, 2], [1]]))
-        numpy.testing.assert_equal(numpy.array([[1, 2], [1, -1]]), result)
-
-    def test_pad_to_dense_empty(self):
-        numpy.testing.assert_equal(numpy.array([]), sts.pad_to_dense([]))
-
-    def test_trial_stats_damage(self):
-        ts = sts.TrialStats()
-        ts.add_monster_damage([1, 1, 2])
-        ts.add_monster_damage([3, 1, -1])
-        ts.finish()
-        numpy.testing.assert_equal(numpy.array(
-            [2, 1, 2]), ts.average_monster_damage)
-
-    def test_trial_stats_empty(self):
-        ts = sts.TrialStats()
-        ts.finish()
-        numpy.testing.assert_equal(numpy.array([]), ts.average_monster_damage)
+
+class TestChartArgs(unittest.TestCase):
+    def test_leaves_out_run_options(self):
+        expected = ["IRONCLAD_STARTER", "--trials=100", "--plot"]
+        for argv in (["IRONCLAD_STARTER", "--workers", "4", "--trials=100", "--plot", "--write"],
+                     ["IRONCLAD_STARTER", "--workers=4", "--engine", "vector", "--trials=100", "--fast", "--plot"],
+                     ["--lockstep", "IRONCLAD_STARTER", "--trials=100", "--npy", "--plot", "--engine=scalar"]):
+            self.assertEqual(expected, sts.chart_args(argv))
+
+
+class TestFastMode(unittest.TestCase):
+    def test_fast_mode(self):
+        turn_loggers = [logging.getLogger(name) for name in list(logging.root.manager.loggerDict)
+                        if name.split(".")[0] == "turns"]
+        levels = [logger.level for logger in turn_loggers]
+        try:
+            sts.set_fast_mode()
+            for name in ("turns", "turns.player", "turns.deck", "turns.character"):
+                self.assertFalse(logging.getLogger(name).isEnabledFor(logging.INFO))
+            self.assertTrue(logging.getLogger("sts").isEnabledFor(logging.INFO))
+        finally:
+            for logger, level in zip(turn_loggers, levels):
+                logger.setLevel(level)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,201 @@
+import argparse
+import functools
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import pickle
+from collections import namedtuple
+
+import numpy
+
+import inference
+import player
+import simulation
+import sts
+import vector_engine
+from csv_logger import CsvLogger
+from mcts import MCTSPlayer
+
+logger = logging.getLogger("sts").getChild(__name__)
+
+CACHE_DIR = "sweep_cache"
+# Bump when what's cached changes in a way code_version() doesn't see. sts.py only plots, so it's left
+# out of code_version() and changing the charts doesn't throw the cache away.
+CACHE_VERSION = 1
+# The modules whose code decides the trials' results.
+SIMULATION_MODULES = ("aidata", "card", "character", "deck", "game_state", "inference", "intents", "lockstep",
+                      "mcts", "monster", "optimal", "player", "simulation", "vector_engine")
+
+Config = namedtuple("Config", "cards strategy monster turns trials seed engine")
+Config.__doc__ = """One sts.py run of a sweep. cards, strategy and monster are the expressions sts.py
+would be given, e.g. "IRONCLAD_STARTER + [Card.DEMON_FORM]"; engine is "scalar" or "vector"."""
+
+
+def _eval(expression: str):
+    # As sts.py evaluates its arguments, with every card, strategy and monster it imports.
+    return eval(expression, vars(sts))
+
+
+def grid(cards, strategies, monsters, turns, trials: int, seed: int = 0, engine: str = "auto") -> list:
+    """Every Config of the product of the card lists, strategies, monsters and turns. The "auto"
+    engine is vector_engine where it supports the strategy and monster, else scalar."""
+    configs = []
+    for deck, strategy, monster, turn in itertools.product(cards, strategies, monsters, turns):
+        config_engine = engine
+        if engine == "auto":
+            vector = _eval(strategy) in vector_engine.STRATEGIES and _eval(monster) in vector_engine.MONSTERS
+            config_engine = "vector" if vector else "scalar"
+        configs.append(Config(deck, strategy, monster, turn, trials, seed, config_engine))
+    return configs
+
+
+@functools.lru_cache(maxsize=None)
+def code_version() -> str:
+    digest = hashlib.sha256()
+    for module in SIMULATION_MODULES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{module}.py"), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _strategy_settings(strategy) -> tuple:
+    # What else decides a strategy's plays: AIPlayer's model and MCTSPlayer's search.
+    if strategy is sts.AIPlayer:
+        return (inference.model_stamp(),)
+    if strategy is MCTSPlayer:
+        return MCTSPlayer.iterations, MCTSPlayer.seconds, MCTSPlayer.rollout_strategy.__name__
+    return ()
+
+
+def key(config: Config) -> str:
+    """The content hash a Config's results are cached under: the cards themselves rather than the
+    expression naming them, the rest of the Config and the version of the code."""
+    strategy = _eval(config.strategy)
+    content = (CACHE_VERSION, code_version(), [card.name for card in _eval(config.cards)], strategy.__name__,
+               _eval(config.monster).__name__, config.turns, config.trials, config.seed, config.engine,
+               _strategy_settings(strategy))
+    return hashlib.sha256(repr(content).encode()).hexdigest()
+
+
+def _path(config: Config, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{key(config)}.pickle")
+
+
+def load(config: Config, cache_dir: str = CACHE_DIR):
+    """The cached (StreamingTrialStats, CombatLog) of `config`, or None."""
+    try:
+        with open(_path(config, cache_dir), "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def pending(configs, cache_dir: str = CACHE_DIR) -> list:
+    return [config for config in configs if not os.path.exists(_path(config, cache_dir))]
+
+
+def run(config: Config):
+    """Runs a Config's trials, keeping StreamingTrialStats: the aggregates are all the charts use."""
+    strategy, cards, monster_factory = _eval(config.strategy), _eval(config.cards), _eval(config.monster)
+    if config.engine == "vector":
+        trial_stats, combat_log = simulation.run_vector_trials(
+            strategy, cards, monster_factory, config.turns, config.trials, config.seed, streaming=True)
+    else:
+        trial_stats, combat_log = simulation.run_trials(
+            strategy, cards, monster_factory, config.turns, config.trials, config.seed, streaming=True)
+    combat_log.finish()
+    trial_stats.finish()
+    return trial_stats, combat_log
+
+
+def _run(config: Config):
+    return config, run(config)
+
+
+def compute(configs, cache_dir: str = CACHE_DIR, workers: int = 1):
+    """Runs `configs` across `workers` processes and caches each one's results as it finishes."""
+    os.makedirs(cache_dir, exist_ok=True)
+    # A sweep isn't training data: its rows are dropped rather than written to sts.csv.
+    training_csv = simulation.csv_logger
+    player.csv_logger = simulation.csv_logger = CsvLogger(player.CSV_HEADER, out=os.devnull)
+    sts.set_fast_mode()
+    pool = None
+    try:
+        if workers > 1:
+            pool = multiprocessing.get_context("fork").Pool(workers)
+            results = pool.imap_unordered(_run, configs)
+        else:
+            results = map(_run, configs)
+        for config, result in results:
+            path = _path(config, cache_dir)
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump(result, f)
+            os.replace(path + ".tmp", path)
+            logger.info(f"cached {config} as {path}")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        player.csv_logger = simulation.csv_logger = training_csv
+
+
+def title(config: Config) -> str:
+    return f'{config.strategy} vs {config.monster}<sup><br>{config.cards}</sup>'
+
+
+def label(config: Config) -> str:
+    # The sts.py arguments of the run, leaving out defaults.
+    name = f"{config.cards} --strategy={config.strategy} --trials={config.trials} --turns={config.turns}"
+    if config.monster != "Monster":
+        name += f" --monster={config.monster}"
+    if config.seed:
+        name += f" --seed={config.seed}"
+    return name
+
+
+def chart_path(config: Config) -> str:
+    # Where sts.py --write would save the chart.
+    return f"charts/{label(config)}.html"
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="run sts.py over a grid of card lists, strategies, monsters and turns, reusing cached results")
+    argparser.add_argument('--cards', help='card lists (default: IRONCLAD_STARTER)', nargs='+',
+                           default=["IRONCLAD_STARTER"])
+    argparser.add_argument('--strategies', help='player strategies (default: AttackingPlayer)', nargs='+',
+                           default=["AttackingPlayer"])
+    argparser.add_argument('--monsters', help='monsters to fight (default: Monster)', nargs='+', default=["Monster"])
+    argparser.add_argument('--turns', help='numbers of turns (default: 20)', type=int, nargs='+', default=[20])
+    argparser.add_argument('--trials', help='number of trials', type=int, default=10000)
+    argparser.add_argument('--seed', help='seed', type=int, default=0)
+    argparser.add_argument('--engine', help='auto uses the vector engine where it can (default: auto)',
+                           choices=['auto', 'scalar', 'vector'], default='auto')
+    argparser.add_argument('--workers', help='number of worker processes (default: 1)', type=int, default=1)
+    argparser.add_argument('--cache', help=f'cache directory (default: {CACHE_DIR})', default=CACHE_DIR)
+    argparser.add_argument('--force', help='run every configuration, even if cached', action="store_true")
+    argparser.add_argument('--write', help='write charts to disk', action="store_true")
+    argparser.add_argument('--plot', help='plot charts', action="store_true")
+    args = argparser.parse_args()
+
+    configs = grid(args.cards, args.strategies, args.monsters, args.turns, args.trials, args.seed, args.engine)
+    todo = configs if args.force else pending(configs, args.cache)
+    print(f"{len(configs)} configurations, {len(configs) - len(todo)} cached, running {len(todo)}")
+    compute(todo, args.cache, args.workers)
+
+    for config in configs:
+        trial_stats, combat_log = load(config, args.cache)
+        print(f"{numpy.average(sts.final_hp_scatter(trial_stats.final_hp_counts)[1])} {label(config)}")
+        if args.write or args.plot:
+            fig = sts.make_figure(trial_stats, combat_log, len(_eval(config.cards)), _eval(config.monster),
+                                  config.turns, title(config))
+            if args.write:
+                fig.write_html(chart_path(config))
+            if args.plot:
+                fig.show()
+
+
+if __name__ == "__main__":
+    main()
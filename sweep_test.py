@@ -0,0 +1,61 @@
+import logging.config
+import pickle
+import tempfile
+import unittest
+
+import numpy.testing
+
+import simulation
+import sweep
+
+logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
+
+
+class TestSweep(unittest.TestCase):
+    def test_grid(self):
+        configs = sweep.grid(["IRONCLAD_STARTER", "IRONCLAD_STARTER + [Card.ANGER]"], ["AttackingPlayer", "RandomPlayer"],
+                             ["JawWorm"], [10, 20], 100)
+        self.assertEqual(8, len(configs))
+        self.assertEqual({("AttackingPlayer", "vector"), ("RandomPlayer", "scalar")},
+                         {(config.strategy, config.engine) for config in configs})
+
+    def test_key(self):
+        config = sweep.grid(["IRONCLAD_STARTER"], ["AttackingPlayer"], ["JawWorm"], [10], 100)[0]
+        self.assertEqual(sweep.key(config), sweep.key(config._replace(cards="[Card.DEFEND]*4 + [Card.STRIKE]*5 + [Card.BASH]")))
+        for change in ({"cards": "IRONCLAD_STARTER + [Card.ANGER]"}, {"strategy": "DefendingPlayer"}, {"turns": 11},
+                       {"trials": 101}, {"seed": 1}, {"engine": "scalar"}):
+            self.assertNotEqual(sweep.key(config), sweep.key(config._replace(**change)), change)
+
+    def test_cache(self):
+        configs = sweep.grid(["IRONCLAD_STARTER", "IRONCLAD_STARTER + [Card.ANGER]"], ["AttackingPlayer", "RandomPlayer"],
+                             ["JawWorm"], [8], 60)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.assertEqual(configs, sweep.pending(configs, cache_dir))
+            self.assertIsNone(sweep.load(configs[0], cache_dir))
+            sweep.compute(configs[:3], cache_dir, workers=2)
+            self.assertEqual(configs[3:], sweep.pending(configs, cache_dir))
+            sweep.compute(configs[3:], cache_dir)
+            self.assertEqual([], sweep.pending(configs, cache_dir))
+
+            for config in configs:
+                cached_stats, cached_log = sweep.load(config, cache_dir)
+                trial_stats, combat_log = sweep.run(config)
+                numpy.testing.assert_allclose(trial_stats.average_monster_damage, cached_stats.average_monster_damage)
+                self.assertEqual(trial_stats.final_hp_counts, cached_stats.final_hp_counts)
+                self.assertEqual(trial_stats.player_block.scatter_data(), cached_stats.player_block.scatter_data())
+                self.assertEqual(combat_log.best_attack, cached_log.best_attack)
+
+    def test_pickled_accumulator(self):
+        accumulator = simulation.TurnAccumulator(turns=3, buffer_trials=5)
+        for row in ([1, 2], [3, 4, 5], [6]):
+            accumulator.add(row)
+        copy = pickle.loads(pickle.dumps(accumulator))
+        self.assertEqual(0, len(copy._buffer))
+        for values in (accumulator, copy):
+            values.add([7, 8, 9, 10])
+        numpy.testing.assert_allclose(accumulator.average(), copy.average())
+        self.assertEqual(accumulator.scatter_data(), copy.scatter_data())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
 #!/bin/bash
+# Configurations already in sweep_cache are not run again: after a change to the plots only, this
+# redraws the charts from the cached results. The "auto" engine draws AttackingPlayer and
+# DefendingPlayer vs Monster or JawWorm with vector_engine, whose ties between equally ranked cards
+# follow Card order, rather than with the scalar engine, so those charts differ slightly from sts.py's.
 
-python3 sts.py "IRONCLAD_STARTER" --strategy=AttackingPlayer --trials=10000 --turns=60 --write
-python3 sts.py "IRONCLAD_STARTER + [Card.DEMON_FORM]" --strategy=AttackingPlayer --trials=10000 --turns=60 --write
-python3 sts.py "IRONCLAD_STARTER + [Card.LIMIT_BREAK_PLUS] + [Card.FLEX]" --trials=1000 --turns=40 --write
-python3 sts.py "IRONCLAD_STARTER" --strategy=AttackingPlayer --trials=1000 --turns=20 --monster=JawWorm --write 
-
+python3 sweep.py --cards "IRONCLAD_STARTER" "IRONCLAD_STARTER + [Card.DEMON_FORM]" --trials=10000 --turns 60 --workers=2 --write
+python3 sweep.py --cards "IRONCLAD_STARTER + [Card.LIMIT_BREAK_PLUS] + [Card.FLEX]" --trials=1000 --turns 40 --write
+python3 sweep.py --cards "IRONCLAD_STARTER" --monsters JawWorm --trials=1000 --turns 20 --write
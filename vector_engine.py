@@ -0,0 +1,263 @@
+import logging
+from collections import namedtuple
+
+import numpy
+
+import intents
+from card import CARDS, CATALOG, TAG_TABLE, Card, Tag, sort_ranks
+from monster import JawWorm, Monster
+from player import AttackingPlayer, DefendingPlayer
+
+logger = logging.getLogger("sts").getChild(__name__)
+
+STRATEGIES = (AttackingPlayer, DefendingPlayer)
+MONSTERS = (Monster, JawWorm)
+
+IS_STRIKE = TAG_TABLE[:, Tag.STRIKE.value]
+
+HAND_SIZE = 5
+PLAYER_ENERGY = 3
+PLAYER_HP = 72
+
+
+class BatchResult(namedtuple("BatchResult",
+                             "cards damage damage_turns blocks block_turns final_turn final_hp plays")):
+    """Per-trial results of a batch: (trials, turns) arrays plus the length used in each row.
+
+    plays is a list with one entry per turn of (trial indices, card ids) pairs, one pair per play step."""
+
+    def monster_damage(self, trial: int) -> list:
+        return self.damage[trial, :self.damage_turns[trial]].tolist()
+
+    def player_block(self, trial: int) -> list:
+        return self.blocks[trial, :self.block_turns[trial]].tolist()
+
+    def played_cards(self, trial: int) -> list:
+        played_cards = []
+        for turn in range(self.final_turn[trial]):
+            played_cards.append([self.cards[cards[trials == trial][0]]
+                                 for trials, cards in self.plays[turn] if trial in trials])
+        return played_cards
+
+
+def _play_order(strategy, cards):
+    # Indices into cards, most preferred first: the order strategy._sort_key puts a hand in.
+    ranks = numpy.array(sort_ranks(strategy._sort_key))[[CARDS.index(c) for c in cards]]
+    return numpy.argsort(-ranks, kind="stable")
+
+
+class _Batch:
+    def __init__(self, strategy, cards, monster_factory, turns: int, trials: int, seed):
+        self.rng = numpy.random.default_rng(seed)
+        self.turns = turns
+        self.trials = trials
+
+        # Card ids are local to this deck (plus ANGER's copies, which are the same card).
+        self.cards = sorted(set(cards), key=CARDS.index)
+        ids = [CARDS.index(c) for c in self.cards]
+        self.table = {field: column[ids] for field, column in CATALOG.items()}
+        self.is_strike = IS_STRIKE[ids].astype(int)
+        self.anger = self.cards.index(Card.ANGER) if Card.ANGER in self.cards else -1
+        self.order = _play_order(strategy, self.cards)
+        self.order_energy = self.table['energy'][self.order]
+
+        counts = numpy.array([cards.count(c) for c in self.cards])
+        self.owned = numpy.tile(counts, (trials, 1))
+        self.discards = self.owned.copy()
+        self.hand = numpy.zeros_like(self.owned)
+        self.pile = numpy.zeros((trials, 2 * len(cards)), dtype=int)
+        self.pile_pos = numpy.zeros(trials, dtype=int)
+        self.pile_len = numpy.zeros(trials, dtype=int)
+        self._reshuffle(numpy.arange(trials))
+
+        self.hp = numpy.full(trials, PLAYER_HP)
+        self.block = numpy.zeros(trials, dtype=int)
+        self.strength = numpy.zeros(trials, dtype=int)
+        self.strength_buff = numpy.zeros(trials, dtype=int)
+        self.post_strength_debuff_once = numpy.zeros(trials, dtype=int)
+        self.energy = numpy.zeros(trials, dtype=int)
+
+        monster = monster_factory()
+        self.jawworm = monster_factory is JawWorm
+        self.m_hp = numpy.full(trials, monster.hp, dtype=numpy.int64)
+        self.m_block = numpy.full(trials, monster.block)
+        self.m_strength = numpy.full(trials, monster.strength)
+        self.m_strength_buff = numpy.full(trials, monster.strength_buff)
+        self.m_vulnerable = numpy.zeros(trials, dtype=int)
+        self.m_planned_damage = numpy.full(trials, monster.planned_damage)
+        if self.jawworm:
+            # Each row's state in intents.chain(), starting from JawWorm's opening.
+            self.intents = intents.mode_intents()
+            self.cumulative, self.next_states = intents.sampler_tables()
+            self.state = numpy.zeros(trials, dtype=int)
+
+        self.done = numpy.zeros(trials, dtype=bool)
+        self.damage = numpy.zeros((trials, turns), dtype=numpy.int64)
+        self.damage_turns = numpy.zeros(trials, dtype=int)
+        self.blocks = numpy.zeros((trials, turns), dtype=int)
+        self.block_turns = numpy.zeros(trials, dtype=int)
+        self.final_turn = numpy.zeros(trials, dtype=int)
+        self.plays = []
+
+    def _reshuffle(self, rows):
+        # Deal the discards of each row back into its draw pile in a random order.
+        counts = self.discards[rows]
+        sizes = counts.sum(1)
+        width = sizes.max(initial=0)
+        if width > self.pile.shape[1]:
+            self.pile = numpy.pad(self.pile, ((0, 0), (0, 2 * width - self.pile.shape[1])))
+        positions = numpy.arange(width)
+        cards = (counts.cumsum(1)[:, :, None] <= positions).sum(1)
+        keys = self.rng.random((len(rows), width))
+        keys[positions >= sizes[:, None]] = 2.0
+        self.pile[rows, :width] = numpy.take_along_axis(cards, numpy.argsort(keys, axis=1), 1)
+        self.pile_pos[rows] = 0
+        self.pile_len[rows] = sizes
+        self.discards[rows] = 0
+
+    def _deal(self, rows):
+        empty = rows[self.pile_pos[rows] == self.pile_len[rows]]
+        if len(empty):
+            self._reshuffle(empty)
+        rows = rows[self.pile_pos[rows] < self.pile_len[rows]]
+        self.hand[rows, self.pile[rows, self.pile_pos[rows]]] += 1
+        self.pile_pos[rows] += 1
+
+    def _monster_defend(self, rows, attack_damage, turn: int):
+        post_vulnerable_damage = numpy.where(
+            self.m_vulnerable[rows] > 0, (attack_damage * 1.5).astype(int), attack_damage)
+        block = self.m_block[rows]
+        post_block_damage = numpy.maximum(0, post_vulnerable_damage - block)
+        self.m_block[rows] = numpy.maximum(0, block - post_vulnerable_damage)
+        post_hp_damage = numpy.minimum(self.m_hp[rows], post_block_damage)
+        self.m_hp[rows] -= post_hp_damage
+        self.damage[rows, turn] += post_hp_damage
+        self.damage_turns[rows] = turn + 1
+
+    def _play(self, rows, cards, turn: int):
+        table = self.table
+        self.energy[rows] -= table['energy'][cards]
+        self.hand[rows, cards] -= 1
+        exhausts = table['exhausts'][cards]
+        self.owned[rows[exhausts], cards[exhausts]] -= 1
+        self.discards[rows[~exhausts], cards[~exhausts]] += 1
+
+        attacks = table['attack'][cards] != 0
+        a_rows, a_cards = rows[attacks], cards[attacks]
+        if len(a_rows):
+            strike_bonus = table['strike_bonus'][a_cards] * (self.owned[a_rows] @ self.is_strike)
+            damage = table['attack_multiplier'][a_cards] * (
+                table['attack'][a_cards] + strike_bonus +
+                self.strength[a_rows] * table['attack_strength_multiplier'][a_cards])
+            self._monster_defend(a_rows, damage, turn)
+
+        self.m_vulnerable[rows] += table['vulnerable'][cards]
+        self.m_strength[rows] += table['enemy_strength_gain'][cards]
+        self.block[rows] += table['block'][cards]
+        self.strength_buff[rows] += table['strength_buff'][cards]
+        self.strength[rows] += table['strength_gain'][cards]
+        self.post_strength_debuff_once[rows] += table['strength_loss'][cards]
+        self.strength[rows] *= table['strength_multiplier'][cards]
+        draws = table['draw_card'][cards]
+        for count in range(draws.max(initial=0)):
+            self._deal(rows[draws > count])
+
+        anger = rows[cards == self.anger]
+        self.discards[anger, self.anger] += 1
+        self.owned[anger, self.anger] += 1
+
+    def _play_hand(self, rows, turn: int):
+        plays = []
+        self.energy[rows] = PLAYER_ENERGY
+        while len(rows):
+            hand = self.hand[rows][:, self.order]
+            playable = (hand > 0) & (self.order_energy <= self.energy[rows, None])
+            has_card = playable.any(1)
+
+            # No card left to play: the hand ends normally, recording the block.
+            ended = rows[~has_card]
+            self.blocks[ended, self.block_turns[ended]] = self.block[ended]
+            self.block_turns[ended] += 1
+            self.discards[ended] += self.hand[ended]
+            self.hand[ended] = 0
+
+            # A card to play but the monster is dead: Player._play_hand returns early.
+            cards = self.order[playable[has_card].argmax(1)]
+            rows = rows[has_card]
+            alive = self.m_hp[rows] > 0
+            rows, cards = rows[alive], cards[alive]
+
+            self._play(rows, cards, turn)
+            plays.append((rows, cards))
+        self.plays.append(plays)
+
+    def _monster_attack(self, rows):
+        attack = self.m_planned_damage[rows] + self.m_strength[rows]
+        if self.jawworm:
+            attack[self.m_planned_damage[rows] == 0] = 0
+        return attack
+
+    def _player_defend(self, rows, attack_damage):
+        block = self.block[rows]
+        post_block_damage = numpy.maximum(0, attack_damage - block)
+        self.block[rows] = numpy.maximum(0, block - attack_damage)
+        self.hp[rows] -= numpy.minimum(self.hp[rows], post_block_damage)
+
+    def _monster_end_turn(self, rows):
+        self.m_vulnerable[rows] = numpy.maximum(0, self.m_vulnerable[rows] - 1)
+        self.m_strength[rows] += self.m_strength_buff[rows]
+        if not self.jawworm:
+            return
+        self.m_block[rows] = 0
+        state = self.state[rows]
+        next_mode = (self.rng.random(len(rows))[:, None] >= self.cumulative[state]).sum(1)
+        self.state[rows] = self.next_states[state, next_mode]
+        planned_damage, block, strength = self.intents[next_mode].T
+        self.m_planned_damage[rows] = planned_damage
+        self.m_block[rows] = block
+        self.m_strength[rows] += strength
+
+    def _play_turn(self, rows, turn: int):
+        self.block[rows] = 0
+        for _ in range(HAND_SIZE):
+            self._deal(rows)
+        self._play_hand(rows, turn)
+
+        alive = rows[self.m_hp[rows] > 0]
+        attack = self._monster_attack(alive)
+        self._player_defend(alive[attack != 0], attack[attack != 0])
+        self.strength[rows] -= self.post_strength_debuff_once[rows]
+        self.post_strength_debuff_once[rows] = 0
+
+        self._monster_end_turn(rows)
+        self.strength[rows] += self.strength_buff[rows]
+        self.final_turn[rows] = turn + 1
+
+    def run(self) -> BatchResult:
+        for turn in range(self.turns):
+            rows = numpy.flatnonzero(~self.done)
+            if not len(rows):
+                break
+            self._play_turn(rows, turn)
+            self.done[rows] = (self.m_hp[rows] == 0) | (self.hp[rows] == 0)
+
+        return BatchResult(self.cards, self.damage, self.damage_turns, self.blocks, self.block_turns,
+                           self.final_turn, self.hp, self.plays)
+
+
+def simulate(strategy, cards, monster_factory, turns: int, trials: int, seed=0) -> BatchResult:
+    """Plays `trials` games at once with numpy arrays of shape (trials, ...).
+
+    Only the fixed strategies and monsters in STRATEGIES and MONSTERS are supported: their card
+    choice is a fixed preference order over the cards in hand. Games follow the same rules as
+    Player.play_game, but draw from a single random stream, so individual trials differ from
+    simulation.run_trial for the same seed while the distributions match.
+    Cards whose sort keys tie are played in Card order rather than in the order they were dealt.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"vector engine does not support strategy {strategy.__name__}")
+    if monster_factory not in MONSTERS:
+        raise ValueError(f"vector engine does not support monster {monster_factory.__name__}")
+    logger.info(f"vector engine: {strategy.__name__} vs {monster_factory.__name__}, "
+                f"{trials} trials, {turns} turns")
+    return _Batch(strategy, cards, monster_factory, turns, trials, seed).run()
@@ -0,0 +1,79 @@
+import logging.config
+import unittest
+
+import numpy
+
+import simulation
+import vector_engine
+from card import IRONCLAD_STARTER, Card
+from monster import JawWorm, Monster
+from player import AttackingPlayer, DefendingPlayer, RandomPlayer
+
+logging.config.fileConfig(fname='logging.conf', disable_existing_loggers=False)
+
+
+class TestVectorEngine(unittest.TestCase):
+    def assertDamage(self, expected, cards, turns, strategy=AttackingPlayer, trials=3):
+        # Five card decks are dealt whole every turn, so every trial plays the same game.
+        batch = vector_engine.simulate(strategy, cards, Monster, turns, trials)
+        for trial in range(trials):
+            self.assertEqual(expected, batch.monster_damage(trial))
+
+    def test_play_turn(self):
+        self.assertDamage([18], [Card.DEFEND] + [Card.STRIKE] * 4, 1)
+
+    def test_anger(self):
+        batch = vector_engine.simulate(AttackingPlayer, [Card.ANGER] + [Card.STRIKE] * 4, Monster, 1, 2)
+        self.assertEqual([24], batch.monster_damage(0))
+        self.assertEqual([[Card.ANGER, Card.STRIKE, Card.STRIKE, Card.STRIKE]], batch.played_cards(0))
+
+    def test_strike_bonus(self):
+        self.assertDamage([22], [Card.PERFECTED_STRIKE] + [Card.STRIKE] * 4, 1)
+
+    def test_vulnerable(self):
+        self.assertDamage([17], [Card.DEFEND] + [Card.STRIKE] * 3 + [Card.BASH], 1)
+
+    def test_strength_buff(self):
+        self.assertDamage([0, 8*3, 10*3], [Card.DEMON_FORM] + [Card.STRIKE] * 4, 3)
+
+    def test_strength_gain(self):
+        self.assertDamage([8*2, 8*3, 8*3], [Card.INFLAME] + [Card.STRIKE] * 4, 3)
+
+    def test_strength_multiplier(self):
+        self.assertDamage([6+4, 2*(6+8), 2*(6+16)],
+                          [Card.INFLAME] + [Card.STRIKE] * 3 + [Card.LIMIT_BREAK_PLUS], 3)
+
+    def test_attack_multiplier(self):
+        self.assertDamage([10], [Card.TWIN_STRIKE] + [Card.DEFEND] * 4, 1)
+
+    def test_block(self):
+        batch = vector_engine.simulate(DefendingPlayer, [Card.DEFEND] * 3 + [Card.STRIKE] * 2, Monster, 2, 2)
+        self.assertEqual([15, 15], batch.player_block(0))
+        self.assertEqual([], batch.monster_damage(0))
+
+    def test_monster_dies(self):
+        batch = vector_engine.simulate(AttackingPlayer, [Card.STRIKE] * 5, JawWorm, 10, 50)
+        numpy.testing.assert_array_equal(40, batch.damage.sum(1))
+        numpy.testing.assert_array_equal(batch.final_turn, batch.damage_turns)
+        self.assertTrue((batch.final_turn < 10).all())
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            vector_engine.simulate(RandomPlayer, IRONCLAD_STARTER, Monster, 1, 1)
+
+    def test_matches_scalar_engine(self):
+        trials = 1000
+        scalar, _ = simulation.run_trials(AttackingPlayer, IRONCLAD_STARTER, JawWorm, 20, trials)
+        vector, _ = simulation.run_vector_trials(AttackingPlayer, IRONCLAD_STARTER, JawWorm, 20, trials)
+        scalar.finish()
+        vector.finish()
+
+        scalar_hp = numpy.mean([hp for _, hp in scalar.player_turn_and_final_hp])
+        vector_hp = numpy.mean([hp for _, hp in vector.player_turn_and_final_hp])
+        self.assertAlmostEqual(scalar_hp, vector_hp, delta=1.0)
+        numpy.testing.assert_allclose(scalar.average_monster_damage[:3],
+                                      vector.average_monster_damage[:3], atol=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()